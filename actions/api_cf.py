@@ -7,7 +7,7 @@ or (at your option) any later version.
 # -*- coding: latin-1 -*-
 from qgis.core import QgsGeometry, QgsMapToPixel, QgsPointXY, QgsVectorLayer
 from qgis.gui import QgsDateTimeEdit, QgsMapToolEmitPoint, QgsRubberBand, QgsVertexMarker
-from qgis.PyQt.QtCore import pyqtSignal, QDate, QObject, QPoint, QStringListModel, Qt
+from qgis.PyQt.QtCore import pyqtSignal, QDate, QObject, QPoint, QStringListModel, Qt, QTimer
 from qgis.PyQt.QtGui import QColor, QCursor, QIcon, QStandardItem, QStandardItemModel
 from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QAction, QAbstractItemView, QCheckBox, QComboBox, QCompleter, QDoubleSpinBox, \
@@ -18,6 +18,7 @@ import json
 import os
 import re
 import subprocess
+import time
 import urllib.parse as parse
 import sys
 import webbrowser
@@ -197,6 +198,8 @@ class ApiCF(ApiParent, QObject):
         self.dlg_is_destroyed = False
         self.layer = None
         self.feature = None
+        self.feature_points = None
+        self.time_open_start = time.perf_counter()
         self.my_json = {}
         self.tab_type = tab_type
 
@@ -259,6 +262,10 @@ class ApiCF(ApiParent, QObject):
                 extras = f'"addSchema":"{add_schema}"'
             else:
                 extras = '"addSchema":""'
+            # Tell server which version of the form definition is cached, so it can return only feature values
+            form_cache = self.controller.form_cache
+            if form_cache and form_cache.get(self.schema_name, table_name) is not None:
+                extras += f', "formCache":{{"stamp":"{form_cache.stamp}"}}'
             feature = f'"tableName":"{table_name}", "id":"{feature_id}"'
             body = self.create_body(feature=feature, extras=extras)
             function_name = 'gw_fct_getinfofromid'
@@ -297,6 +304,10 @@ class ApiCF(ApiParent, QObject):
                 self.controller.show_message(msg, message_level=level)
                 return False, None
 
+        # Manage persistent cache of form definitions
+        if function_name == 'gw_fct_getinfofromid':
+            self.manage_form_cache(table_name, row[0])
+
         self.complet_result = row
         try:
             template = self.complet_result[0]['body']['form']['template']
@@ -377,6 +388,29 @@ class ApiCF(ApiParent, QObject):
                 self.my_json[str(widget.property('columnname'))] = str(value)
 
 
+    def manage_form_cache(self, table_name, complet_result):
+        """ Save form definition of @table_name into persistent cache, or complete with the cached one
+            a @complet_result that only contains feature values and combo domains """
+
+        form_cache = self.controller.form_cache
+        if not form_cache:
+            return
+
+        try:
+            fields = complet_result['body']['data']['fields']
+            form_cached = complet_result['body']['form'].get('formCached', False)
+        except (KeyError, TypeError, AttributeError):
+            return
+
+        if not isinstance(fields, list):
+            return
+
+        if form_cached:
+            complet_result['body']['data']['fields'] = form_cache.merge(self.schema_name, table_name, fields)
+        else:
+            form_cache.put(self.schema_name, table_name, fields)
+
+
     def open_generic_form(self, complet_result):
 
         self.draw(complet_result, zoom=False)
@@ -452,13 +486,6 @@ class ApiCF(ApiParent, QObject):
         self.field_id = str(complet_result[0]['body']['feature']['idName'])
         self.feature_id = complet_result[0]['body']['feature']['id']
 
-        # Get the start point and end point of the feature
-        if new_feature:
-            list_points = self.get_points_from_geometry(self.layer, new_feature)
-        else:
-            feature = self.get_feature_by_id(self.layer, self.feature_id, self.field_id)
-            list_points = self.get_points_from_geometry(self.layer, feature)
-
         if 'visibleTabs' in complet_result[0]['body']['form']:
             for tab in complet_result[0]['body']['form']['visibleTabs']:
                 tabs_to_show.append(tab['tabName'])
@@ -611,8 +638,8 @@ class ApiCF(ApiParent, QObject):
         # Actions signals
         action_edit.triggered.connect(partial(self.manage_edition, dlg_cf, action_edit, complet_result[0]['body']['data'], fid, new_feature))
         action_catalog.triggered.connect(partial(self.open_catalog, tab_type, self.feature_type))
-        action_workcat.triggered.connect(partial(self.get_catalog, 'new_workcat', self.tablename, self.feature_type, self.feature_id, self.field_id, list_points))
-        action_mapzone.triggered.connect(partial(self.get_catalog, 'new_mapzone', self.tablename, self.feature_type, self.feature_id, self.field_id, list_points))
+        action_workcat.triggered.connect(partial(self.get_catalog, 'new_workcat', self.tablename, self.feature_type, self.feature_id, self.field_id, new_feature))
+        action_mapzone.triggered.connect(partial(self.get_catalog, 'new_mapzone', self.tablename, self.feature_type, self.feature_id, self.field_id, new_feature))
         action_set_to_arc.triggered.connect(partial(self.get_snapped_feature_id, dlg_cf, action_set_to_arc, 'v_edit_arc', 'set_to_arc', None))
         action_get_arc_id.triggered.connect(partial(self.get_snapped_feature_id, dlg_cf, action_get_arc_id,  'v_edit_arc', 'arc', 'data_arc_id'))
         action_get_parent_id.triggered.connect(partial(self.get_snapped_feature_id, dlg_cf, action_get_parent_id, 'v_edit_node', 'node', 'data_parent_id'))
@@ -663,9 +690,67 @@ class ApiCF(ApiParent, QObject):
         self.open_dialog(dlg_cf, dlg_name='info_feature')
         dlg_cf.setWindowTitle(title)
 
+        # Once form has been painted, log time to first paint and prefetch the tab most likely to be opened
+        QTimer.singleShot(0, partial(self.info_form_painted, dlg_cf, new_feature))
+
         return self.complet_result, dlg_cf
 
 
+    def info_form_painted(self, dialog, new_feature):
+        """ Log time since info was requested until form has been painted, and prefetch next tab """
+
+        if self.dlg_is_destroyed or isdeleted(dialog):
+            return
+
+        self.controller.log_info(f"Info form painted in {time.perf_counter() - self.time_open_start:.3f} seconds")
+
+        # Features being inserted have no related data yet
+        if new_feature:
+            return
+
+        tab_name = self.get_prefetch_tab_name()
+        if tab_name:
+            QTimer.singleShot(0, partial(self.prefetch_tab, dialog, tab_name, new_feature))
+
+
+    def get_prefetch_tab_name(self):
+        """ Get name of the tab most likely to be opened: last tab opened by user if it is visible
+            in this form, otherwise the first tab after 'tab_data' """
+
+        tab_names = [self.tab_main.widget(x).objectName() for x in range(self.tab_main.count())]
+        last_tab_name = self.controller.plugin_settings_value('infoLastTab')
+        if last_tab_name in tab_names:
+            return last_tab_name
+        if len(tab_names) > 1:
+            return tab_names[1]
+
+        return None
+
+
+    def prefetch_tab(self, dialog, tab_name, new_feature):
+        """ Fill tab @tab_name while form is idle, so that it is already loaded when activated """
+
+        if self.dlg_is_destroyed or isdeleted(dialog) or not dialog.isVisible():
+            return
+
+        time_start = time.perf_counter()
+        if self.load_tab(tab_name, new_feature):
+            self.controller.log_info(f"Tab '{tab_name}' prefetched in {time.perf_counter() - time_start:.3f} seconds")
+
+
+    def get_feature_points(self, new_feature=None):
+        """ Get start point and end point of the feature, only the first time they are required """
+
+        if self.feature_points is None:
+            if new_feature:
+                self.feature_points = self.get_points_from_geometry(self.layer, new_feature)
+            else:
+                feature = self.get_feature_by_id(self.layer, self.feature_id, self.field_id)
+                self.feature_points = self.get_points_from_geometry(self.layer, feature)
+
+        return self.feature_points
+
+
     def action_rotation(self, dialog, action):
         # Set map tool emit point and signals
         self.emit_point = QgsMapToolEmitPoint(self.canvas)
@@ -1619,44 +1704,58 @@ class ApiCF(ApiParent, QObject):
         tab_name = self.tab_main.widget(index_tab).objectName()
         self.show_actions(dialog, tab_name)
 
+        # Remember it to prefetch it when next info form is opened
+        if index_tab > 0:
+            self.controller.plugin_settings_set_value('infoLastTab', tab_name)
+
+        self.load_tab(tab_name, new_feature)
+
+
+    def load_tab(self, tab_name, new_feature):
+        """ Fill tab @tab_name if it has not been loaded yet. Return True if it has been filled now """
+
         # Tab 'Elements'
-        if self.tab_main.widget(index_tab).objectName() == 'tab_elements' and not self.tab_element_loaded:
+        if tab_name == 'tab_elements' and not self.tab_element_loaded:
             self.fill_tab_element()
             self.tab_element_loaded = True
         # Tab 'Relations'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_relations' and not self.tab_relations_loaded:
+        elif tab_name == 'tab_relations' and not self.tab_relations_loaded:
             self.fill_tab_relations()
             self.tab_relations_loaded = True
         # Tab 'Connections'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_connections' and not self.tab_connections_loaded:
+        elif tab_name == 'tab_connections' and not self.tab_connections_loaded:
             self.fill_tab_connections()
             self.tab_connections_loaded = True
         # Tab 'Hydrometer'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_hydrometer' and not self.tab_hydrometer_loaded:
+        elif tab_name == 'tab_hydrometer' and not self.tab_hydrometer_loaded:
             self.fill_tab_hydrometer()
             self.tab_hydrometer_loaded = True
         # Tab 'Hydrometer values'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_hydrometer_val' and not self.tab_hydrometer_val_loaded:
+        elif tab_name == 'tab_hydrometer_val' and not self.tab_hydrometer_val_loaded:
             self.fill_tab_hydrometer_values()
             self.tab_hydrometer_val_loaded = True
         # Tab 'Event'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_visit' and not self.tab_visit_loaded:
+        elif tab_name == 'tab_visit' and not self.tab_visit_loaded:
             self.fill_tab_visit(self.geom_type)
             self.tab_visit_loaded = True
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_event' and not self.tab_event_loaded:
+        elif tab_name == 'tab_event' and not self.tab_event_loaded:
             self.fill_tab_event(self.geom_type)
             self.tab_event_loaded = True
         # Tab 'Documents'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_documents' and not self.tab_document_loaded:
+        elif tab_name == 'tab_documents' and not self.tab_document_loaded:
             self.fill_tab_document()
             self.tab_document_loaded = True
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_rpt' and not self.tab_rpt_loaded:
+        elif tab_name == 'tab_rpt' and not self.tab_rpt_loaded:
             self.fill_tab_rpt(partial(self.complet_result, new_feature))
             self.tab_rpt_loaded = True
         # Tab 'Plan'
-        elif self.tab_main.widget(index_tab).objectName() == 'tab_plan' and not self.tab_plan_loaded:
+        elif tab_name == 'tab_plan' and not self.tab_plan_loaded:
             self.fill_tab_plan(self.complet_result)
             self.tab_plan_loaded = True
+        else:
+            return False
+
+        return True
 
 
     def fill_tab_element(self):
@@ -1772,29 +1871,21 @@ class ApiCF(ApiParent, QObject):
             self.controller.show_warning(message)
             return
 
-        inf_text = ""
-        list_object_id = ""
-        row_index = ""
-        list_id = ""
+        list_object_id = []
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             object_id = widget.model().record(row).value("doc_id")
             id_ = widget.model().record(row).value("id")
             if object_id is None:
                 object_id = widget.model().record(row).value("element_id")
-            inf_text += str(object_id) + ", "
-            list_id += str(id_) + ", "
-            list_object_id = list_object_id + str(object_id) + ", "
-            row_index += str(row + 1) + ", "
+            list_id.append(id_)
+            list_object_id.append(str(object_id))
 
-        list_object_id = list_object_id[:-2]
-        list_id = list_id[:-2]
         message = "Are you sure you want to delete these records?"
-        answer = self.controller.ask_question(message, "Delete records", list_object_id)
+        answer = self.controller.ask_question(message, "Delete records", ", ".join(list_object_id))
         if answer:
-            sql = ("DELETE FROM " + table_name + ""
-                   " WHERE id::integer IN (" + list_id + ")")
-            self.controller.execute_sql(sql, log_sql=False)
+            self.controller.delete_rows(table_name, 'id', list_id)
             widget.model().select()
 
 
@@ -1837,11 +1928,7 @@ class ApiCF(ApiParent, QObject):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(edit_strategy)
-        if expr_filter:
-            model.setFilter(expr_filter)
+        model = self.create_table_model(table_name, expr_filter, edit_strategy, sort_order=None)
         model.select()
 
         # Check for errors
@@ -3080,7 +3167,9 @@ class ApiCF(ApiParent, QObject):
                 plan_layout.addItem(plan_vertical_spacer)
 
 
-    def get_catalog(self, form_name, table_name, feature_type, feature_id, field_id, list_points):
+    def get_catalog(self, form_name, table_name, feature_type, feature_id, field_id, new_feature=None):
+
+        list_points = self.get_feature_points(new_feature)
         form = f'"formName":"{form_name}", "tabName":"data", "editable":"TRUE"'
         feature = f'"tableName":"{table_name}", "featureId":"{feature_id}", "feature_type":"{feature_type}"'
         extras = f'"coordinates":{{{list_points}}}'
@@ -551,6 +551,9 @@ class ApiConfig(ApiParent):
         if not json_result:
             return False
 
+        # Config flags may have changed: refresh project metadata snapshot
+        self.controller.load_project_metadata()
+
         message = "Values has been updated"
         self.controller.show_info(message)
         # Close dialog
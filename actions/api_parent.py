@@ -13,7 +13,6 @@ from qgis.PyQt.QtGui import QColor, QFontMetrics, QStandardItemModel, QStandardI
 from qgis.PyQt.QtWidgets import QLineEdit, QSizePolicy, QWidget, QComboBox, QGridLayout, QSpacerItem, QLabel, QCheckBox
 from qgis.PyQt.QtWidgets import QCompleter, QToolButton, QFrame, QSpinBox, QDoubleSpinBox, QDateEdit, QAction
 from qgis.PyQt.QtWidgets import QTableView, QTabWidget, QPushButton, QTextEdit, QApplication
-from qgis.PyQt.QtSql import QSqlTableModel
 
 import os
 import re
@@ -24,6 +23,7 @@ from functools import partial
 
 from .. import utils_giswater
 from .parent import ParentAction
+from .gw_table_model import set_model_sort
 from .HyperLinkLabel import HyperLinkLabel
 from ..map_tools.snapping_utils_v3 import SnappingConfigManager
 from ..ui_manager import DialogTextUi
@@ -614,9 +614,7 @@ class ApiParent(ParentAction):
 
         # Set width and alias of visible columns
         columns_to_delete = []
-        sql = (f"SELECT columnindex, width, alias, status FROM config_form_tableview"
-               f" WHERE tablename = '{table_name}' ORDER BY columnindex")
-        rows = self.controller.get_rows(sql, log_info=True)
+        rows = self.controller.get_tableview_config(table_name)
         if not rows:
             return widget
 
@@ -635,8 +633,7 @@ class ApiParent(ParentAction):
         if isQStandardItemModel:
             widget.model().sort(sort_order, Qt.AscendingOrder)
         else:
-            widget.model().setSort(sort_order, Qt.AscendingOrder)
-            widget.model().select()
+            set_model_sort(widget.model(), sort_order, Qt.AscendingOrder)
         # Delete columns
         for column in columns_to_delete:
             widget.hideColumn(column)
@@ -924,12 +921,7 @@ class ApiParent(ParentAction):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.setSort(0, 0)
-        if filter_:
-            model.setFilter(filter_)
+        model = self.create_table_model(table_name, filter_)
         model.select()
 
         # Check for errors
@@ -12,7 +12,6 @@ from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QAbstractItemView, QComboBox, QCompleter, QFileDialog, QGridLayout, QHeaderView, \
     QLabel, QLineEdit, QSizePolicy, QSpacerItem, QTableView, QTabWidget, QWidget
 
-import csv
 import operator
 import os
 import re
@@ -21,6 +20,7 @@ from functools import partial
 
 from .. import utils_giswater
 from .api_cf import ApiCF
+from .gw_table_model import get_select_statement
 from .manage_document import ManageDocument
 from .manage_new_psector import ManageNewPsector
 from .manage_visit import ManageVisit
@@ -290,6 +290,7 @@ class ApiSearch(ApiParent):
         form_search_add = ''
         extras_search_add = ''
         result = None
+        results = []
         index = self.dlg_search.main_tab.currentIndex()
         combo_list = self.dlg_search.main_tab.widget(index).findChildren(QComboBox)
         line_list = self.dlg_search.main_tab.widget(index).findChildren(QLineEdit)
@@ -322,7 +323,19 @@ class ApiSearch(ApiParent):
             extras_search += f'"addSchema":"{qgis_project_add_schema}"'
             extras_search_add += f'"{line_edit.property("columnname")}":{{"text":"{value}"}}'
             body = self.create_body(form=form_search, extras=extras_search)
-            result = self.controller.get_json('gw_fct_setsearch', body, log_sql=True)
+            calls = [('gw_fct_setsearch', body)]
+
+            # Search of second QLineEdit doesn't depend on first one: execute both in a single round trip
+            if len(line_list) == 2:
+                line_edit_add = line_list[1]
+                value = utils_giswater.getWidgetText(self.dlg_search, line_edit_add)
+                if str(value) != 'null':
+                    extras_search_add += f', "{line_edit_add.property("columnname")}":{{"text":"{value}"}}'
+                    body = self.create_body(form=form_search_add, extras=extras_search_add)
+                    calls.append(('gw_fct_setsearchadd', body))
+
+            results = self.controller.get_json_many(calls, log_sql=True)
+            result = results[0]
             if not result:
                 return False
 
@@ -347,15 +360,9 @@ class ApiSearch(ApiParent):
                 display_list.append(data['display_name'])
             self.set_completer_object_api(completer, model, widget, display_list)
 
-        if len(line_list) == 2:
+        if len(results) == 2:
             line_edit_add = line_list[1]
-            value = utils_giswater.getWidgetText(self.dlg_search, line_edit_add)
-            if str(value) == 'null':
-                return
-
-            extras_search_add += f', "{line_edit_add.property("columnname")}":{{"text":"{value}"}}'
-            body = self.create_body(form=form_search_add, extras=extras_search_add)
-            result = self.controller.get_json('gw_fct_setsearchadd', body, log_sql=True)
+            result = results[1]
             if not result:
                 return False
 
@@ -680,6 +687,7 @@ class ApiSearch(ApiParent):
 
 
     def export_to_csv(self, dialog, qtable_1=None, qtable_2=None, path=None):
+        """ Export rows of models of @qtable_1 and @qtable_2 to CSV file set in @path, in background """
 
         folder_path = utils_giswater.getWidgetText(dialog, path)
         if folder_path is None or folder_path == 'null':
@@ -690,56 +698,43 @@ class ApiSearch(ApiParent):
         if folder_path.find('.csv') == -1:
             folder_path += '.csv'
         if qtable_1:
-            model_1 = qtable_1.model()
+            queries = [self.get_export_query(qtable_1)]
         else:
             return
 
-        model_2 = None
         if qtable_2:
-            model_2 = qtable_2.model()
-
-        # Convert qtable values into list
-        all_rows = []
-        headers = []
-        for i in range(0, model_1.columnCount()):
-            headers.append(str(model_1.headerData(i, Qt.Horizontal)))
-        all_rows.append(headers)
-        for rows in range(0, model_1.rowCount()):
-            row = []
-            for col in range(0, model_1.columnCount()):
-                row.append(str(model_1.data(model_1.index(rows, col))))
-            all_rows.append(row)
-        if qtable_2 is not None:
-            headers = []
-            for i in range(0, model_2.columnCount()):
-                headers.append(str(model_2.headerData(i, Qt.Horizontal)))
-            all_rows.append(headers)
-            for rows in range(0, model_2.rowCount()):
-                row = []
-                for col in range(0, model_2.columnCount()):
-                    row.append(str(model_2.data(model_2.index(rows, col))))
-                all_rows.append(row)
-
-        # Write list into csv file
-        try:
-            if os.path.exists(folder_path):
-                msg = "Are you sure you want to overwrite this file?"
-                answer = self.controller.ask_question(msg, "Overwrite")
-                if answer:
-                    self.write_to_csv(dialog, folder_path, all_rows)
-            else:
-                self.write_to_csv(dialog, folder_path, all_rows)
-        except:
-            msg = "File path doesn't exist or you dont have permission or file is opened"
-            self.controller.show_warning(msg)
-            pass
+            queries.append(self.get_export_query(qtable_2))
+
+        if os.path.exists(folder_path):
+            msg = "Are you sure you want to overwrite this file?"
+            answer = self.controller.ask_question(msg, "Overwrite")
+            if not answer:
+                return
+
+        self.export_csv([sql for sql, header in queries], folder_path,
+                        partial(self.export_to_csv_finished, dialog, folder_path),
+                        [header for sql, header in queries])
 
 
-    def write_to_csv(self, dialog, folder_path=None, all_rows=None):
+    def get_export_query(self, qtable):
+        """ Return query of columns shown in @qtable and list of their aliases (set by set_table_columns) """
+
+        model = qtable.model()
+        columns = [column for column in range(model.columnCount()) if not qtable.isColumnHidden(column)]
+        fields = ", ".join('"' + model.record().fieldName(column).replace('"', '""') + '"' for column in columns)
+        header = [str(model.headerData(column, Qt.Horizontal)) for column in columns]
+        sql = f"SELECT {fields} FROM ({get_select_statement(model)}) AS export_rows"
+
+        return sql, header
+
+
+    def export_to_csv_finished(self, dialog, folder_path, status, rows_written):
+
+        if not status:
+            msg = "File path doesn't exist or you dont have permission or file is opened"
+            self.controller.show_warning(msg, parameter=folder_path)
+            return
 
-        with open(folder_path, "w") as output:
-            writer = csv.writer(output, lineterminator='\n')
-            writer.writerows(all_rows)
         self.controller.plugin_settings_set_value("search_csv_path", utils_giswater.getWidgetText(dialog, 'txt_path'))
         message = "The csv file has been successfully exported"
         self.controller.show_info(message)
@@ -772,10 +767,7 @@ class ApiSearch(ApiParent):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnFieldChange)
-        model.setSort(0, 0)
+        model = self.create_table_model(table_name, expr, QSqlTableModel.OnFieldChange)
         model.select()
 
         widget.setEditTriggers(set_edit_triggers)
@@ -783,11 +775,7 @@ class ApiSearch(ApiParent):
         if model.lastError().isValid():
             self.controller.show_warning(model.lastError().text())
         # Attach model to table view
-        if expr:
-            widget.setModel(model)
-            widget.model().setFilter(expr)
-        else:
-            widget.setModel(model)
+        widget.setModel(model)
 
 
     def open_feature_form(self, qtable):
@@ -5,13 +5,14 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import Qgis
+from qgis.core import Qgis, QgsApplication
 from qgis.PyQt.QtWidgets import QCheckBox, QGridLayout, QLabel, QSizePolicy
 
 import platform
 from functools import partial
 
 from .api_parent import ApiParent
+from .task_check_project import TaskCheckProject
 from ..ui_manager import ProjectCheckUi
 
 
@@ -26,10 +27,36 @@ class CheckProjectResult(ApiParent):
     def populate_audit_check_project(self, layers, init_project):
         """ Fill table 'audit_check_project' with layers data """
 
+        sql = self.get_audit_check_project_sql(layers)
+        status = self.controller.execute_sql(sql)
+        if not status:
+            return False, None
+
+        # Execute function 'gw_fct_audit_check_project'
+        result = self.execute_audit_check_project(init_project)
+
+        return True, result
+
+
+    def populate_audit_check_project_task(self, layers, init_project, callback=None):
+        """ Fill table 'audit_check_project' with layers data as a background task
+            :param callback: Function called with (status, result) when task has finished
+        """
+
+        # Layers data must be read here, from the main thread
+        sql = self.get_audit_check_project_sql(layers)
+        description = "Check project"
+        self.task_check_project = TaskCheckProject(description, self.controller, self, sql, init_project, callback)
+        QgsApplication.taskManager().addTask(self.task_check_project)
+        QgsApplication.taskManager().triggerTask(self.task_check_project)
+
+
+    def get_audit_check_project_sql(self, layers):
+        """ Return SQL that replaces the layers data of table 'audit_check_project' in a single round trip """
+
         sql = ("DELETE FROM audit_check_project "
-               "WHERE cur_user = current_user AND fid = 101")
-        self.controller.execute_sql(sql)
-        sql = ""
+               "WHERE cur_user = current_user AND fid = 101;")
+        values = []
         for layer in layers:
             if layer is None:
                 continue
@@ -52,23 +79,28 @@ class CheckProjectResult(ApiParent):
                 db_name = layer_source['db']
                 host_name = layer_source['host']
                 table_user = layer_source['user']
-                sql += (f"\nINSERT INTO audit_check_project "
-                        f"(table_schema, table_id, table_dbname, table_host, fid, table_user) "
-                        f"VALUES ('{schema_name}', '{table_name}', '{db_name}', '{host_name}', 101, '{table_user}');")
+                values.append(f"('{schema_name}', '{table_name}', '{db_name}', '{host_name}', 101, '{table_user}')")
 
-        status = self.controller.execute_sql(sql)
-        if not status:
-            return False, None
+        if values:
+            sql += ("\nINSERT INTO audit_check_project "
+                    "(table_schema, table_id, table_dbname, table_host, fid, table_user) "
+                    "VALUES " + ",\n".join(values) + ";")
 
-        # Execute function 'gw_fct_audit_check_project'
-        result = self.execute_audit_check_project(init_project)
-
-        return True, result
+        return sql
 
 
     def execute_audit_check_project(self, init_project):
         """ Execute function 'gw_fct_audit_check_project' """
 
+        result = self.get_audit_check_project_result(init_project)
+        self.manage_audit_check_project_result(result)
+
+        return result
+
+
+    def get_audit_check_project_result(self, init_project):
+        """ Execute function 'gw_fct_audit_check_project' and return its result """
+
         # get project variables
         add_schema = self.controller.plugin_settings_value('gwAddSchema')
         main_schema = self.controller.plugin_settings_value('gwMainSchema')
@@ -90,18 +122,23 @@ class CheckProjectResult(ApiParent):
         extras += f', "osVersion":"{platform.system()} {platform.release()}"'
         body = self.create_body(extras=extras)
         result = self.controller.get_json('gw_fct_audit_check_project', body, log_sql=True)
+
+        return result
+
+
+    def manage_audit_check_project_result(self, result):
+        """ Show dialog with audit check project result, unless it has to be hidden """
+
         try:
             if not result or (result['body']['actions']['hideForm'] == True):
-                return result
+                return
         except KeyError as e:
             self.controller.log_warning(f"EXCEPTION: {type(e).__name__}, {e}")
-            return result
+            return
 
         # Show dialog with audit check project result
         self.show_check_project_result(result)
 
-        return result
-
 
     def show_check_project_result(self, result):
         """ Show dialog with audit check project result """
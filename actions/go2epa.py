@@ -11,7 +11,6 @@ from qgis.PyQt.QtWidgets import QAbstractItemView, QWidget, QCheckBox, QDateEdit
     QFileDialog
 from qgis.PyQt.QtGui import QRegExpValidator
 
-import csv
 import os
 import sys
 
@@ -494,41 +493,29 @@ class Go2Epa(ApiParent):
 
 
     def csv_audit_check_data(self, tablename, filename):
+        """ Export errors of current result found in @tablename to CSV file @filename of log folder """
 
-        # Get columns name in order of the table
-        rows = self.controller.get_columns_list(tablename)
-        if not rows:
-            message = "Table not found"
-            self.controller.show_warning(message, parameter=tablename)
-            return
-
-        columns = []
-        for i in range(0, len(rows)):
-            column_name = rows[i]
-            columns.append(str(column_name[0]))
         sql = (f"SELECT table_id, column_id, error_message"
                f" FROM {tablename}"
                f" WHERE fid = 114 AND result_id = '{self.project_name}'")
-        rows = self.controller.get_rows(sql)
-        if not rows:
+        path = self.controller.get_log_folder() + filename
+        header = ["Table", "Column", "Error message"]
+        self.export_csv(sql, path, partial(self.csv_audit_check_data_finished, path), header)
+
+
+    def csv_audit_check_data_finished(self, path, status, rows_written):
+
+        if status and rows_written == 0:
+            # Don't leave a file with only the header
+            try:
+                os.remove(path)
+            except OSError:
+                pass
             message = "No records found with selected 'result_id'"
             self.controller.show_warning(message, parameter=self.project_name)
             return
 
-        all_rows = []
-        all_rows.append(columns)
-        for i in rows:
-            all_rows.append(i)
-        path = self.controller.get_log_folder() + filename
-        try:
-            with open(path, "w") as output:
-                writer = csv.writer(output, lineterminator='\n')
-                writer.writerows(all_rows)
-            message = "File created successfully"
-            self.controller.show_info(message, parameter=path)
-        except IOError:
-            message = "File cannot be created. Check if it is already opened"
-            self.controller.show_warning(message, parameter=path)
+        self.export_csv_finished(path, status, rows_written)
 
 
     def save_file_parameters(self):
@@ -0,0 +1,232 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import QModelIndex, Qt
+from qgis.PyQt.QtSql import QSqlQuery, QSqlRecord, QSqlTableModel
+from sip import isdeleted
+
+import json
+
+
+class GwTableModel(QSqlTableModel):
+    """ QSqlTableModel that is meant to be configured (table, filter and sort) before its first select,
+        and that fetches rows from database in pages of @page_size rows using LIMIT and OFFSET clauses.
+        First page is selected by the table model itself. When the view scrolls to the end of the loaded rows,
+        fetchMore() appends the next page to the model without selecting it again.
+        Rows of appended pages are read-only, so models edited in the view must not be paged """
+
+    def __init__(self, parent=None, db=None, page_size=0):
+
+        if db is None:
+            super().__init__(parent)
+        else:
+            super().__init__(parent, db)
+        self.page_size = page_size
+        self.row_limit = page_size
+        self.has_more_rows = False
+        self.page_records = []
+        self.estimated_rows = None
+        self.row_count_widget = None
+        self.sort_column = None
+        self.sort_order = None
+
+
+    def setSort(self, column, order):
+
+        self.sort_column = column
+        self.sort_order = order
+        super().setSort(column, order)
+
+
+    def setFilter(self, filter_):
+
+        # New filter starts again from the first page
+        self.row_limit = self.page_size
+        super().setFilter(filter_)
+
+
+    def is_sorted_by(self, column, order):
+        """ Check if model is already sorted by @column and @order """
+
+        return self.sort_column == column and self.sort_order == order
+
+
+    def selectStatement(self):
+
+        statement = super().selectStatement()
+        if statement and self.row_limit > 0:
+            statement += f" LIMIT {self.row_limit}"
+
+        return statement
+
+
+    def select(self):
+
+        self.page_records = []
+        self.estimated_rows = None
+        status = super().select()
+        self.has_more_rows = bool(status and self.row_limit > 0 and super().rowCount() >= self.row_limit)
+        self.update_row_count()
+        return status
+
+
+    def rowCount(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return 0
+
+        return super().rowCount() + len(self.page_records)
+
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        row = index.row() - super().rowCount()
+        if not index.isValid() or row < 0:
+            return super().data(index, role)
+
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.page_records[row].value(index.column())
+
+        return None
+
+
+    def flags(self, index):
+
+        if index.isValid() and index.row() >= super().rowCount():
+            return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+        return super().flags(index)
+
+
+    def record(self, *args):
+
+        if args and args[0] >= super().rowCount():
+            return QSqlRecord(self.page_records[args[0] - super().rowCount()])
+
+        return super().record(*args)
+
+
+    def canFetchMore(self, parent=QModelIndex()):
+
+        if super().canFetchMore(parent):
+            return True
+
+        # Don't add rows to model while it has pending changes
+        return self.has_more_rows and not self.isDirty()
+
+
+    def fetchMore(self, parent=QModelIndex()):
+
+        if super().canFetchMore(parent):
+            super().fetchMore(parent)
+            return
+
+        if not self.has_more_rows or self.isDirty():
+            return
+
+        # Select only next page, appending its rows after the loaded ones
+        limit = self.row_limit
+        self.row_limit = 0
+        statement = self.selectStatement()
+        self.row_limit = limit
+        loaded = self.rowCount()
+        query = QSqlQuery(self.database())
+        if not query.exec_(f"{statement} LIMIT {self.page_size} OFFSET {loaded}"):
+            self.has_more_rows = False
+            return
+
+        records = []
+        while query.next():
+            records.append(query.record())
+        self.has_more_rows = len(records) >= self.page_size
+        if records:
+            self.beginInsertRows(QModelIndex(), loaded, loaded + len(records) - 1)
+            self.page_records.extend(records)
+            self.endInsertRows()
+        self.update_row_count()
+
+
+    def fetch_all(self):
+        """ Load all remaining rows of the model """
+
+        if not self.has_more_rows or self.isDirty():
+            return
+
+        self.row_limit = 0
+        self.select()
+
+
+    def estimated_row_count(self):
+        """ Return number of rows of the model estimated by database planner, without executing its query.
+            Estimation is done once after every select """
+
+        if not self.has_more_rows:
+            return self.rowCount()
+
+        if self.estimated_rows is None:
+            self.estimated_rows = 0
+            query = QSqlQuery(self.database())
+            if query.exec_(f"EXPLAIN (FORMAT JSON) {get_select_statement(self)}") and query.next():
+                try:
+                    plan = json.loads(query.value(0))
+                    self.estimated_rows = int(plan[0]['Plan']['Plan Rows'])
+                except (ValueError, KeyError, IndexError, TypeError):
+                    pass
+
+        return max(self.estimated_rows, self.rowCount())
+
+
+    def set_row_count_widget(self, widget):
+        """ Show number of loaded rows and estimated total of rows in the tooltip of view @widget """
+
+        self.row_count_widget = widget
+        self.update_row_count()
+
+
+    def update_row_count(self):
+
+        widget = self.row_count_widget
+        if widget is None or isdeleted(widget):
+            return
+
+        if self.has_more_rows:
+            widget.setToolTip(f"Rows: {self.rowCount()} of ~{self.estimated_row_count()} (scroll to load more)")
+        else:
+            widget.setToolTip(f"Rows: {self.rowCount()}")
+
+
+def set_model_sort(model, column, order):
+    """ Sort @model by @column and @order. Models already sorted that way are not selected again """
+
+    if isinstance(model, GwTableModel) and model.is_sorted_by(column, order):
+        return
+
+    model.setSort(column, order)
+    model.select()
+
+
+def fetch_all_rows(model):
+    """ Load all rows of @model if it is a paged model, before iterating over them """
+
+    if isinstance(model, GwTableModel):
+        model.fetch_all()
+
+    return model
+
+
+def get_select_statement(model):
+    """ Return query of all rows of table @model, with its filter and sort, without paging """
+
+    if not isinstance(model, GwTableModel):
+        return model.selectStatement()
+
+    limit = model.row_limit
+    model.row_limit = 0
+    try:
+        return model.selectStatement()
+    finally:
+        model.row_limit = limit
@@ -7,7 +7,7 @@ or (at your option) any later version.
 # -*- coding: latin-1 -*-
 from qgis.core import QgsProject
 from qgis.gui import QgsDateTimeEdit
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import Qt, QTimer
 from qgis.PyQt.QtGui import QColor, QIcon, QStandardItemModel, QStandardItem
 from qgis.PyQt.QtWidgets import QSpinBox, QDoubleSpinBox, QTextEdit, QWidget, QLabel, QLineEdit, QComboBox, QCheckBox, \
     QGridLayout, QRadioButton, QAbstractItemView
@@ -34,6 +34,7 @@ class GwToolBox(ApiParent):
         self.rbt_checked = {}
         self.is_paramtetric = True
         self.no_clickable_items = ['Giswater']
+        self.task_function = None
 
 
     def set_project_type(self, project_type):
@@ -112,8 +113,7 @@ class GwToolBox(ApiParent):
         self.dlg_functions.btn_run.clicked.connect(partial(self.execute_function, self.dlg_functions,
                                                    self.dlg_functions.cmb_layers, json_result['body']['data']))
         self.dlg_functions.btn_close.clicked.connect(partial(self.close_dialog, self.dlg_functions))
-        self.dlg_functions.btn_cancel.clicked.connect(partial(self.remove_layers))
-        self.dlg_functions.btn_cancel.clicked.connect(partial(self.close_dialog, self.dlg_functions))
+        self.dlg_functions.btn_cancel.clicked.connect(partial(self.cancel_function, self.dlg_functions))
         enable_btn_run = index.sibling(index.row(), 2).data()
         bool_dict = {"True": True, "true": True, "False": False, "false": False}
         self.dlg_functions.btn_run.setEnabled(bool_dict[enable_btn_run])
@@ -361,37 +361,132 @@ class GwToolBox(ApiParent):
             extras += '}'
 
         body = self.create_body(feature=feature_field, extras=extras)
-        json_result = self.controller.get_json(function_name, body)
+        row = self.controller.check_function(function_name)
+        if row in (None, ''):
+            self.controller.show_warning("Function not found in database", parameter=function_name)
+            self.reset_progress_bar(dialog)
+            return False
+
+        # Execute function in background with its own connection, showing messages raised by the server
+        dialog.txt_info.clear()
+        dialog.btn_run.setEnabled(False)
+        dialog.btn_cancel.setEnabled(True)
+        self.task_function = self.execute_in_background(f"Toolbox: {function_name}",
+            partial(self.execute_function_task, function_name, body),
+            callback=partial(self.execute_function_finished, dialog, function_name, body), start=False, async_=True)
+        self.task_function.message_received.connect(partial(self.show_function_message, dialog))
+        self.task_function.progressChanged.connect(partial(self.show_function_progress, dialog))
+        self.task_function.start()
+
+
+    def execute_function_task(self, function_name, body, task):
+        """ Execute toolbox function @function_name with connection of background @task """
+
+        return task.get_json(function_name, body)
+
+
+    def show_function_message(self, dialog, message):
+        """ Show @message raised by toolbox function while it is running """
+
+        dialog.txt_info.append(message)
+        dialog.progressBar.setFormat(message)
+
+
+    def show_function_progress(self, dialog, progress):
+        """ Show @progress of toolbox function, if it reports percentages in its messages """
+
+        dialog.progressBar.setMaximum(100)
+        dialog.progressBar.setValue(int(progress))
+
+
+    def cancel_function(self, dialog):
+        """ Cancel toolbox function being executed. If none is running, close dialog """
+
+        if self.task_function:
+            self.task_function.cancel()
+            return
+
+        self.remove_layers()
+        self.close_dialog(dialog)
+
+
+    def reset_progress_bar(self, dialog):
+
         dialog.progressBar.setAlignment(Qt.AlignCenter)
         dialog.progressBar.setMinimum(0)
         dialog.progressBar.setMaximum(1)
         dialog.progressBar.setValue(1)
+
+
+    def execute_function_finished(self, dialog, function_name, body, status, json_result):
+        """ Manage result of toolbox function executed in background """
+
+        task = self.task_function
+        self.task_function = None
+        try:
+            dialog.btn_run.setEnabled(True)
+            dialog.btn_cancel.setEnabled(True)
+            self.reset_progress_bar(dialog)
+        except RuntimeError:
+            # Dialog has been closed while function was running
+            return
+
+        if task and task.isCanceled():
+            dialog.progressBar.setFormat(f"Function: {function_name} canceled")
+            return False
+
+        if not status and task and task.last_error:
+            dialog.progressBar.setFormat(f"Function: {function_name} failed. See log file for more details")
+            return False
+
         if json_result is None:
             dialog.progressBar.setFormat(f"Function: {function_name} executed with no result")
             return True
 
+        json_result = self.controller.manage_json_result(json_result, f"SELECT {function_name}({body});")
         if not json_result:
             dialog.progressBar.setFormat(f"Function: {function_name} failed. See log file for more details")
             return False
 
         try:
             dialog.progressBar.setFormat(f"Function {function_name} has finished")
-            self.add_layer.add_temp_layer(dialog, json_result['body']['data'], self.alias_function, True, True, 1, True)
-            self.add_layer.set_layers_visible(json_result['body']['data']['setVisibleLayers'])
-
-            # getting simbology capabilities
-            if 'setStyle' in json_result['body']['data']:
-                set_sytle = json_result['body']['data']['setStyle']
-                if set_sytle == "Mapzones":
-                    # call function to simbolize mapzones
-                    self.set_style_mapzones()
-
+            data = json_result['body']['data']
+            visible_layers = data['setVisibleLayers']
         except KeyError as e:
             msg = f"<b>Key: </b>{e}<br>"
             msg += f"<b>key container: </b>'body/data/ <br>"
             msg += f"<b>Python file: </b>{__name__} <br>"
             msg += f"<b>Python function:</b> {self.execute_function.__name__} <br>"
             self.show_exceptions_msg("Key on returned json from ddbb is missed.", msg)
+            self.remove_layers()
+            return False
+
+        # Load result layers one by one, letting QGIS repaint between them
+        geometry_keys = [key for key in ('point', 'line', 'polygon') if key in data]
+        parts = [{key: value for key, value in data.items() if key not in geometry_keys}]
+        parts += [{key: data[key]} for key in geometry_keys]
+        self.load_function_layers(dialog, parts, self.alias_function, visible_layers, data.get('setStyle'))
+        return True
+
+
+    def load_function_layers(self, dialog, parts, layer_name, visible_layers, style):
+        """ Add first item of @parts of the result of a toolbox function and schedule the next one """
+
+        if parts:
+            part = parts.pop(0)
+            result = self.add_layer.add_temp_layer(dialog, part, layer_name, True, 'info' in part, 1, True)
+            # Only first layer added is named as the function
+            if result['temp_layers_added']:
+                layer_name = None
+            QTimer.singleShot(0, partial(self.load_function_layers, dialog, parts, layer_name, visible_layers, style))
+            return
+
+        self.add_layer.set_layers_visible(visible_layers)
+
+        # getting simbology capabilities
+        if style == "Mapzones":
+            # call function to simbolize mapzones
+            self.set_style_mapzones()
 
         self.remove_layers()
 
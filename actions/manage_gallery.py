@@ -7,14 +7,11 @@ or (at your option) any later version.
 # -*- coding: utf-8 -*-
 from qgis.PyQt.QtWidgets import QLabel, QPushButton, QLineEdit
 from qgis.PyQt.QtGui import QPixmap
-from qgis.PyQt.QtCore import Qt
-
-import urllib.request
-import urllib.error
-import urllib.parse
+import os
 from functools import partial
 
 from . import ExtendedQLabel
+from .thumbnail_service import ThumbnailService, read_image_data
 from ..ui_manager import Gallery
 from ..ui_manager import GalleryZoom
 from .parent_manage import ParentManage
@@ -22,6 +19,9 @@ from .parent_manage import ParentManage
 
 class ManageGallery(ParentManage):
 
+    # Service that loads thumbnails in background, shared by all galleries
+    thumbnail_service = None
+
     def __init__(self, iface, settings, controller, plugin_dir):
         """ Class to control 'Add element' of toolbar 'edit' """
         ParentManage.__init__(self, iface, settings, controller, plugin_dir)
@@ -34,9 +34,25 @@ class ManageGallery(ParentManage):
         self.load_settings(self.dlg_gallery)
 
 
+    def get_thumbnail_service(self):
+        """ Get service that loads thumbnails in background, shared by all galleries """
+
+        if ManageGallery.thumbnail_service is None:
+            cache_folder = os.path.join(os.path.expanduser("~"), self.controller.plugin_name, "cache", "thumbnails")
+            disk_size = 100
+            if self.settings is not None:
+                try:
+                    disk_size = int(self.settings.value('system_variables/thumbnail_cache_size', disk_size))
+                except (TypeError, ValueError):
+                    pass
+            ManageGallery.thumbnail_service = ThumbnailService(cache_folder, disk_size=disk_size * 1024 * 1024,
+                                                               controller=self.controller)
+
+        return ManageGallery.thumbnail_service
+
+
     def fill_gallery(self, visit_id, event_id):
 
-        self.img_path_list = []
         self.img_path_list1D = []
 
         # Get all pictures for event_id | visit_id
@@ -59,53 +75,16 @@ class ManageGallery(ParentManage):
         for k in range(0, limit):  # @UnusedVariable
             self.img_path_list1D.append(0)
 
-        # Inicialization of two-dimensional array
-        rows = (self.num_events / 9) + 1
-        columns = 9
-        rows = self.num_events
-        self.img_path_list = [[0 for x in range(columns)] for x in range(rows)]  # @UnusedVariable
-
-        # Convert one-dimensional array to two-dimensional array
-        # Fill self.img_path_list with values from self.img_path_list1D
-        idx = 0
-        if rows == 1:
-            for br in range(0, len(self.img_path_list1D)):
-                self.img_path_list[0][br] = self.img_path_list1D[br]
-        else:
-            for h in range(0, rows):
-                for r in range(0, columns - 1):
-                    if idx >= columns:
-                        break
-                    self.img_path_list[h][r] = self.img_path_list1D[idx]
-                    idx = idx + 1
-
         # List of pointers(in memory) of clicableLabels
         self.list_widget = []
         self.list_labels = []
 
-        # Fill first slide of gallery
+        # Create clickable labels of the 9 images of every page
         for i in range(0, 9):
             widget_name = "img_" + str(i)
             widget = self.dlg_gallery.findChild(QLabel, widget_name)
             if widget:
-                # Set image to QLabel
-
-                # Parse a URL into components
-                url = urllib.parse.urlsplit(str(self.img_path_list[0][i]))
-
-                # Check if path is URL
-                if url.scheme == "http" or url.scheme == "https":
-                    url = str(self.img_path_list[0][i])
-                    data = urllib.request.urlopen(url).read()
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(data)
-
-                else:
-                    pixmap = QPixmap(str(self.img_path_list[0][i]))
-
-                pixmap = pixmap.scaled(171, 151, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
                 widget_extended = ExtendedQLabel.ExtendedQLabel(widget)
-                widget_extended.setPixmap(pixmap)
                 widget_extended.clicked.connect(partial(self.zoom_img, i, visit_id, event_id))
                 self.list_widget.append(widget_extended)
                 self.list_labels.append(widget)
@@ -115,7 +94,10 @@ class ManageGallery(ParentManage):
         txt_event_id = self.dlg_gallery.findChild(QLineEdit, 'event_id')
         txt_event_id.setText(str(event_id))
 
+        # Fill first slide of gallery
         self.start_indx = 0
+        self.show_page(self.start_indx)
+
         self.btn_next = self.dlg_gallery.findChild(QPushButton, "btn_next")
         self.btn_next.clicked.connect(self.next_gallery)
         self.btn_previous = self.dlg_gallery.findChild(QPushButton, "btn_previous")
@@ -133,31 +115,61 @@ class ManageGallery(ParentManage):
         self.open_dialog(self.dlg_gallery, dlg_name='visit_gallery', maximize_button=False)
 
 
-    def next_gallery(self):
+    def get_page_paths(self, page):
+        """ Get paths of the images of @page, without void ones """
 
-        self.start_indx = self.start_indx + 1
+        paths = self.img_path_list1D[page * 9:(page + 1) * 9]
+        return [path if path not in (0, None, '') else None for path in paths]
 
-        # Clear previous
-        for i in self.list_widget:
-            i.clear()
 
-        # Add new 9 images
-        for i in range(0, 9):
+    def show_page(self, page):
+        """ Show thumbnails of images of @page, loaded in background, and prefetch the next page """
+
+        service = self.get_thumbnail_service()
+        service.cancel_callbacks()
+        paths = self.get_page_paths(page)
+        for i, widget in enumerate(self.list_widget):
+            widget.clear()
+            if i < len(paths) and paths[i]:
+                service.request(paths[i], partial(self.set_thumbnail, page, i))
+
+        service.prefetch([path for path in self.get_page_paths(page + 1) if path])
+
+
+    def set_thumbnail(self, page, i, path, image):
+        """ Set thumbnail @image of @path in label @i, if its @page is still shown """
+
+        if page != self.start_indx or image.isNull():
+            return
 
-            # Parse a URL into components
-            url = urllib.parse.urlsplit(str(self.img_path_list[self.start_indx][i]))
+        try:
+            self.list_widget[i].setPixmap(QPixmap.fromImage(image))
+        except RuntimeError:
+            # Gallery has been closed while thumbnail was loading
+            pass
 
-            # Check if path is URL
-            if url.scheme == "http" or url.scheme == "https":
-                url = str(self.img_path_list[self.start_indx][i])
-                data = urllib.request.urlopen(url).read()
-                pixmap = QPixmap()
-                pixmap.loadFromData(data)
-            else:
-                pixmap = QPixmap(str(self.img_path_list[self.start_indx][i]))
 
-            pixmap = pixmap.scaled(171, 151, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-            self.list_widget[i].setPixmap(pixmap)
+    def load_pixmap(self, path):
+        """ Load full size image of @path (local file or URL) """
+
+        pixmap = QPixmap()
+        if path in (0, None, ''):
+            return pixmap
+
+        try:
+            pixmap.loadFromData(read_image_data(path))
+        except Exception as e:
+            self.controller.log_warning(str(e), parameter=path)
+
+        return pixmap
+
+
+    def next_gallery(self):
+
+        self.start_indx = self.start_indx + 1
+
+        # Add new 9 images
+        self.show_page(self.start_indx)
 
         # Control sliding buttons
         if self.start_indx > 0:
@@ -174,27 +186,8 @@ class ManageGallery(ParentManage):
 
         self.start_indx = self.start_indx - 1
 
-        # First clear previous
-        for i in self.list_widget:
-            i.clear()
-
         # Add new 9 images
-        for i in range(0, 9):
-
-            # Parse a URL into components
-            url = urllib.parse.urlsplit(str(self.img_path_list[self.start_indx][i]))
-
-            # Check if path is URL
-            if url.scheme == "http" or url.scheme == "https":
-                url = str(self.img_path_list[self.start_indx][i])
-                data = urllib.request.urlopen(url).read()
-                pixmap = QPixmap()
-                pixmap.loadFromData(data)
-            else:
-                pixmap = QPixmap(str(self.img_path_list[self.start_indx][i]))
-
-            pixmap = pixmap.scaled(171, 151, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-            self.list_widget[i].setPixmap(pixmap)
+        self.show_page(self.start_indx)
 
         # Control sliding buttons
         if self.start_indx == 0:
@@ -213,18 +206,7 @@ class ManageGallery(ParentManage):
         self.load_settings(self.dlg_gallery_zoom)
         self.lbl_img = self.dlg_gallery_zoom.findChild(QLabel, "lbl_img_zoom")
 
-        # Parse a URL into components
-        url = urllib.parse.urlsplit(str(self.img_path_list[self.start_indx][i]))
-
-        # Check if path is URL
-        if url.scheme == "http" or url.scheme == "https":
-            url = str(self.img_path_list[self.start_indx][i])
-            data = urllib.request.urlopen(url).read()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-        else:
-            pixmap = QPixmap(str(self.img_path_list[self.start_indx][i]))
-
+        pixmap = self.load_pixmap(self.img_path_list1D[(self.start_indx * 9) + i])
         self.lbl_img.setPixmap(pixmap)
 
         # lbl_img.show()
@@ -257,17 +239,7 @@ class ManageGallery(ParentManage):
 
         indx = (self.start_indx * 9) + self.i - 1
 
-        # Parse a URL into components
-        url = urllib.parse.urlsplit(str(self.img_path_list1D[indx]))
-
-        # Check if path is URL
-        if url.scheme == "http" or url.scheme == "https":
-            url = str(self.img_path_list1D[indx])
-            data = urllib.request.urlopen(url).read()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-        else:
-            pixmap = QPixmap(str(self.img_path_list1D[indx]))
+        pixmap = self.load_pixmap(self.img_path_list1D[indx])
 
         self.lbl_img.setPixmap(pixmap)
         self.i = self.i - 1
@@ -284,18 +256,7 @@ class ManageGallery(ParentManage):
 
         indx = (self.start_indx * 9) + self.i + 1
 
-        # Parse a URL into components
-        url = urllib.parse.urlsplit(str(self.img_path_list1D[indx]))
-
-        # Check if path is URL
-        if url.scheme == "http" or url.scheme == "https":
-            url = str(self.img_path_list1D[indx])
-            data = urllib.request.urlopen(url).read()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-
-        else:
-            pixmap = QPixmap(str(self.img_path_list1D[indx]))
+        pixmap = self.load_pixmap(self.img_path_list1D[indx])
 
         self.lbl_img.setPixmap(pixmap)
         self.i = self.i + 1
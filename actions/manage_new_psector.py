@@ -5,14 +5,13 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsLayoutExporter, QgsPointXY, QgsProject, QgsRectangle
+from qgis.core import QgsPointXY, QgsProject, QgsRectangle
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtGui import QDoubleValidator, QIntValidator, QKeySequence
 from qgis.PyQt.QtSql import QSqlQueryModel, QSqlTableModel
-from qgis.PyQt.QtWidgets import QAbstractItemView, QAction, QCheckBox, QComboBox, QDateEdit, QLabel, \
+from qgis.PyQt.QtWidgets import QAbstractItemView, QCheckBox, QComboBox, QDateEdit, QLabel, \
     QLineEdit, QTableView
 
-import csv
 import json
 import os
 import operator
@@ -25,14 +24,19 @@ from ..ui_manager import Plan_psector
 from ..ui_manager import PsectorRapportUi
 from .parent_manage import ParentManage
 from .multiple_selection import MultipleSelection
+from .psector_budget import PsectorBudget
 from .manage_document import ManageDocument
 
 
 class ManageNewPsector(ParentManage):
 
+    budget_sources = {'arc': ('v_plan_arc', 'total_budget', 'total_arc'),
+                      'node': ('v_plan_node', 'budget', 'total_node')}
+
     def __init__(self, iface, settings, controller, plugin_dir):
         """ Class to control 'New Psector' of toolbar 'master' """
         ParentManage.__init__(self, iface, settings, controller, plugin_dir)
+        self.budget = None
 
 
     def new_psector(self, psector_id=None, plan_om=None, is_api=False):
@@ -43,6 +47,7 @@ class ManageNewPsector(ParentManage):
             self.sys_currency = json.loads(row[0], object_pairs_hook=OrderedDict)
 
         # Create the dialog and signals
+        self.budget = None
         self.dlg_plan_psector = Plan_psector()
         self.load_settings(self.dlg_plan_psector)
         self.plan_om = str(plan_om)
@@ -357,8 +362,6 @@ class ManageNewPsector(ParentManage):
 
         self.lbl_descript = self.dlg_plan_psector.findChild(QLabel, "lbl_descript")
         self.dlg_plan_psector.all_rows.clicked.connect(partial(self.show_description))
-        self.dlg_plan_psector.btn_select.clicked.connect(partial(self.update_total,
-            self.dlg_plan_psector, self.dlg_plan_psector.selected_rows))
         self.dlg_plan_psector.btn_unselect.clicked.connect(partial(self.update_total,
             self.dlg_plan_psector, self.dlg_plan_psector.selected_rows))
         self.dlg_plan_psector.btn_insert.clicked.connect(partial(self.insert_feature,
@@ -374,8 +377,9 @@ class ManageNewPsector(ParentManage):
             self.dlg_plan_psector, table_object, excluded_layers=["v_edit_element"]))
         self.dlg_plan_psector.name.textChanged.connect(partial(self.enable_relation_tab, 'plan_psector'))
         viewname = 'v_edit_plan_psector_x_other'
-        self.dlg_plan_psector.txt_name.textChanged.connect(partial(self.query_like_widget_text, self.dlg_plan_psector,
-            self.dlg_plan_psector.txt_name, self.dlg_plan_psector.all_rows, 'v_price_compost', viewname, "id"))
+        self.dlg_plan_psector.txt_name.textChanged.connect(partial(self.debounce_call, 'txt_name',
+            partial(self.query_like_widget_text, self.dlg_plan_psector, self.dlg_plan_psector.txt_name,
+                    self.dlg_plan_psector.all_rows, 'v_price_compost', viewname, "id")))
 
         self.dlg_plan_psector.gexpenses.returnPressed.connect(partial(self.calulate_percents,
             'plan_psector', 'gexpenses'))
@@ -607,148 +611,89 @@ class ManageNewPsector(ParentManage):
 
 
     def generate_composer(self, path):
-        # Get layout manager object
-        layout_manager = QgsProject.instance().layoutManager()
+        """ Export layout selected in dialog of current psector to PDF file @path in background,
+            without opening the layout designer """
 
-        # Get our layout
         layout_name = utils_giswater.getWidgetText(self.dlg_psector_rapport, self.dlg_psector_rapport.cmb_templates)
-        layout = layout_manager.layoutByName(layout_name)
-
-        # Since qgis 3.4 cant do .setAtlasMode(QgsComposition.PreviewAtlas)
-        # then we need to force the opening of the layout designer, trigger the mActionAtlasPreview action and
-        # close the layout designer again (finally sentence)
-        designer = self.iface.openLayoutDesigner(layout)
-        layout_view = designer.view()
-        designer_window = layout_view.window()
-        action = designer_window.findChild(QAction, 'mActionAtlasPreview')
-        action.trigger()
-
-        # Export to PDF file
-        if layout:
-            try:
-                exporter = QgsLayoutExporter(layout)
-                exporter.exportToPdf(path, QgsLayoutExporter.PdfExportSettings())
-                if os.path.exists(path):
-                    message = "Document PDF created in"
-                    self.controller.show_info(message, parameter=path)
-                    os.startfile(path)
-                else:
-                    message = "Cannot create file, check if its open"
-                    self.controller.show_warning(message, parameter=path)
-            except Exception as e:
-                self.controller.log_warning(str(e))
-                msg = "Cannot create file, check if selected composer is the correct composer"
-                self.controller.show_warning(msg, parameter=path)
-            finally:
-                designer_window.close()
-        else:
+        layout = QgsProject.instance().layoutManager().layoutByName(layout_name)
+        if layout is None:
             self.controller.show_warning("Layout not found", parameter=layout_name)
+            return
 
+        # Set atlas to current psector
+        report = {'path': path}
+        coverage_layer = layout.atlas().coverageLayer()
+        if layout.atlas().enabled() and coverage_layer and coverage_layer.fields().indexOf('psector_id') != -1:
+            psector_id = utils_giswater.getWidgetText(self.dlg_plan_psector, self.dlg_plan_psector.psector_id)
+            report['filter'] = f"\"psector_id\" = '{psector_id}'"
 
-    def generate_csv(self, path, viewname):
+        self.export_reports(layout, [report], partial(self.generate_composer_finished, path))
 
-        # Get columns name in order of the table
-        sql = (f"SELECT column_name FROM information_schema.columns"
-               f" WHERE table_name = '{viewname}'"
-               f" AND table_schema = '" + self.schema_name.replace('"', '') + "'"
-               f" ORDER BY ordinal_position")
-        rows = self.controller.get_rows(sql)
-        columns = []
 
-        if not rows or rows is None or rows == '':
-            message = "CSV not generated. Check fields from table or view"
-            self.controller.show_warning(message, parameter=viewname)
-            return
-        for i in range(0, len(rows)):
-            column_name = rows[i]
-            columns.append(str(column_name[0]))
+    def generate_composer_finished(self, path, exported, failed):
 
-        sql = (f"SELECT * FROM {viewname}"
-               f" WHERE psector_id = '{utils_giswater.getWidgetText(self.dlg_plan_psector, self.dlg_plan_psector.psector_id)}'")
-        rows = self.controller.get_rows(sql)
-        all_rows = []
-        all_rows.append(columns)
-        if not rows or rows is None or rows == '':
-            return
-        for i in rows:
-            all_rows.append(i)
+        if exported and os.path.exists(path):
+            message = "Document PDF created in"
+            self.controller.show_info(message, parameter=path)
+            if hasattr(os, 'startfile'):
+                os.startfile(path)
+        else:
+            for file_path, error in failed:
+                self.controller.log_warning(error, parameter=file_path)
+            msg = "Cannot create file, check if selected composer is the correct composer"
+            self.controller.show_warning(msg, parameter=path)
 
-        with open(path, "w") as output:
-            writer = csv.writer(output, lineterminator='\n')
-            writer.writerows(all_rows)
 
+    def generate_csv(self, path, viewname):
+        """ Export rows of @viewname of current psector to CSV file @path in background """
 
-    def populate_budget(self, dialog, psector_id):
+        psector_id = utils_giswater.getWidgetText(self.dlg_plan_psector, self.dlg_plan_psector.psector_id)
+        sql = f"SELECT * FROM {viewname} WHERE psector_id = '{psector_id}'"
+        self.export_csv(sql, path)
 
-        sql = (f"SELECT DISTINCT(column_name) FROM information_schema.columns"
-               f" WHERE table_name = 'v_plan_current_psector'")
-        rows = self.controller.get_rows(sql)
-        columns = []
-        for i in range(0, len(rows)):
-            column_name = rows[i]
-            columns.append(str(column_name[0]))
 
-        sql = (f"SELECT total_arc, total_node, total_other, pem, pec, pec_vat, gexpenses, vat, other, pca"
-               f" FROM v_plan_current_psector"
-               f" WHERE psector_id = '{psector_id}'")
-        row = self.controller.get_row(sql)
-        if row:
-            for column_name in columns:
-                if column_name in row:
-                    if row[column_name] is not None:
-                        utils_giswater.setText(dialog, column_name, f"{row[column_name]:.02f}")
-                    else:
-                        utils_giswater.setText(dialog, column_name, f"{0:.02f}")
+    def populate_budget(self, dialog, psector_id):
+        """ Load budget of psector @psector_id and show it """
 
-        self.calc_pec_pem(dialog)
-        self.calc_pecvat_pec(dialog)
-        self.calc_pca_pecvat(dialog)
+        self.budget = PsectorBudget.load(self.controller, psector_id)
+        self.show_budget(dialog)
 
 
-    def calc_pec_pem(self, dialog):
+    def show_budget(self, dialog):
 
-        if utils_giswater.getWidgetText(dialog, 'pec') not in('null', None):
-            pec = float(utils_giswater.getWidgetText(dialog, 'pec'))
-        else:
-            pec = 0
+        for widget_name, value in self.budget.get_values().items():
+            utils_giswater.setText(dialog, widget_name, f"{value:.02f}")
 
-        if utils_giswater.getWidgetText(dialog, 'pem') not in('null', None):
-            pem = float(utils_giswater.getWidgetText(dialog, 'pem'))
-        else:
-            pem = 0
 
-        res = f"{round(pec - pem, 2):.02f}"
-        utils_giswater.setWidgetText(dialog, 'pec_pem', res)
+    def add_features_budget(self, dialog, geom_type, rows, sign=1):
+        """ Add budget of features @rows (list of id and budget) of @geom_type to psector budget
+            (subtract it if @sign is -1) and show it """
 
+        if geom_type not in self.budget_sources or self.budget is None:
+            return
 
-    def calc_pecvat_pec(self, dialog):
+        amount = sum(row[1] for row in rows if row[1] is not None)
+        if not amount:
+            return
 
-        if utils_giswater.getWidgetText(dialog, 'pec_vat') not in('null', None):
-            pec_vat = float(utils_giswater.getWidgetText(dialog, 'pec_vat'))
-        else:
-            pec_vat = 0
+        self.budget.add(self.budget_sources[geom_type][2], sign * amount)
+        self.show_budget(dialog)
 
-        if utils_giswater.getWidgetText(dialog, 'pec') not in('null', None):
-            pec = float(utils_giswater.getWidgetText(dialog, 'pec'))
-        else:
-            pec = 0
-        res = f"{round(pec_vat - pec, 2):.02f}"
-        utils_giswater.setWidgetText(dialog, 'pecvat_pem', res)
 
+    def insert_feature_to_plan(self, dialog, geom_type):
+        """ Insert features_id to table plan_@geom_type_x_psector, adding their budget to psector budget """
 
-    def calc_pca_pecvat(self, dialog):
+        rows = ParentManage.insert_feature_to_plan(self, dialog, geom_type)
+        self.add_features_budget(dialog, geom_type, rows)
+        return rows
 
-        if utils_giswater.getWidgetText(dialog, 'pca') not in('null', None):
-            pca = float(utils_giswater.getWidgetText(dialog, 'pca'))
-        else:
-            pca = 0
 
-        if utils_giswater.getWidgetText(dialog, 'pec_vat') not in('null', None):
-            pec_vat = float(utils_giswater.getWidgetText(dialog, 'pec_vat'))
-        else:
-            pec_vat = 0
-        res = f"{round(pca - pec_vat, 2):.02f}"
-        utils_giswater.setWidgetText(dialog, 'pca_pecvat', res)
+    def delete_feature_at_plan(self, dialog, geom_type, list_id):
+        """ Delete features_id to table plan_@geom_type_x_psector, subtracting their budget from psector budget """
+
+        rows = ParentManage.delete_feature_at_plan(self, dialog, geom_type, list_id)
+        self.add_features_budget(dialog, geom_type, rows, -1)
+        return rows
 
 
     def calulate_percents(self, tablename, field):
@@ -756,8 +701,15 @@ class ManageNewPsector(ParentManage):
         sql = ("UPDATE " + tablename + " "
                " SET " + field + " = '" + utils_giswater.getText(self.dlg_plan_psector, field) + "'"
                " WHERE psector_id = '" + str(psector_id) + "'")
-        self.controller.execute_sql(sql)
-        self.populate_budget(self.dlg_plan_psector, psector_id)
+        if not self.controller.execute_sql(sql):
+            return
+
+        # Recalculate amounts with the new percentage, without reloading budget
+        if self.budget and str(self.budget.psector_id) == str(psector_id):
+            self.budget.set_percent(field, utils_giswater.getText(self.dlg_plan_psector, field))
+            self.show_budget(self.dlg_plan_psector)
+        else:
+            self.populate_budget(self.dlg_plan_psector, psector_id)
 
 
     def show_description(self):
@@ -1128,16 +1080,17 @@ class ManageNewPsector(ParentManage):
 
         # Button select
         dialog.btn_select.clicked.connect(partial(self.rows_selector, dialog, tbl_all_rows, tbl_selected_rows, 'id',
-            tableright, "price_id", 'id'))
+            tableright, "price_id", 'id', tableleft))
         tbl_all_rows.doubleClicked.connect(partial(self.rows_selector, dialog, tbl_all_rows, tbl_selected_rows, 'id',
-            tableright, "price_id", 'id'))
+            tableright, "price_id", 'id', tableleft))
 
         # Button unselect
         dialog.btn_unselect.clicked.connect(partial(self.rows_unselector, dialog, tbl_selected_rows,
             tableright, field_id_right))
 
 
-    def rows_selector(self, dialog, tbl_all_rows, tbl_selected_rows, id_ori, tableright, id_des, field_id):
+    def rows_selector(self, dialog, tbl_all_rows, tbl_selected_rows, id_ori, tableright, id_des, field_id,
+                      tableleft="v_price_compost"):
         """
             :param tbl_all_rows: QTableView origin
             :param tbl_selected_rows: QTableView destini
@@ -1145,6 +1098,7 @@ class ManageNewPsector(ParentManage):
             :param tableright: table destini
             :param id_des: Refers to the id of the target table, on which the query will be made
             :param field_id:
+            :param tableleft: table origin, where values of selected rows are read from
         """
 
         selected_list = tbl_all_rows.selectionModel().selectedRows()
@@ -1156,53 +1110,55 @@ class ManageNewPsector(ParentManage):
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = tbl_all_rows.model().record(row).value(id_ori)
-            expl_id.append(id_)
-
-        for i in range(0, len(selected_list)):
-            row = selected_list[i].row()
-            values = ""
-            psector_id = utils_giswater.getWidgetText(dialog, 'psector_id')
-            values += f"'{psector_id}', "
-            if tbl_all_rows.model().record(row).value('unit') not in (None, 'null', 'NULL'):
-                values += f"'{tbl_all_rows.model().record(row).value('unit')}', "
-            else:
-                values += 'null, '
-            if tbl_all_rows.model().record(row).value('id') not in (None, 'null', 'NULL'):
-                values += f"'{tbl_all_rows.model().record(row).value('id')}', "
-            else:
-                values += 'null, '
-            if tbl_all_rows.model().record(row).value('description') not in (None, 'null', 'NULL'):
-                values += f"'{tbl_all_rows.model().record(row).value('description')}', "
-            else:
-                values += 'null, '
-            if tbl_all_rows.model().record(row).value('price') not in (None, 'null', 'NULL'):
-                values += f"'{tbl_all_rows.model().record(row).value('price')}', "
-            else:
-                values += 'null, '
-            values = values[:len(values) - 2]
-            # Check if expl_id already exists in expl_selector
-            sql = (f"SELECT DISTINCT({id_des})"
-                   f" FROM {tableright}"
-                   f" WHERE {id_des} = '{expl_id[i]}'"
-                   f" AND psector_id = '{psector_id}'")
+            expl_id.append(str(id_))
+
+        # Insert all selected prices not already in psector with a single query
+        # (ON CONFLICT is not supported by views with INSTEAD OF triggers, so duplicates are filtered)
+        psector_id = utils_giswater.getWidgetText(dialog, 'psector_id')
+        sql = (f"INSERT INTO {tableright}"
+               f" (psector_id, unit, price_id, descript, price)"
+               f" SELECT %s, unit, {id_ori}, description, price"
+               f" FROM {tableleft}"
+               f" WHERE {id_ori}::text = ANY(%s)"
+               f" AND NOT EXISTS (SELECT 1 FROM {tableright}"
+               f" WHERE {tableright}.{id_des} = {tableleft}.{id_ori} AND {tableright}.psector_id = %s)"
+               f" RETURNING {id_des}")
+        rows = self.controller.get_rows(sql, log_info=False, params=(psector_id, expl_id, psector_id))
+        if self.controller.last_error:
+            return
 
-            row = self.controller.get_row(sql)
-            if row is not None:
-                # if exist - show warning
-                message = "Id already selected"
-                self.controller.show_info_box(message, "Info", parameter=str(expl_id[i]))
-            else:
-                sql = (f"INSERT INTO {tableright}"
-                       f" (psector_id, unit, price_id, descript, price) "
-                       f" VALUES ({values})")
-                self.controller.execute_sql(sql)
+        # Report already selected prices together
+        inserted = [str(row[0]) for row in rows or []]
+        duplicated = [id_ for id_ in expl_id if id_ not in inserted]
+        if duplicated:
+            message = "Id already selected"
+            self.controller.show_info_box(message, "Info", parameter=", ".join(duplicated))
 
         # Refresh
-        expr = f" psector_id = '{utils_giswater.getWidgetText(dialog, 'psector_id')}'"
+        expr = f" psector_id = '{psector_id}'"
         # Refresh model with selected filter
         self.fill_table(dialog, tbl_selected_rows, tableright, True, QTableView.DoubleClicked, expr)
         self.set_table_columns(dialog, tbl_selected_rows, tableright)
-        self.update_total(self.dlg_plan_psector, self.dlg_plan_psector.selected_rows)
+        if inserted:
+            # Budget is computed by the view, so it isn't returned by the insert through its trigger
+            sql = (f"SELECT SUM(total_budget) FROM {tableright}"
+                   f" WHERE psector_id = %s AND {id_des}::text = ANY(%s)")
+            row = self.controller.get_row(sql, log_info=False, params=(psector_id, inserted))
+            if row:
+                self.add_total(self.dlg_plan_psector, row[0])
+
+
+    def add_total(self, dialog, amount):
+        """ Add @amount (total budget of inserted prices) to total shown as label """
+
+        if amount is None:
+            return
+
+        try:
+            total = float(utils_giswater.getWidgetText(dialog, 'lbl_total'))
+        except (TypeError, ValueError):
+            total = 0
+        utils_giswater.setText(dialog, 'lbl_total', str(total + float(amount)))
 
 
     def rows_unselector(self, dialog, tbl_selected_rows, tableright, field_id_right):
@@ -1239,9 +1195,10 @@ class ManageNewPsector(ParentManage):
         if query == 'null':
             query = ""
         sql = (f"SELECT * FROM {schema_name}.{tableleft} WHERE LOWER ({field_id})"
-               f" LIKE '%{query}%' AND {field_id} NOT IN ("
-               f" SELECT price_id FROM {tableright}"
-               f" WHERE psector_id = '{utils_giswater.getWidgetText(dialog, 'psector_id')}')")
+               f" LIKE '%{query}%' AND NOT EXISTS ("
+               f" SELECT 1 FROM {tableright}"
+               f" WHERE {tableright}.price_id = {tableleft}.{field_id}"
+               f" AND psector_id = '{utils_giswater.getWidgetText(dialog, 'psector_id')}')")
         self.fill_table_by_query(qtable, sql)
 
 
@@ -1272,11 +1229,8 @@ class ManageNewPsector(ParentManage):
         if self.schema_name not in table_name:
             table_name = self.schema_name + "." + table_name
 
-        # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnFieldChange)
-        model.setSort(0, 0)
+        # Set model. Rows are iterated to compute totals, so all of them are fetched at once
+        model = self.create_table_model(table_name, expr, QSqlTableModel.OnFieldChange, paged=False)
         model.select()
 
         # When change some field we need to refresh Qtableview and filter by psector_id
@@ -1288,11 +1242,7 @@ class ManageNewPsector(ParentManage):
         if model.lastError().isValid():
             self.controller.show_warning(model.lastError().text())
         # Attach model to table view
-        if expr:
-            widget.setModel(model)
-            widget.model().setFilter(expr)
-        else:
-            widget.setModel(model)
+        widget.setModel(model)
 
         if hidde:
             self.refresh_table(dialog, widget)
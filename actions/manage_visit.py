@@ -9,7 +9,6 @@ from qgis.PyQt.QtCore import Qt, QDate, QObject, QStringListModel, pyqtSignal
 from qgis.PyQt.QtGui import QStandardItemModel, QStandardItem
 from qgis.PyQt.QtWidgets import QAbstractItemView, QDialogButtonBox, QCompleter, QLineEdit, QFileDialog, QTableView, \
     QTextEdit, QPushButton, QComboBox, QTabWidget
-from qgis.PyQt.QtSql import QSqlTableModel
 
 import os
 import sys
@@ -31,6 +30,7 @@ from ..ui_manager import VisitEvent
 from ..ui_manager import VisitEventRehab
 from ..ui_manager import LotVisitManagerUi
 from .parent_manage import ParentManage
+from .gw_table_model import fetch_all_rows, set_model_sort
 from .manage_document import ManageDocument
 
 
@@ -283,17 +283,12 @@ class ManageVisit(ParentManage, QObject):
         # Load feature if in @table_name. Select list of related features
         # Set 'expr_filter' with features that are in the list
         if self.locked_feature_id:
-            expr_filter = f'"{self.geom_type}_id" IN (\'{self.locked_feature_id}\')'
-            (is_valid, expr) = self.check_expression(expr_filter)
-            if not is_valid:
-                return
-
             # do selection allowing @table_name to be linked to canvas selectionChanged
             widget_name = f'tbl_visit_x_{self.geom_type}'
             widget_table = utils_giswater.getWidget(self.dlg_add_visit, widget_name)
             self.disconnect_signal_selection_changed()
             self.connect_signal_selection_changed(self.dlg_add_visit, widget_table)
-            self.select_features_by_ids(self.geom_type, expr)
+            self.select_features_by_fids(self.geom_type, [self.locked_feature_id])
             self.disconnect_signal_selection_changed()
 
 
@@ -341,11 +336,7 @@ class ManageVisit(ParentManage, QObject):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel()
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        if expr_filter is not None:
-            model.setFilter(expr_filter)
+        model = self.create_table_model(table_name, expr_filter, sort_order=None)
         model.select()
 
         # Check for errors
@@ -520,30 +511,36 @@ class ManageVisit(ParentManage, QObject):
 
 
     def update_relations(self, dialog, delete_old_relations=True):
-        """ Save current selected features in every table of geom_type """
+        """ Save current selected features in every table of geom_type, in a single transaction """
 
+        status = True
         if delete_old_relations:
             for index in range(self.feature_type.count()):
                 # Remove all old relations related with current visit_id and @geom_type
                 geom_type = self.feature_type.itemText(index).lower()
-                self.delete_relations_geom_type(geom_type)
+                status = status and self.delete_relations_geom_type(geom_type, commit=False) is not False
 
         feature_type = utils_giswater.getWidgetText(self.dlg_add_visit, self.feature_type).lower()
         # Save new relations listed in every table of geom_type
         if feature_type == 'all':
-            self.update_relations_geom_type("arc")
-            self.update_relations_geom_type("node")
-            self.update_relations_geom_type("connec")
+            geom_types = ["arc", "node", "connec"]
             if self.controller.get_project_type() == 'ud':
-                self.update_relations_geom_type("gully")
+                geom_types.append("gully")
         else:
-            self.update_relations_geom_type(self.geom_type)
+            geom_types = [self.geom_type]
+        for geom_type in geom_types:
+            status = status and self.update_relations_geom_type(geom_type, commit=False) is not False
+
+        if status:
+            self.controller.dao.commit()
+        else:
+            self.controller.dao.rollback()
 
         widget_name = f"tbl_visit_x_{self.geom_type}"
         self.enable_feature_type(dialog, widget_name)
 
 
-    def delete_relations_geom_type(self, geom_type):
+    def delete_relations_geom_type(self, geom_type, commit=True):
         """ Remove all old relations related with current visit_id and @geom_type """
 
         if geom_type == '' or geom_type.lower() == 'all':
@@ -563,11 +560,11 @@ class ManageVisit(ParentManage, QObject):
         where_clause = f"visit_id = '{self.visit_id.text()}'"
 
         if db_record:
-            db_record.delete(where_clause=where_clause)
+            return db_record.delete(where_clause=where_clause, commit=commit)
 
 
-    def update_relations_geom_type(self, geom_type):
-        """ Update relations of specific @geom_type """
+    def update_relations_geom_type(self, geom_type, commit=True):
+        """ Insert relations of specific @geom_type listed in its table, with a single multi-row insert """
 
         if geom_type == '' or geom_type.lower() == 'all':
             return
@@ -596,20 +593,16 @@ class ManageVisit(ParentManage, QObject):
             db_record = OmVisitXGully(self.controller)
 
         if db_record:
+            fetch_all_rows(widget.model())
+            visit_id = int(self.visit_id.text())
+            records = []
             for row in range(widget.model().rowCount()):
                 # get modelIndex to get data
                 index = widget.model().index(row, 0)
+                records.append({'visit_id': visit_id, column_name: index.data()})
 
-                # set common fields
-                db_record.id = db_record.max_pk() + 1
-                db_record.visit_id = int(self.visit_id.text())
-
-                # set value for column <geom_type>_id
-                # db_record.column_name = index.data()
-                setattr(db_record, column_name, index.data())
-
-                # than save the showed records
-                db_record.upsert()
+            # than save the showed records
+            return db_record.insert_many(records, commit=commit) is not None
 
 
     def manage_tab_changed(self, dialog, index):
@@ -813,14 +806,7 @@ class ManageVisit(ParentManage, QObject):
         if not rows or not rows[0]:
             return
 
-        ids = [f"'{x[0]}'" for x in rows]
-
-        # Select list of related features
-        # Set 'expr_filter' with features that are in the list
-        expr_filter = f"{geom_type}_id IN ({','.join(ids)})"
-        (is_valid, expr) = self.check_expression(expr_filter)  # @UnusedVariable
-        if not is_valid:
-            return
+        ids = [x[0] for x in rows]
 
         if widget_table is None:
             widget_name = f'tbl_visit_x_{geom_type}'
@@ -829,7 +815,7 @@ class ManageVisit(ParentManage, QObject):
         # Do selection allowing @widget_table to be linked to canvas selectionChanged
         self.disconnect_signal_selection_changed()
         self.connect_signal_selection_changed(self.dlg_add_visit, widget_table)
-        self.select_features_by_ids(geom_type, expr)
+        self.select_features_by_fids(geom_type, ids)
         self.disconnect_signal_selection_changed()
 
 
@@ -1563,11 +1549,7 @@ class ManageVisit(ParentManage, QObject):
 
         # Set width and alias of visible columns
         columns_to_delete = []
-        sql = (f"SELECT columnindex, width, alias, status"
-               f" FROM config_form_tableview"
-               f" WHERE tablename = '{table_name}'"
-               f" ORDER BY columnindex")
-        rows = self.controller.get_rows(sql, log_info=False)
+        rows = self.controller.get_tableview_config(table_name)
         if not rows:
             return
 
@@ -1583,8 +1565,7 @@ class ManageVisit(ParentManage, QObject):
                     row['columnindex'] - 1, Qt.Horizontal, row['alias'])
 
         # Set order
-        widget.model().setSort(0, Qt.AscendingOrder)
-        widget.model().select()
+        set_model_sort(widget.model(), 0, Qt.AscendingOrder)
 
         # Delete columns
         for column in columns_to_delete:
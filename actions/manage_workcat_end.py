@@ -7,7 +7,6 @@ or (at your option) any later version.
 # -*- coding: utf-8 -*-
 from qgis.core import QgsExpression, QgsFeatureRequest
 from qgis.PyQt.QtCore import QDate, QStringListModel
-from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QAbstractItemView, QTableView, QCompleter
 
 from functools import partial
@@ -15,6 +14,7 @@ from datetime import datetime
 
 from .. import utils_giswater
 from .parent_manage import ParentManage
+from .gw_table_model import fetch_all_rows
 from ..ui_manager import FeatureEndUi, InfoWorkcatUi
 from ..ui_manager import FeatureEndConnecUi
 
@@ -176,7 +176,7 @@ class ManageWorkcatEnd(ParentManage):
 
     def get_list_selected_id(self, qtable):
 
-        selected_list = qtable.model()
+        selected_list = fetch_all_rows(qtable.model())
         self.selected_list = []
         ids_list = ""
         if selected_list is None:
@@ -292,12 +292,7 @@ class ManageWorkcatEnd(ParentManage):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        self.model = QSqlTableModel(db=self.controller.db)
-        self.model.setTable(table_name)
-        self.model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        if filter_:
-            self.model.setFilter(filter_)
-        self.model.setSort(0, 0)
+        self.model = self.create_table_model(table_name, filter_)
         self.model.select()
 
         # Check for errors
@@ -416,10 +411,7 @@ class ManageWorkcatEnd(ParentManage):
         filter_ += " AND arc_state = '1' "
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.setFilter(filter_)
+        model = self.create_table_model(table_name, filter_, sort_order=None)
         model.select()
 
         # Check for errors
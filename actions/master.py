@@ -179,8 +179,7 @@ class Master(ParentAction):
             self.controller.show_warning(message)
             return
         cur_psector = self.controller.get_config('plan_psector_vdefault')
-        inf_text = ""
-        list_id = ""
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = widget.model().record(row).value(str(column_id))
@@ -189,10 +188,8 @@ class Master(ParentAction):
                            "Please, change your current psector before delete.")
                 self.controller.show_exceptions_msg('Current psector', self.controller.tr(message))
                 return
-            inf_text += f'"{id_}", '
-            list_id += f'"{id_}", '
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+            list_id.append(id_)
+        inf_text = ", ".join([f'"{id_}"' for id_ in list_id])
 
         if action == 'psector':
             feature = f'"id":[{inf_text}], "featureType":"PSECTOR"'
@@ -211,14 +208,9 @@ class Master(ParentAction):
             message = "Are you sure you want to delete these records?"
             answer = self.controller.ask_question(message, "Delete records", inf_text)
             if answer:
-                sql = "DELETE FROM selector_plan_result WHERE result_id in ("
-                if list_id != '':
-                    sql += f"{list_id}) AND cur_user = current_user;"
-                    self.controller.execute_sql(sql)
-                    utils_giswater.setWidgetText(dialog, label, '')
-                sql = (f"DELETE FROM {table_name}"
-                       f" WHERE {column_id} IN ({list_id});")
-                self.controller.execute_sql(sql)
+                self.controller.delete_rows('selector_plan_result', 'result_id', list_id, "cur_user = current_user")
+                utils_giswater.setWidgetText(dialog, label, '')
+                self.controller.delete_rows(table_name, column_id, list_id)
         widget.model().select()
  
 
@@ -5,14 +5,14 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsApplication, QgsExpression, QgsFeatureRequest, QgsFillSymbol, QgsLineSymbol, QgsMarkerSymbol, \
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsFillSymbol, QgsLineSymbol, QgsMarkerSymbol, \
     QgsPrintLayout, QgsProject, QgsReadWriteContext, QgsSymbol, QgsVectorLayer
 from qgis.gui import QgsMapToolEmitPoint, QgsVertexMarker
 from qgis.PyQt.QtCore import Qt, QDate, QStringListModel, QTime
 from qgis.PyQt.QtWidgets import QAbstractItemView, QAction, QCompleter, QLineEdit, QTableView, QTabWidget, QTextEdit
 from qgis.PyQt.QtGui import QColor
-from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtXml import QDomDocument
+from sip import isdeleted
 
 import json
 import os
@@ -20,7 +20,6 @@ from datetime import datetime
 from collections import OrderedDict
 from functools import partial
 
-from .gw_task import GwTask
 from .. import utils_giswater
 from .api_search import ApiSearch
 from .mincut_config import MincutConfig
@@ -59,6 +58,7 @@ class MincutParent(ParentAction):
         self.set_states()
         self.current_state = None
         self.is_new = True
+        self.auto_mincut_running = False
 
 
     def set_states(self):
@@ -1312,21 +1312,20 @@ class MincutParent(ParentAction):
         if self.schema_name not in table_name:
             table_name = self.schema_name + "." + table_name
 
+        # Without filter expression table is left empty
+        if not expr_filter:
+            widget.setModel(None)
+            return expr
+
         # Set a model with selected filter expression
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+        model = self.create_table_model(table_name, expr_filter)
         model.select()
         if model.lastError().isValid():
             self.controller.show_warning(model.lastError().text())
             return expr
+
         # Attach model to selected table
-        if expr_filter:
-            widget.setModel(model)
-            widget.model().setFilter(expr_filter)
-            widget.model().select()
-        else:
-            widget.setModel(None)
+        widget.setModel(model)
 
         return expr
 
@@ -1382,14 +1381,11 @@ class MincutParent(ParentAction):
         if not answer:
             return
         else:
-            for el in del_id:
-                self.connec_list.remove(el)
+            del_id = set(del_id)
+            self.connec_list = [connec_id for connec_id in self.connec_list if connec_id not in del_id]
 
         # Select features which are in the list
-        expr_filter = "\"connec_id\" IN ("
-        for i in range(len(self.connec_list)):
-            expr_filter += f"'{self.connec_list[i]}', "
-        expr_filter = expr_filter[:-2] + ")"
+        expr_filter = "\"connec_id\" IN (" + ", ".join([f"'{connec_id}'" for connec_id in self.connec_list]) + ")"
 
         if len(self.connec_list) == 0:
             expr_filter = "connec_id=''"
@@ -1538,6 +1534,10 @@ class MincutParent(ParentAction):
     def auto_mincut_snapping(self, point, btn):  # @UnusedVariable
         """ Automatic mincut: Snapping to 'node' and 'arc' layers """
 
+        # Ignore clicks while a mincut is being calculated
+        if self.auto_mincut_running:
+            return
+
         # Get coordinates
         event_point = self.snapper_manager.get_event_point(point=point)
 
@@ -1565,9 +1565,6 @@ class MincutParent(ParentAction):
             element_id = snapped_feat.attribute(elem_type + '_id')
             layer.select([feature_id])
             self.auto_mincut_execute(element_id, elem_type, snapped_point.x(), snapped_point.y())
-            self.set_visible_mincut_layers()
-            self.snapper_manager.recover_snapping_options()
-            self.remove_selection()
 
 
     def set_visible_mincut_layers(self, zoom=False):
@@ -1638,13 +1635,8 @@ class MincutParent(ParentAction):
 
 
     def auto_mincut_execute(self, elem_id, elem_type, snapping_x, snapping_y):
-        """ Automatic mincut: Execute function 'gw_fct_mincut' """
-
-        self.task1 = GwTask('Calculating mincut')
-        QgsApplication.taskManager().addTask(self.task1)
-        self.task1.setProgress(0)
+        """ Automatic mincut: Execute function 'gw_fct_mincut' in background """
 
-        srid = self.controller.plugin_settings_value('srid')
         real_mincut_id = utils_giswater.getWidgetText(self.dlg_mincut, self.dlg_mincut.result_mincut_id)
         if self.is_new:
             self.set_id_val()
@@ -1662,12 +1654,57 @@ class MincutParent(ParentAction):
                 real_mincut_id = new_mincut_id[0]
 
         utils_giswater.setWidgetText(self.dlg_mincut, self.dlg_mincut.result_mincut_id, real_mincut_id)
-        self.task1.setProgress(25)
 
         extras = f'"action":"mincutNetwork", '
         extras += f'"mincutId":"{real_mincut_id}", "arcId":"{elem_id}"'
         body = self.create_body(extras=extras)
-        complet_result = self.controller.get_json('gw_fct_setmincut', body)
+
+        # Disable map tool and dialog buttons until the mincut is calculated
+        self.auto_mincut_running = True
+        self.disconnect_snapping(False)
+        self.dlg_mincut.btn_accept.setEnabled(False)
+        self.dlg_mincut.btn_cancel.setEnabled(False)
+        self.set_cursor_wait()
+        self.execute_in_background('Calculating mincut', partial(self.auto_mincut_calculate, body),
+                                   callback=partial(self.auto_mincut_finished, real_mincut_id, elem_id, elem_type,
+                                                    snapping_x, snapping_y, body))
+
+
+    def auto_mincut_calculate(self, body, task):
+        """ Execute function 'gw_fct_setmincut' with connection of background @task """
+
+        return task.get_json('gw_fct_setmincut', body)
+
+
+    def auto_mincut_finished(self, real_mincut_id, elem_id, elem_type, snapping_x, snapping_y, body, status,
+                             complet_result):
+        """ Manage result of function 'gw_fct_setmincut' executed in background """
+
+        self.auto_mincut_running = False
+        self.set_cursor_restore()
+        self.snapper_manager.recover_snapping_options()
+        self.set_visible_mincut_layers()
+        self.remove_selection()
+
+        # Dialog could have been closed while the mincut was being calculated
+        if isdeleted(self.dlg_mincut):
+            return
+
+        self.dlg_mincut.btn_accept.setEnabled(True)
+        self.dlg_mincut.btn_cancel.setEnabled(True)
+        if not status or not complet_result:
+            self.controller.log_warning("Function error: gw_fct_setmincut")
+            return
+
+        self.auto_mincut_result(real_mincut_id, elem_id, elem_type, snapping_x, snapping_y, body, complet_result)
+
+
+    def auto_mincut_result(self, real_mincut_id, elem_id, elem_type, snapping_x, snapping_y, body, complet_result):
+        """ Show result of automatic mincut and save its analysis data """
+
+        srid = self.controller.plugin_settings_value('srid')
+
+        complet_result = self.controller.manage_json_result(complet_result, f"SELECT gw_fct_setmincut({body});")
         if 'mincutOverlap' in complet_result or complet_result['status'] == 'Accepted':
             if 'mincutOverlap' in complet_result and complet_result['mincutOverlap'] != "":
                 message = "Mincut done, but has conflict and overlaps with"
@@ -1683,8 +1720,6 @@ class MincutParent(ParentAction):
             if polygon[0] == '':
                 message = "Error on create auto mincut, you need to review data"
                 self.controller.show_warning(message)
-                self.set_cursor_restore()
-                self.task1.setProgress(100)
                 return
             x1, y1 = polygon[0].split(' ')
             x2, y2 = polygon[2].split(' ')
@@ -1697,12 +1732,9 @@ class MincutParent(ParentAction):
                    f" anl_feature_id = '{elem_id}'"
                    f" WHERE id = '{real_mincut_id}'")
             status = self.controller.execute_sql(sql)
-            self.task1.setProgress(50)
             if not status:
                 message = "Error updating element in table, you need to review data"
                 self.controller.show_warning(message)
-                self.set_cursor_restore()
-                self.task1.setProgress(100)
                 return
 
             # Enable button CustomMincut and button Start
@@ -1717,14 +1749,9 @@ class MincutParent(ParentAction):
                    f"INSERT INTO selector_mincut_result (cur_user, result_id) VALUES"
                    f" (current_user, {real_mincut_id});")
             self.controller.execute_sql(sql, log_error=True)
-            self.task1.setProgress(75)
             # Refresh map canvas
             self.refresh_map_canvas()
 
-        # Disconnect snapping and related signals
-        self.disconnect_snapping(False)
-        self.task1.setProgress(100)
-
 
     def custom_mincut(self, action, is_checked):
         """ B2-123: Custom mincut analysis. Working just with valve layer """
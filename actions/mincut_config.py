@@ -5,8 +5,7 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.PyQt.QtCore import QStringListModel
-from qgis.PyQt.QtSql import QSqlTableModel
+from qgis.PyQt.QtCore import Qt, QStringListModel
 from qgis.PyQt.QtWidgets import QTableView, QPushButton, QLineEdit, QCompleter, QAbstractItemView
 
 import datetime
@@ -19,6 +18,7 @@ from functools import partial
 
 from .. import utils_giswater
 from .api_parent import ApiParent
+from .gw_table_model import fetch_all_rows
 from .parent import ParentAction
 from ..ui_manager import SelectorUi, MincutManagerUi
 
@@ -199,29 +199,24 @@ class MincutConfig(ParentAction):
             message = "Any record selected"
             self.controller.show_warning(message)
             return
-        inf_text = ""
-        list_id = ""
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = self.tbl_mincut_edit.model().record(row).value("id")
-            inf_text += f"{id_}, "
-            list_id += f"'{id_}', "
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+            list_id.append(id_)
+        inf_text = ", ".join([str(id_) for id_ in list_id])
         message = "Are you sure you want to cancel these mincuts?"
         title = "Cancel mincuts"
         answer = self.controller.ask_question(message, title, inf_text)
         if answer:
-            sql = (f"UPDATE om_mincut SET mincut_state = 3 "
-                   f" WHERE id::text IN ({list_id})")
-            self.controller.execute_sql(sql, log_sql=False)
+            self.controller.update_rows('om_mincut', {'mincut_state': 3}, 'id', list_id)
             self.tbl_mincut_edit.model().select()
 
 
     def mincut_selector(self, qtable, field_id):
         """ Manage mincut selector """
 
-        model = qtable.model()
+        model = fetch_all_rows(qtable.model())
         selected_mincuts = []
         for x in range(0, model.rowCount()):
             i = int(model.fieldIndex(field_id))
@@ -368,10 +363,7 @@ class MincutConfig(ParentAction):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.sort(0, 1)
+        model = self.create_table_model(table_name, sort_order=Qt.DescendingOrder)
         model.select()
 
         # Check for errors
@@ -392,22 +384,17 @@ class MincutConfig(ParentAction):
             self.controller.show_warning(message)
             return
 
-        inf_text = ""
-        list_id = ""
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = widget.model().record(row).value(str(column_id))
-            inf_text += f"{id_}, "
-            list_id += f"'{id_}', "
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+            list_id.append(id_)
+        inf_text = ", ".join([str(id_) for id_ in list_id])
         message = "Are you sure you want to delete these mincuts?"
         title = "Delete mincut"
         answer = self.controller.ask_question(message, title, inf_text)
         if answer:
-            sql = (f"DELETE FROM {table_name}"
-                   f" WHERE {column_id} IN ({list_id})")
-            self.controller.execute_sql(sql)
+            self.controller.delete_rows(table_name, column_id, list_id)
             widget.model().select()
             layer = self.controller.get_layer_by_tablename('v_om_mincut_node')
             if layer is not None:
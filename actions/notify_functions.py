@@ -205,6 +205,14 @@ class NotifyFunctions(ParentAction):
             result = self.controller.get_json('gw_fct_getinfofromid', body, is_notify=True, log_sql=True)
             if not result:
                 continue
+
+            # Form configuration of this layer has changed: refresh its persistent cache
+            form_cache = self.controller.form_cache
+            if form_cache:
+                schema_name = self.controller.schema_name
+                form_cache.invalidate(schema_name, layer_name)
+                form_cache.put(schema_name, layer_name, result['body']['data']['fields'],
+                               f"layer_{self.qgis_project_infotype}")
             for field in result['body']['data']['fields']:
                 _values = {}
                 # Get column index
@@ -109,22 +109,17 @@ class Om(ParentAction):
             self.controller.show_warning(message)
             return
 
-        inf_text = ""
-        list_id = ""
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = widget.model().record(row).value(str(column_id))
-            inf_text += f"{id_}, "
-            list_id += f"'{id_}', "
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+            list_id.append(id_)
+        inf_text = ", ".join([str(id_) for id_ in list_id])
         message = "Are you sure you want to delete these records?"
         title = "Delete records"
         answer = self.controller.ask_question(message, title, inf_text)
         if answer:
-            sql = "DELETE FROM " + table_name
-            sql += f" WHERE {column_id} IN ({list_id})"
-            self.controller.execute_sql(sql)
+            self.controller.delete_rows(table_name, column_id, list_id)
             widget.model().select()
 
 
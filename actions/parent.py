@@ -8,7 +8,7 @@ or (at your option) any later version.
 from qgis.core import QgsExpression, QgsFeatureRequest, QgsGeometry, QgsPointXY, QgsProject, QgsRectangle, QgsSymbol, \
     QgsRendererCategory, QgsCategorizedSymbolRenderer, QgsSimpleFillSymbolLayer
 from qgis.gui import QgsRubberBand
-from qgis.PyQt.QtCore import Qt, QDate, QStringListModel, QTimer
+from qgis.PyQt.QtCore import Qt, QDate, QSortFilterProxyModel, QStringListModel, QTimer
 from qgis.PyQt.QtWidgets import QGroupBox, QAbstractItemView, QTableView, QFileDialog, QApplication, QCompleter, \
     QAction, QWidget, QComboBox, QCheckBox, QPushButton, QLineEdit, QDoubleSpinBox, QTextEdit
 from qgis.PyQt.QtGui import QIcon, QColor, QCursor, QPixmap
@@ -28,6 +28,10 @@ from functools import partial
 
 from .. import utils_giswater
 from .add_layer import AddLayer
+from .gw_table_model import GwTableModel, set_model_sort
+from .task_execute import TaskExecute
+from .report_engine import ReportBatch, ReportEngine
+from .task_export_csv import TaskExportCsv
 from ..ui_manager import DialogTextUi, GwDialog, GwMainWindow
 
 
@@ -288,18 +292,25 @@ class ParentAction(object):
         :param aql: (add query left) Query added to the left side (used in basic.py def basic_exploitation_selector())
         :return:
         """
+        # Get only columns of left table that are displayed, besides its id and name
+        schema_name = self.schema_name.replace('"', '')
+        columns = self.controller.get_columns_list(tableleft)
+        columns = [row[0] for row in columns] if columns else [field_id_left, name]
+        displayed_columns = [column for i, column in enumerate(columns)
+                             if i not in hide_left or column in (field_id_left, name)]
+        hide_left = [i for i, column in enumerate(displayed_columns) if columns.index(column) in hide_left]
+
         # fill QTableView all_rows
         tbl_all_rows = dialog.findChild(QTableView, "all_rows")
         tbl_all_rows.setSelectionBehavior(QAbstractItemView.SelectRows)
-        schema_name = self.schema_name.replace('"', '')
-        query_left = f"SELECT * FROM {schema_name}.{tableleft} WHERE {name} NOT IN "
-        query_left += f"(SELECT {schema_name}.{tableleft}.{name} FROM {schema_name}.{tableleft}"
-        query_left += f" RIGHT JOIN {schema_name}.{tableright} ON {tableleft}.{field_id_left} = {tableright}.{field_id_right}"
-        query_left += f" WHERE cur_user = current_user)"
-        query_left += f" AND  {field_id_left} > -1"
+        query_left = f"SELECT {', '.join(displayed_columns)} FROM {schema_name}.{tableleft}"
+        query_left += f" WHERE NOT EXISTS (SELECT 1 FROM {schema_name}.{tableright}"
+        query_left += f" WHERE {tableright}.{field_id_right} = {tableleft}.{field_id_left} AND cur_user = current_user)"
+        query_left += f" AND {field_id_left} > -1"
         query_left += aql
 
-        self.fill_table_by_query(tbl_all_rows, query_left + f" ORDER BY {name};")
+        name_column = displayed_columns.index(name)
+        self.fill_selector_table(tbl_all_rows, query_left, name_column)
         self.hide_colums(tbl_all_rows, hide_left)
         tbl_all_rows.setColumnWidth(1, 200)
 
@@ -313,7 +324,7 @@ class ParentAction(object):
 
         query_right += " WHERE cur_user = current_user"
 
-        self.fill_table_by_query(tbl_selected_rows, query_right + f" ORDER BY {name};")
+        self.fill_selector_table(tbl_selected_rows, query_right, 0)
         self.hide_colums(tbl_selected_rows, hide_right)
         tbl_selected_rows.setColumnWidth(0, 200)
         # Button select
@@ -322,33 +333,85 @@ class ParentAction(object):
 
         # Button unselect
         query_delete = f"DELETE FROM {schema_name}.{tableright}"
-        query_delete += f" WHERE current_user = cur_user AND {tableright}.{field_id_right}="
+        query_delete += f" WHERE current_user = cur_user AND {tableright}.{field_id_right}"
         dialog.btn_unselect.clicked.connect(partial(self.unselector, tbl_all_rows,
                                             tbl_selected_rows, query_delete, query_left, query_right, field_id_right))
 
-        # QLineEdit
-        dialog.txt_name.textChanged.connect(partial(self.query_like_widget_text, dialog, dialog.txt_name,
-                                            tbl_all_rows, tableleft, tableright, field_id_right, field_id_left, name, aql))
+        # QLineEdit: filter rows already fetched, once user stops typing
+        dialog.txt_name.textChanged.connect(partial(self.debounce_call, 'txt_name',
+                                            partial(self.query_like_widget_text, dialog, dialog.txt_name,
+                                                    tbl_all_rows, tableleft, tableright, field_id_right,
+                                                    field_id_left, name, aql)))
 
-        # Order control
-        tbl_all_rows.horizontalHeader().sectionClicked.connect(partial(self.order_by_column, tbl_all_rows, query_left))
-        tbl_selected_rows.horizontalHeader().sectionClicked.connect(
-            partial(self.order_by_column, tbl_selected_rows, query_right))
 
+    def fill_selector_table(self, qtable, query, filter_column):
+        """ Fill @qtable of a selector with rows of @query. Rows are filtered by @filter_column
+            and sorted by clicking on the header without querying database again """
+
+        model = QSqlQueryModel()
+        model.setQuery(query, db=self.controller.db)
+        while model.canFetchMore():
+            model.fetchMore()
+
+        # Check for errors
+        if model.lastError().isValid():
+            self.controller.show_warning(model.lastError().text())
+
+        # Keep filter and sort of previous model
+        filter_text = ""
+        if isinstance(qtable.model(), QSortFilterProxyModel):
+            filter_text = qtable.model().filterRegExp().pattern()
+        proxy_model = QSortFilterProxyModel(qtable)
+        proxy_model.setSourceModel(model)
+        proxy_model.setFilterKeyColumn(filter_column)
+        proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        proxy_model.setFilterFixedString(filter_text)
+
+        hidden_columns = []
+        if qtable.isSortingEnabled():
+            sort_column = qtable.horizontalHeader().sortIndicatorSection()
+            sort_order = qtable.horizontalHeader().sortIndicatorOrder()
+            hidden_columns = [x for x in range(proxy_model.columnCount()) if qtable.isColumnHidden(x)]
+        else:
+            sort_column = filter_column
+            sort_order = Qt.AscendingOrder
+        qtable.setModel(proxy_model)
+        qtable.setSortingEnabled(True)
+        qtable.sortByColumn(sort_column, sort_order)
+        self.hide_colums(qtable, hidden_columns)
+        qtable.show()
 
-    def order_by_column(self, qtable, query, idx):
-        """
-        :param qtable: QTableView widget
-        :param query: Query for populate QsqlQueryModel
-        :param idx: The index of the clicked column
-        :return:
-        """
-        oder_by = {0: "ASC", 1: "DESC"}
-        sort_order = qtable.horizontalHeader().sortIndicatorOrder()
-        col_to_sort = qtable.model().headerData(idx, Qt.Horizontal)
-        query += f" ORDER BY {col_to_sort} {oder_by[sort_order]}"
-        self.fill_table_by_query(qtable, query)
-        self.refresh_map_canvas()
+
+    def get_selector_values(self, qtable, field_name):
+        """ Get values of field @field_name of rows selected in @qtable """
+
+        values = []
+        model = qtable.model()
+        for index in qtable.selectionModel().selectedRows():
+            if isinstance(model, QSortFilterProxyModel):
+                value = model.sourceModel().record(model.mapToSource(index).row()).value(field_name)
+            else:
+                value = model.record(index.row()).value(field_name)
+            values.append(value)
+
+        return values
+
+
+    def debounce_call(self, timer_name, function, *args):
+        """ Call @function once there has been no other call with @timer_name for 300 milliseconds """
+
+        if not hasattr(self, 'debounce_timers'):
+            self.debounce_timers = {}
+
+        timer = self.debounce_timers.get(timer_name)
+        if timer is None:
+            timer = QTimer()
+            timer.setSingleShot(True)
+            self.debounce_timers[timer_name] = timer
+        else:
+            timer.timeout.disconnect()
+        timer.timeout.connect(function)
+        timer.start(300)
 
 
     def hide_colums(self, widget, comuns_to_hide):
@@ -358,32 +421,19 @@ class ParentAction(object):
 
     def unselector(self, qtable_left, qtable_right, query_delete, query_left, query_right, field_id_right):
 
-        selected_list = qtable_right.selectionModel().selectedRows()
-        if len(selected_list) == 0:
+        expl_id = self.get_selector_values(qtable_right, field_id_right)
+        if len(expl_id) == 0:
             message = "Any record selected"
             self.controller.show_warning(message)
             return
-        expl_id = []
-        for i in range(0, len(selected_list)):
-            row = selected_list[i].row()
-            id_ = str(qtable_right.model().record(row).value(field_id_right))
-            expl_id.append(id_)
-        for i in range(0, len(expl_id)):
-            self.controller.execute_sql(query_delete + str(expl_id[i]))
+
+        # Delete all selected rows in one statement
+        values = ", ".join([str(id_) for id_ in expl_id])
+        self.controller.execute_sql(f"{query_delete} IN ({values})")
 
         # Refresh
-        oder_by = {0: "ASC", 1: "DESC"}
-        sort_order = qtable_left.horizontalHeader().sortIndicatorOrder()
-        idx = qtable_left.horizontalHeader().sortIndicatorSection()
-        col_to_sort = qtable_left.model().headerData(idx, Qt.Horizontal)
-        query_left += f" ORDER BY {col_to_sort} {oder_by[sort_order]}"
-        self.fill_table_by_query(qtable_left, query_left)
-
-        sort_order = qtable_right.horizontalHeader().sortIndicatorOrder()
-        idx = qtable_right.horizontalHeader().sortIndicatorSection()
-        col_to_sort = qtable_right.model().headerData(idx, Qt.Horizontal)
-        query_right += f" ORDER BY {col_to_sort} {oder_by[sort_order]}"
-        self.fill_table_by_query(qtable_right, query_right)
+        self.fill_selector_table(qtable_left, query_left, qtable_left.model().filterKeyColumn())
+        self.fill_selector_table(qtable_right, query_right, 0)
         self.refresh_map_canvas()
 
 
@@ -400,49 +450,23 @@ class ParentAction(object):
             :param field_id:
         """
 
-        selected_list = qtable_left.selectionModel().selectedRows()
-
-        if len(selected_list) == 0:
+        expl_id = self.get_selector_values(qtable_left, id_ori)
+        if len(expl_id) == 0:
             message = "Any record selected"
             self.controller.show_warning(message)
             return
-        expl_id = []
-        curuser_list = []
-        for i in range(0, len(selected_list)):
-            row = selected_list[i].row()
-            id_ = qtable_left.model().record(row).value(id_ori)
-            expl_id.append(id_)
-            curuser = qtable_left.model().record(row).value("cur_user")
-            curuser_list.append(curuser)
-        for i in range(0, len(expl_id)):
-            # Check if expl_id already exists in expl_selector
-            sql = (f"SELECT DISTINCT({id_des}, cur_user)"
-                   f" FROM {tablename_des}"
-                   f" WHERE {id_des} = '{expl_id[i]}' AND cur_user = current_user")
-            row = self.controller.get_row(sql)
-
-            if row:
-                # if exist - show warning
-                message = "Id already selected"
-                self.controller.show_info_box(message, "Info", parameter=str(expl_id[i]))
-            else:
-                sql = (f"INSERT INTO {tablename_des} ({field_id}, cur_user) "
-                       f" VALUES ({expl_id[i]}, current_user)")
-                self.controller.execute_sql(sql)
+
+        # Insert all selected rows not already selected in one statement
+        values = ", ".join([f"({id_})" for id_ in expl_id])
+        sql = (f"INSERT INTO {tablename_des} ({field_id}, cur_user)"
+               f" SELECT v.id, current_user FROM (VALUES {values}) AS v(id)"
+               f" WHERE NOT EXISTS (SELECT 1 FROM {tablename_des}"
+               f" WHERE {id_des} = v.id AND cur_user = current_user)")
+        self.controller.execute_sql(sql)
 
         # Refresh
-        oder_by = {0: "ASC", 1: "DESC"}
-        sort_order = qtable_left.horizontalHeader().sortIndicatorOrder()
-        idx = qtable_left.horizontalHeader().sortIndicatorSection()
-        col_to_sort = qtable_left.model().headerData(idx, Qt.Horizontal)
-        query_left += f" ORDER BY {col_to_sort} {oder_by[sort_order]}"
-        self.fill_table_by_query(qtable_right, query_right)
-
-        sort_order = qtable_right.horizontalHeader().sortIndicatorOrder()
-        idx = qtable_right.horizontalHeader().sortIndicatorSection()
-        col_to_sort = qtable_right.model().headerData(idx, Qt.Horizontal)
-        query_right += f" ORDER BY {col_to_sort} {oder_by[sort_order]}"
-        self.fill_table_by_query(qtable_left, query_left)
+        self.fill_selector_table(qtable_left, query_left, qtable_left.model().filterKeyColumn())
+        self.fill_selector_table(qtable_right, query_right, 0)
         self.refresh_map_canvas()
 
 
@@ -454,10 +478,7 @@ class ParentAction(object):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        self.model = QSqlTableModel(db=self.controller.db)
-        self.model.setTable(table_name)
-        self.model.setEditStrategy(set_edit_strategy)
-        self.model.setSort(0, 0)
+        self.model = self.create_table_model(table_name, expr_filter, set_edit_strategy)
         self.model.select()
 
         # Check for errors
@@ -466,8 +487,98 @@ class ParentAction(object):
 
         # Attach model to table view
         widget.setModel(self.model)
+
+
+    def execute_in_background(self, description, function=None, sql=None, callback=None, timeout=None,
+                              start=True, async_=False):
+        """ Execute @function or @sql in a background task with its own database connection.
+            @callback(status, result) is called in the GUI thread when it finishes.
+            If not @start, task can be chained to another one with its method 'then' """
+
+        task = TaskExecute(description, self.controller, function, sql, callback, timeout, async_=async_)
+        if start:
+            task.start()
+
+        return task
+
+
+    def export_csv(self, sql, path, callback=None, header=None):
+        """ Export results of query @sql (or list of queries) to CSV file @path in a background task,
+            with column aliases @header in the first line if set (see class TaskExportCsv).
+            When it finishes, @callback(status, rows_written) is called, or result is shown if not set """
+
+        if callback is None:
+            callback = partial(self.export_csv_finished, path)
+        description = f"Export {os.path.basename(path)}"
+        task = TaskExportCsv(description, self.controller, sql, path, callback, header=header)
+        return task.start()
+
+
+    def export_csv_finished(self, path, status, rows_written):
+
+        if status:
+            message = "File created successfully"
+            self.controller.show_info(message, parameter=path)
+        else:
+            message = "File cannot be created. Check if it is already opened"
+            self.controller.show_warning(message, parameter=path)
+
+
+    def export_reports(self, layout, reports, callback=None):
+        """ Export @reports of print @layout to PDF files without opening the layout designer nor blocking
+            the GUI (see classes ReportEngine and ReportBatch). A copy of @layout is used, so that layouts
+            of the project are never modified. When it finishes, @callback(exported, failed) is called,
+            or result is shown if not set """
+
+        if not reports:
+            return None
+
+        engine = ReportEngine()
+        batch = ReportBatch(engine, layout.clone(), reports)
+        batch.finished.connect(partial(self.export_reports_finished, engine, len(reports), callback))
+
+        return batch.start()
+
+
+    def export_reports_finished(self, engine, total, callback, failed):
+
+        engine.close()
+        exported = total - len(failed)
+        if callback:
+            callback(exported, failed)
+            return
+
+        for path, error in failed:
+            self.controller.log_warning(error, parameter=path)
+        if failed:
+            message = "Some reports cannot be created"
+            self.controller.show_warning(message, parameter=f"{exported}/{total}")
+        else:
+            message = "Reports created successfully"
+            self.controller.show_info(message, parameter=exported)
+
+
+    def create_table_model(self, table_name, expr_filter=None, edit_strategy=QSqlTableModel.OnManualSubmit,
+                           sort_order=Qt.AscendingOrder, paged=True):
+        """ Create a table model of @table_name with filter @expr_filter and sort already set,
+            so that its first select only retrieves rows to show. If @paged, rows are fetched in pages
+            of 'system_variables/table_page_size' rows. Models that save changes as soon as they are
+            edited are never paged, as rows of appended pages are read-only """
+
+        page_size = 0
+        if paged and edit_strategy == QSqlTableModel.OnManualSubmit:
+            page_size = self.settings.value('system_variables/table_page_size', '0')
+            page_size = int(page_size) if str(page_size).isdigit() else 0
+
+        model = GwTableModel(db=self.controller.db, page_size=page_size)
+        model.setTable(table_name)
+        model.setEditStrategy(edit_strategy)
+        if sort_order is not None:
+            model.setSort(0, sort_order)
         if expr_filter:
-            widget.model().setFilter(expr_filter)
+            model.setFilter(expr_filter)
+
+        return model
 
 
     def fill_table_by_query(self, qtable, query):
@@ -487,15 +598,21 @@ class ParentAction(object):
 
 
     def query_like_widget_text(self, dialog, text_line, qtable, tableleft, tableright, field_id_r, field_id_l, name='name', aql=''):
-        """ Fill the QTableView by filtering through the QLineEdit"""
+        """ Filter rows of the QTableView by the text of the QLineEdit """
 
+        text = utils_giswater.getWidgetText(dialog, text_line, return_string_null=False)
+        model = qtable.model()
+        if isinstance(model, QSortFilterProxyModel):
+            model.setFilterFixedString(text)
+            return
+
+        # Table not filled by multi_row_selector: query database
         schema_name = self.schema_name.replace('"', '')
-        query = utils_giswater.getWidgetText(dialog, text_line, return_string_null=False).lower()
-        sql = (f"SELECT * FROM {schema_name}.{tableleft} WHERE {name} NOT IN "
-               f"(SELECT {tableleft}.{name} FROM {schema_name}.{tableleft}"
-               f" RIGHT JOIN {schema_name}.{tableright}"
-               f" ON {tableleft}.{field_id_l} = {tableright}.{field_id_r}"
-               f" WHERE cur_user = current_user) AND LOWER({name}::text) LIKE '%{query}%'"
+        query = text.lower()
+        sql = (f"SELECT * FROM {schema_name}.{tableleft} WHERE NOT EXISTS "
+               f"(SELECT 1 FROM {schema_name}.{tableright}"
+               f" WHERE {tableright}.{field_id_r} = {tableleft}.{field_id_l} AND cur_user = current_user)"
+               f" AND LOWER({name}::text) LIKE '%{query}%'"
                f"  AND  {field_id_l} > -1")
         sql += aql
         self.fill_table_by_query(qtable, sql)
@@ -568,13 +685,12 @@ class ParentAction(object):
         if not widget:
             return
 
+        if isinstance(widget.model(), GwTableModel):
+            widget.model().set_row_count_widget(widget)
+
         # Set width and alias of visible columns
         columns_to_delete = []
-        sql = (f"SELECT columnindex, width, alias, status"
-               f" FROM config_form_tableview"
-               f" WHERE tablename = '{table_name}'"
-               f" ORDER BY columnindex")
-        rows = self.controller.get_rows(sql, log_info=False)
+        rows = self.controller.get_tableview_config(table_name)
         if not rows:
             return
 
@@ -588,12 +704,11 @@ class ParentAction(object):
                 widget.setColumnWidth(row['columnindex'] - 1, width)
                 widget.model().setHeaderData(row['columnindex'] - 1, Qt.Horizontal, row['alias'])
 
-        # Set order
+        # Set order. Don't select again models already sorted before their first select
         if isQStandardItemModel:
             widget.model().sort(0, sort_order)
         else:
-            widget.model().setSort(0, sort_order)
-            widget.model().select()
+            set_model_sort(widget.model(), 0, sort_order)
         # Delete columns
         for column in columns_to_delete:
             widget.hideColumn(column)
@@ -649,22 +764,17 @@ class ParentAction(object):
             self.controller.show_warning(message)
             return
 
-        inf_text = ""
-        list_id = ""
+        list_id = []
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_ = widget.model().record(row).value(str(column_id))
-            inf_text += f"{id_}, "
-            list_id += f"'{id_}', "
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+            list_id.append(id_)
+        inf_text = ", ".join([str(id_) for id_ in list_id])
         message = "Are you sure you want to delete these records?"
         title = "Delete records"
         answer = self.controller.ask_question(message, title, inf_text)
         if answer:
-            sql = f"DELETE FROM {table_name}"
-            sql += f" WHERE {column_id} IN ({list_id})"
-            self.controller.execute_sql(sql)
+            self.controller.delete_rows(table_name, column_id, list_id)
             widget.model().select()
 
 
@@ -5,7 +5,7 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsFeatureRequest
+from qgis.core import QgsExpression, QgsFeatureRequest
 from qgis.gui import QgsMapToolEmitPoint, QgsVertexMarker
 from qgis.PyQt.QtWidgets import QTableView, QDateEdit, QLineEdit, QTextEdit, QDateTimeEdit, QComboBox, QCompleter, \
     QAbstractItemView
@@ -23,6 +23,9 @@ from ..map_tools.snapping_utils_v3 import SnappingConfigManager
 
 class ParentManage(ParentAction, object):
 
+    # View, budget column and psector total of every feature type counted in psector budget
+    budget_sources = {}
+
     def __init__(self, iface, settings, controller, plugin_dir):
         """ Class to keep common functions of classes
         'ManageDocument', 'ManageElement' and 'ManageVisit' of toolbar 'edit' """
@@ -39,6 +42,7 @@ class ParentManage(ParentAction, object):
         self.xyCoordinates_conected = False
         self.remove_ids = True
         self.snapper_manager = None
+        self.fid_index = {}
 
 
     def reset_lists(self):
@@ -57,6 +61,7 @@ class ParentManage(ParentAction, object):
         """ Reset list of layers """
 
         self.layers = {}
+        self.fid_index = {}
         self.layers['arc'] = []
         self.layers['node'] = []
         self.layers['connec'] = []
@@ -515,18 +520,10 @@ class ParentManage(ParentAction, object):
             return None
 
         # Set expression filter with features in the list
-        expr_filter = field_id + " IN ("
-        for i in range(len(list_ids)):
-            expr_filter += f"'{list_ids[i]}', "
-        expr_filter = expr_filter[:-2] + ")"
-
-        # Check expression
-        (is_valid, expr) = self.check_expression(expr_filter)
-        if not is_valid:
-            return None
+        expr_filter = self.get_ids_filter(field_id, list_ids)
 
-        # Select features of layers applying @expr
-        self.select_features_by_ids(geom_type, expr)
+        # Select features of layers of the list
+        self.select_features_by_fids(geom_type, list_ids)
 
         return expr_filter
 
@@ -548,36 +545,20 @@ class ParentManage(ParentAction, object):
             self.controller.log_info(msg)
             return None
 
-        expr = self.set_table_model(dialog, widget, geom_type, expr_filter)
-        return expr
+        self.set_table_model(dialog, widget, geom_type, expr_filter)
 
 
     def set_table_model(self, dialog, table_object, geom_type, expr_filter):
         """ Sets a TableModel to @widget_name attached to
             @table_name and filter @expr_filter 
+            (filter is only used by database, so it isn't parsed as a QGIS expression)
         """
 
-        expr = None
-        if expr_filter:
-            # Check expression
-            (is_valid, expr) = self.check_expression(expr_filter)  # @UnusedVariable
-            if not is_valid:
-                return expr
-
         # Set a model with selected filter expression
         table_name = f"v_edit_{geom_type}"
         if self.schema_name not in table_name:
             table_name = self.schema_name + "." + table_name
 
-        # Set the model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.select()
-        if model.lastError().isValid():
-            self.controller.show_warning(model.lastError().text())
-            return expr
-
         # Attach model to selected widget
         if type(table_object) is str:
             # self.controller.log_debug(f"set_table_model (str): {table_object}")
@@ -585,23 +566,30 @@ class ParentManage(ParentAction, object):
             if not widget:
                 message = "Widget not found"
                 self.controller.log_info(message, parameter=table_object)
-                return expr
+                return
         elif type(table_object) is QTableView:
             # self.controller.log_debug(f"set_table_model: {table_object.objectName()}")
             widget = table_object
         else:
             msg = "Table_object is not a table name or QTableView"
             self.controller.log_info(msg)
-            return expr
+            return
 
-        if expr_filter:
-            widget.setModel(model)
-            widget.model().setFilter(expr_filter)
-            widget.model().select()
-        else:
+        # Without filter expression table is left empty
+        if not expr_filter:
             widget.setModel(None)
+            return
+
+        # Set the model with selected filter expression
+        model = self.create_table_model(table_name, expr_filter, sort_order=None)
+        model.select()
+        if model.lastError().isValid():
+            self.controller.show_warning(model.lastError().text())
+            return
 
-        return expr
+        widget.setModel(model)
+
+        return
 
 
     def apply_lazy_init(self, widget):
@@ -624,23 +612,67 @@ class ParentManage(ParentAction, object):
         self.lazy_init_function = init_function
 
 
-    def select_features_by_ids(self, geom_type, expr):
-        """ Select features of layers of group @geom_type applying @expr """
+    def get_ids_filter(self, field_id, ids):
+        """ Return filter of rows with @field_id in list @ids, valid for database and QGIS """
+
+        values = ", ".join("'" + str(id_).replace("'", "''") + "'" for id_ in ids)
+        return f'"{field_id}" IN ({values})'
+
+
+    def get_selected_ids(self, geom_type):
+        """ Return ids of features selected in layers of group @geom_type.
+            Only their attribute '@geom_type_id' is read, and their feature ids are kept in 'fid_index' """
+
+        field_id = f"{geom_type}_id"
+        selected_ids = []
+        for layer in self.layers.get(geom_type, []):
+            if layer.selectedFeatureCount() == 0 or layer.fields().indexOf(field_id) == -1:
+                continue
+
+            index = self.fid_index.setdefault(layer.id(), {})
+            request = QgsFeatureRequest().setFilterFids(layer.selectedFeatureIds())
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes([field_id], layer.fields())
+            for feature in layer.getFeatures(request):
+                selected_id = feature[field_id]
+                index[str(selected_id)] = feature.id()
+                selected_ids.append(selected_id)
+
+        return selected_ids
+
+
+    def get_feature_fids(self, layer, field_id, ids):
+        """ Return feature ids of features of @layer with @field_id in list @ids.
+            Ids not found in 'fid_index' are looked up with a single request, that only reads @field_id.
+            Ids not found in @layer are not kept, as their features can be created later """
+
+        index = self.fid_index.setdefault(layer.id(), {})
+        missing = [str(id_) for id_ in ids if str(id_) not in index]
+        if missing and layer.fields().indexOf(field_id) != -1:
+            values = ", ".join(QgsExpression.quotedValue(id_) for id_ in missing)
+            expr_filter = f"{QgsExpression.quotedColumnRef(field_id)} IN ({values})"
+            request = QgsFeatureRequest().setFilterExpression(expr_filter)
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes([field_id], layer.fields())
+            for feature in layer.getFeatures(request):
+                index[str(feature[field_id])] = feature.id()
+
+        return [index[str(id_)] for id_ in ids if str(id_) in index]
+
+
+    def select_features_by_fids(self, geom_type, ids):
+        """ Select features of layers of group @geom_type with '@geom_type_id' in list @ids, by their feature ids """
 
         if not geom_type in self.layers:
             return
 
-        # Build a list of feature id's and select them
+        field_id = f"{geom_type}_id"
         for layer in self.layers[geom_type]:
-            if expr is None:
-                layer.removeSelection()
+            fids = self.get_feature_fids(layer, field_id, ids) if ids else []
+            if len(fids) > 0:
+                layer.selectByIds(fids)
             else:
-                it = layer.getFeatures(QgsFeatureRequest(expr))
-                id_list = [i.id() for i in it]
-                if len(id_list) > 0:
-                    layer.selectByIds(id_list)
-                else:
-                    layer.removeSelection()
+                layer.removeSelection()
 
 
     def delete_records(self, dialog, table_object, query=False):
@@ -675,63 +707,44 @@ class ParentManage(ParentAction, object):
             return
 
         if query:
-            full_list = widget.model()
-            for x in range(0, full_list.rowCount()):
-                self.ids.append(widget.model().record(x).value(f"{self.geom_type}_id"))
+            # Features related to current psector
+            self.ids = list(self.get_plan_ids(dialog, self.geom_type))
         else:
             self.ids = self.list_ids[self.geom_type]
 
         field_id = self.geom_type + "_id"
 
         del_id = []
-        inf_text = ""
-        list_id = ""
         for i in range(0, len(selected_list)):
             row = selected_list[i].row()
             id_feature = widget.model().record(row).value(field_id)
-            inf_text += f"{id_feature}, "
-            list_id += f"'{id_feature}', "
             del_id.append(id_feature)
-        inf_text = inf_text[:-2]
-        list_id = list_id[:-2]
+        inf_text = ", ".join([str(id_feature) for id_feature in del_id])
         message = "Are you sure you want to delete these records?"
         title = "Delete records"
         answer = self.controller.ask_question(message, title, inf_text)
         if answer:
-            for el in del_id:
-                self.ids.remove(el)
+            deleted = set(str(id_feature) for id_feature in del_id)
+            self.ids = [id_feature for id_feature in self.ids if str(id_feature) not in deleted]
         else:
             return
 
         expr_filter = None
-        expr = None
-        if len(self.ids) > 0:
+        if len(self.ids) > 0 and not query:
 
             # Set expression filter with features in the list
-            expr_filter = f'"{field_id}" IN ('
-            for i in range(len(self.ids)):
-                expr_filter += f"'{self.ids[i]}', "
-            expr_filter = expr_filter[:-2] + ")"
-
-            # Check expression
-            (is_valid, expr) = self.check_expression(expr_filter)  # @UnusedVariable
-            if not is_valid:
-                return
+            expr_filter = self.get_ids_filter(field_id, self.ids)
 
         # Update model of the widget with selected expr_filter
         if query:
-            self.delete_feature_at_plan(dialog, self.geom_type, list_id)
-            self.reload_qtable(dialog, self.geom_type)
+            self.delete_feature_at_plan(dialog, self.geom_type, del_id)
+            self.remove_selection()
         else:
             self.reload_table(dialog, table_object, self.geom_type, expr_filter)
             self.apply_lazy_init(table_object)
 
-        # Select features with previous filter
-        # Build a list of feature id's and select them
-        self.select_features_by_ids(self.geom_type, expr)
-
-        if query:
-            self.remove_selection()
+            # Select features of the list by their feature ids
+            self.select_features_by_fids(self.geom_type, self.ids)
 
         # Update list
         self.list_ids[self.geom_type] = self.ids
@@ -788,49 +801,27 @@ class ParentManage(ParentAction, object):
         if self.remove_ids:
             self.ids = []
 
-        # Iterate over all layers of the group
-        for layer in self.layers[geom_type]:
-            if layer.selectedFeatureCount() > 0:
-                # Get selected features of the layer
-                features = layer.selectedFeatures()
-                for feature in features:
-                    # Append 'feature_id' into the list
-                    selected_id = feature.attribute(field_id)
-                    if selected_id not in self.ids:
-                        self.ids.append(selected_id)
-
-        if geom_type == 'arc':
-            self.list_ids['arc'] = self.ids
-        elif geom_type == 'node':
-            self.list_ids['node'] = self.ids
-        elif geom_type == 'connec':
-            self.list_ids['connec'] = self.ids
-        elif geom_type == 'gully':
-            self.list_ids['gully'] = self.ids
-        elif geom_type == 'element':
-            self.list_ids['element'] = self.ids
+        # Add ids of features selected in layers of the group
+        ids = set(str(id_) for id_ in self.ids)
+        for selected_id in self.get_selected_ids(geom_type):
+            if str(selected_id) not in ids:
+                ids.add(str(selected_id))
+                self.ids.append(selected_id)
+
+        if geom_type in self.list_ids:
+            self.list_ids[geom_type] = self.ids
 
         expr_filter = None
         if len(self.ids) > 0:
             # Set 'expr_filter' with features that are in the list
-            expr_filter = f'"{field_id}" IN ('
-            for i in range(len(self.ids)):
-                expr_filter += f"'{self.ids[i]}', "
-            expr_filter = expr_filter[:-2] + ")"
-
-            # Check expression
-            (is_valid, expr) = self.check_expression(expr_filter)  # @UnusedVariable
-            if not is_valid:
-                return
-
-            self.select_features_by_ids(geom_type, expr)
+            expr_filter = self.get_ids_filter(field_id, self.ids)
+            self.select_features_by_fids(geom_type, self.ids)
 
         # Reload contents of table 'tbl_@table_object_x_@geom_type'
         if query:
             self.insert_feature_to_plan(dialog, geom_type)
             if self.plan_om == 'plan':
                 self.remove_selection()
-            self.reload_qtable(dialog, geom_type)
         else:
             self.reload_table(dialog, table_object, geom_type, expr_filter)
             self.apply_lazy_init(table_object)
@@ -843,12 +834,24 @@ class ParentManage(ParentAction, object):
 
 
     def delete_feature_at_plan(self, dialog, geom_type, list_id):
-        """ Delete features_id to table plan_@geom_type_x_psector"""
+        """ Delete features_id to table plan_@geom_type_x_psector with a single statement.
+            Return list of (id, budget) of deleted features """
+
+        ids = [str(id_) for id_ in list_id if id_ is not None]
+        if not ids:
+            return []
+
+        tablename = f"plan_psector_x_{geom_type}"
+        psector_id = utils_giswater.getWidgetText(dialog, dialog.psector_id)
+        sql = (f"DELETE FROM {tablename}"
+               + self.controller.get_bulk_filter(tablename, f"{geom_type}_id", "psector_id = %(psector_id)s"))
+        rows = self.execute_plan_mutation(geom_type, sql, {'ids': ids, 'psector_id': psector_id})
+        if rows is None:
+            return []
 
-        value = utils_giswater.getWidgetText(dialog, dialog.psector_id)
-        sql = (f"DELETE FROM plan_psector_x_{geom_type} "
-               f"WHERE {geom_type}_id IN ({list_id}) AND psector_id = '{value}'")
-        self.controller.execute_sql(sql)
+        self.refresh_plan_table(dialog, geom_type)
+
+        return rows
 
 
     def enable_feature_type(self, dialog, widget_name='tbl_relation'):
@@ -878,53 +881,21 @@ class ParentManage(ParentAction, object):
 
         field_id = f"{self.geom_type}_id"
         feature_id = utils_giswater.getWidgetText(dialog, "feature_id")
-        expr_filter = f"{field_id} = '{feature_id}'"
-
-        # Check expression
-        (is_valid, expr) = self.check_expression(expr_filter)
-        if not is_valid:
-            return None
-
-        # Select features of layers applying @expr
-        self.select_features_by_ids(self.geom_type, expr)
-
         if feature_id == 'null':
+            self.select_features_by_fids(self.geom_type, [])
             message = "You need to enter a feature id"
             self.controller.show_info_box(message)
             return
 
-        # Iterate over all layers of the group
-        for layer in self.layers[self.geom_type]:
-            if layer.selectedFeatureCount() > 0:
-                # Get selected features of the layer
-                features = layer.selectedFeatures()
-                for feature in features:
-                    # Append 'feature_id' into the list
-                    selected_id = feature.attribute(field_id)
-                    if selected_id not in self.ids:
-                        self.ids.append(selected_id)
-            if feature_id not in self.ids:
-                # If feature id doesn't exist in list -> add
-                self.ids.append(str(feature_id))
+        # If feature id doesn't exist in list -> add
+        if feature_id not in set(str(id_) for id_ in self.ids):
+            self.ids.append(feature_id)
 
         # Set expression filter with features in the list
-        expr_filter = f'"{field_id}" IN (  '
-        for i in range(len(self.ids)):
-            expr_filter += f"'{self.ids[i]}', "
-        expr_filter = expr_filter[:-2] + ")"
-
-        # Check expression
-        (is_valid, expr) = self.check_expression(expr_filter)
-        if not is_valid:
-            return
+        expr_filter = self.get_ids_filter(field_id, self.ids)
 
-        # Select features with previous filter
-        # Build a list of feature id's and select them
-        for layer in self.layers[self.geom_type]:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            id_list = [i.id() for i in it]
-            if len(id_list) > 0:
-                layer.selectByIds(id_list)
+        # Select features of the list by their feature ids
+        self.select_features_by_fids(self.geom_type, self.ids)
 
         # Reload contents of table 'tbl_???_x_@geom_type'
         if query:
@@ -943,19 +914,75 @@ class ParentManage(ParentAction, object):
 
 
     def insert_feature_to_plan(self, dialog, geom_type):
-        """ Insert features_id to table plan_@geom_type_x_psector """
+        """ Insert features_id to table plan_@geom_type_x_psector. Only selected features not already related
+            to the psector are inserted, with a single statement. Return list of (id, budget) of inserted features """
+
+        ids = list(dict.fromkeys(str(id_) for id_ in self.ids if id_ is not None))
+        if not ids:
+            return []
+
+        tablename = f"plan_psector_x_{geom_type}"
+        column_id = f"{geom_type}_id"
+        column_type = self.controller.get_column_type(tablename, column_id) or 'text'
+        psector_id = utils_giswater.getWidgetText(dialog, dialog.psector_id)
+        sql = (f"INSERT INTO {tablename} ({column_id}, psector_id)"
+               f" SELECT id, %(psector_id)s::integer FROM unnest(%(ids)s::{column_type}[]) AS id"
+               f" WHERE NOT EXISTS (SELECT 1 FROM {tablename}"
+               f" WHERE {tablename}.{column_id} = id AND {tablename}.psector_id = %(psector_id)s::integer)")
+        rows = self.execute_plan_mutation(geom_type, sql, {'ids': ids, 'psector_id': psector_id})
+        if rows is None:
+            return []
+
+        self.refresh_plan_table(dialog, geom_type)
+
+        return rows
+
+
+    def execute_plan_mutation(self, geom_type, sql, params):
+        """ Execute @sql (INSERT or DELETE of table plan_psector_x_@geom_type) binding @params.
+            Return list of (id, budget) of affected features, where budget is only set for doable features
+            of types counted in psector budget (attribute 'budget_sources'). Return None if it failed """
+
+        column_id = f"{geom_type}_id"
+        if geom_type in self.budget_sources:
+            view, column = self.budget_sources[geom_type][:2]
+            sql = (f"WITH affected AS ({sql} RETURNING {column_id}, doable)"
+                   f" SELECT affected.{column_id}, CASE WHEN affected.doable THEN {view}.{column} END AS budget"
+                   f" FROM affected"
+                   f" LEFT JOIN {view} ON {view}.{column_id} = affected.{column_id}")
+        else:
+            sql += f" RETURNING {column_id}, NULL AS budget"
+
+        rows = self.controller.get_rows(sql, log_info=False, params=params)
+        if self.controller.last_error:
+            return None
+
+        return rows or []
+
+
+    def get_plan_ids(self, dialog, geom_type):
+        """ Return set of ids of features of @geom_type related to current psector, read from database
+            (relations can also be changed by other users, triggers or database functions) """
+
+        psector_id = utils_giswater.getWidgetText(dialog, dialog.psector_id)
+        sql = f"SELECT {geom_type}_id FROM plan_psector_x_{geom_type} WHERE psector_id = %s"
+        rows = self.controller.get_rows(sql, log_info=False, params=(psector_id, ))
+
+        return set(str(row[0]) for row in rows or [])
+
+
+    def refresh_plan_table(self, dialog, geom_type):
+        """ Select again rows of model of table 'tbl_psector_x_@geom_type', keeping its configuration """
 
         value = utils_giswater.getWidgetText(dialog, dialog.psector_id)
-        for i in range(len(self.ids)):
-            sql = (f"SELECT {geom_type}_id "
-                   f"FROM plan_psector_x_{geom_type} "
-                   f"WHERE {geom_type}_id = '{self.ids[i]}' AND psector_id = '{value}'")
-            row = self.controller.get_row(sql)
-            if not row:
-                sql = (f"INSERT INTO plan_psector_x_{geom_type}"
-                       f"({geom_type}_id, psector_id) VALUES('{self.ids[i]}', '{value}')")
-                self.controller.execute_sql(sql)
+        qtable = utils_giswater.getWidget(dialog, f'tbl_psector_x_{geom_type}')
+        model = qtable.model() if qtable else None
+        if not isinstance(model, QSqlTableModel) or model.filter() != f"psector_id = '{value}'":
             self.reload_qtable(dialog, geom_type)
+            return
+
+        model.select()
+        self.refresh_map_canvas()
 
 
     def reload_qtable(self, dialog, geom_type):
@@ -977,10 +1004,7 @@ class ParentManage(ParentAction, object):
         if self.schema_name not in table_name:
             table_name = self.schema_name + "." + table_name
 
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setFilter(expr)
-        model.setEditStrategy(QSqlTableModel.OnFieldChange)
+        model = self.create_table_model(table_name, expr, QSqlTableModel.OnFieldChange, sort_order=None)
         qtable.setEditTriggers(QTableView.DoubleClicked)
         model.select()
         qtable.setModel(model)
@@ -1009,12 +1033,7 @@ class ParentManage(ParentAction, object):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.sort(0, 1)
-        if expr_filter:
-            model.setFilter(expr_filter)
+        model = self.create_table_model(table_name, expr_filter, sort_order=Qt.DescendingOrder)
         model.select()
 
         # Check for errors
@@ -1216,10 +1235,7 @@ class ParentManage(ParentAction, object):
             table_name = self.schema_name + "." + table_name
 
         # Set model
-        model = QSqlTableModel(db=self.controller.db)
-        model.setTable(table_name)
-        model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        model.setFilter(expr_filter)
+        model = self.create_table_model(table_name, expr_filter, sort_order=None)
         model.select()
 
         # Check for errors
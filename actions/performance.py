@@ -0,0 +1,124 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtWidgets import QFileDialog, QTableWidgetItem
+
+import os
+
+from .parent import ParentAction
+from ..ui_manager import PerformanceUi
+
+
+class Performance(ParentAction):
+
+    summary_headers = ('function', 'calls', 'total_ms', 'max_ms', 'rows', 'bytes')
+
+    def __init__(self, iface, settings, controller, plugin_dir):
+        """ Class to show query telemetry recorded by DaoController in a dockable panel """
+
+        ParentAction.__init__(self, iface, settings, controller, plugin_dir)
+        self.dlg_performance = None
+
+
+    def open_panel(self):
+        """ Show dockable panel 'Performance' """
+
+        if self.dlg_performance:
+            self.dlg_performance.show()
+            self.dlg_performance.raise_()
+            self.fill_tables()
+            return
+
+        self.dlg_performance = PerformanceUi()
+        self.controller.manage_translation('performance', self.dlg_performance)
+        self.dlg_performance.btn_refresh.clicked.connect(self.fill_tables)
+        self.dlg_performance.btn_clear.clicked.connect(self.clear_telemetry)
+        self.dlg_performance.btn_export.clicked.connect(self.export_telemetry)
+        self.dlg_performance.dlg_closed.connect(self.close_panel)
+        self.iface.addDockWidget(Qt.BottomDockWidgetArea, self.dlg_performance)
+        self.fill_tables()
+
+
+    def close_panel(self):
+
+        if self.dlg_performance:
+            self.iface.removeDockWidget(self.dlg_performance)
+            self.dlg_performance.deleteLater()
+        self.dlg_performance = None
+
+
+    def fill_tables(self):
+        """ Fill tables with summary per function and last recorded queries """
+
+        telemetry = self.controller.get_query_telemetry()
+        if telemetry is None:
+            message = "Query telemetry is disabled"
+            self.controller.show_info(message, parameter="query_telemetry_size")
+            return
+
+        self.fill_table(self.dlg_performance.tbl_summary, self.summary_headers, telemetry.get_summary())
+        records = [[record[field] for field in telemetry.fields] for record in reversed(telemetry.get_records())]
+        self.fill_table(self.dlg_performance.tbl_queries, telemetry.fields, records)
+
+
+    def fill_table(self, qtable, headers, rows):
+        """ Fill QTableWidget @qtable with @rows """
+
+        qtable.setSortingEnabled(False)
+        qtable.clear()
+        qtable.setColumnCount(len(headers))
+        qtable.setHorizontalHeaderLabels(headers)
+        qtable.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column_index, value in enumerate(row):
+                item = QTableWidgetItem()
+                if isinstance(value, (int, float)):
+                    item.setData(Qt.DisplayRole, value)
+                elif value is not None:
+                    item.setText(str(value))
+                qtable.setItem(row_index, column_index, item)
+        qtable.setSortingEnabled(True)
+        qtable.resizeColumnsToContents()
+
+
+    def clear_telemetry(self):
+
+        telemetry = self.controller.get_query_telemetry()
+        if telemetry:
+            telemetry.clear()
+        self.fill_tables()
+
+
+    def export_telemetry(self):
+        """ Export recorded queries to a CSV or JSON file """
+
+        telemetry = self.controller.get_query_telemetry()
+        if telemetry is None:
+            return
+
+        message = self.controller.tr("Export queries")
+        folder = self.controller.plugin_settings_value('performance_export_folder', os.path.expanduser("~"))
+        path, filter_ = QFileDialog.getSaveFileName(None, message, folder, 'CSV (*.csv);;JSON (*.json)')
+        if not path:
+            return
+
+        if 'json' in filter_ and not path.lower().endswith('.json'):
+            path += '.json'
+        elif 'csv' in filter_.lower() and os.path.splitext(path)[1] == '':
+            path += '.csv'
+
+        try:
+            telemetry.export(path)
+        except Exception as e:
+            self.controller.show_warning(str(e), parameter=path)
+            return
+
+        self.controller.plugin_settings_set_value('performance_export_folder', os.path.dirname(path))
+        message = "File exported successfully"
+        self.controller.show_info(message, parameter=path)
+
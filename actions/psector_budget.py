@@ -0,0 +1,104 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+def to_decimal(value):
+    """ Return @value as Decimal, 0 if it is not a number """
+
+    try:
+        return Decimal(str(value)) if value not in (None, '', 'null') else Decimal(0)
+    except InvalidOperation:
+        return Decimal(0)
+
+
+class PsectorBudget(object):
+    """ Budget of a psector, as computed by view 'v_plan_current_psector'.
+        Totals of arcs, nodes and other prices are added up (pem), and then general expenses (pec),
+        VAT (pec_vat) and other expenses (pca) percentages are applied in this order """
+
+    # Columns of 'v_plan_current_psector' loaded from database
+    fields = ('total_arc', 'total_node', 'total_other', 'pem', 'pec', 'pec_vat', 'gexpenses', 'vat', 'other', 'pca')
+
+    def __init__(self, psector_id=None, row=None):
+
+        self.psector_id = psector_id
+        self.total_arc = Decimal(0)
+        self.total_node = Decimal(0)
+        self.total_other = Decimal(0)
+        self.gexpenses = Decimal(0)
+        self.vat = Decimal(0)
+        self.other = Decimal(0)
+        self.pem = Decimal(0)
+        self.pec = Decimal(0)
+        self.pec_vat = Decimal(0)
+        self.pca = Decimal(0)
+        if row:
+            for field in self.fields:
+                setattr(self, field, to_decimal(row[field]))
+
+
+    @classmethod
+    def load(cls, controller, psector_id):
+        """ Return budget of psector @psector_id, read with a single query """
+
+        sql = (f"SELECT {', '.join(cls.fields)}"
+               f" FROM v_plan_current_psector"
+               f" WHERE psector_id = %s")
+        row = controller.get_row(sql, log_info=False, params=(psector_id, ))
+
+        return cls(psector_id, row)
+
+
+    def recalculate(self):
+        """ Compute amounts from totals and percentages """
+
+        self.pem = self.total_arc + self.total_node + self.total_other
+        self.pec = self.pem * (100 + self.gexpenses) / 100
+        self.pec_vat = self.pec * (100 + self.vat) / 100
+        self.pca = self.pec_vat * (100 + self.other) / 100
+
+
+    def add(self, field, amount):
+        """ Add @amount (negative to subtract) to total @field ('total_arc', 'total_node' or 'total_other') """
+
+        setattr(self, field, getattr(self, field) + to_decimal(amount))
+        self.recalculate()
+
+
+    def set_percent(self, field, value):
+        """ Set percentage @field ('gexpenses', 'vat' or 'other') """
+
+        setattr(self, field, to_decimal(value))
+        self.recalculate()
+
+
+    @property
+    def pec_pem(self):
+        return self.pec - self.pem
+
+
+    @property
+    def pecvat_pem(self):
+        return self.pec_vat - self.pec
+
+
+    @property
+    def pca_pecvat(self):
+        return self.pca - self.pec_vat
+
+
+    def get_values(self):
+        """ Return dict of widget names and amounts rounded to 2 decimals """
+
+        values = {field: getattr(self, field) for field in self.fields}
+        values['pec_pem'] = self.pec_pem
+        values['pecvat_pem'] = self.pecvat_pem
+        values['pca_pecvat'] = self.pca_pecvat
+
+        return {key: value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) for key, value in values.items()}
@@ -0,0 +1,461 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.core import QgsExpression, QgsExpressionContextUtils, QgsFeatureRequest, QgsLayoutExporter, \
+    QgsLayoutItemLabel, QgsLayoutItemMap, QgsLayoutItemPicture, QgsMapRendererParallelJob, QgsPrintLayout, \
+    QgsProject, QgsReadWriteContext, QgsUnitTypes
+from qgis.PyQt.QtCore import QObject, QSizeF, Qt, QTimer, pyqtSignal
+from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtXml import QDomDocument
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import partial
+
+
+class MapImageCache(object):
+    """ Images of map items already rendered, shared by all reports of a batch.
+        Images are stored as PNG files in a temporary folder, keyed by the map settings they are rendered with.
+        Must be used from the GUI thread: only rendering jobs run in background """
+
+    def __init__(self, folder=None):
+
+        self.folder = folder or tempfile.mkdtemp(prefix='gw_reports_')
+        self.paths = {}
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def get_key(settings):
+        """ Return key of image rendered with map @settings """
+
+        size = settings.outputSize()
+        background = settings.backgroundColor().name(QColor.HexArgb)
+        key = (f"{','.join(layer.id() for layer in settings.layers())}|{settings.extent().toString(6)}|"
+               f"{settings.rotation()}|{settings.destinationCrs().authid()}|{size.width()}x{size.height()}|"
+               f"{settings.outputDpi()}|{background}")
+
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+    def get_path(self, key):
+        """ Return path of image @key, or None if it isn't rendered yet """
+
+        path = self.paths.get(key)
+        if path:
+            self.hits += 1
+
+        return path
+
+
+    def add_image(self, key, image, dpi):
+        """ Save rendered @image as image @key. Return its path """
+
+        image.setDotsPerMeterX(int(dpi / 0.0254))
+        image.setDotsPerMeterY(int(dpi / 0.0254))
+        path = os.path.join(self.folder, f"{key}.png")
+        image.save(path, 'PNG')
+        self.paths[key] = path
+        self.misses += 1
+
+        return path
+
+
+    def render(self, key, settings):
+        """ Render image @key with map @settings, waiting until it is finished. Return its path """
+
+        job = QgsMapRendererParallelJob(settings)
+        job.start()
+        job.waitForFinished()
+
+        return self.add_image(key, job.renderedImage(), settings.outputDpi())
+
+
+    def clear(self):
+        """ Remove all cached images """
+
+        self.paths = {}
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class ReportEngine(object):
+    """ Export reports of a print layout to PDF files, without opening the layout designer.
+        Every report is a dict with keys:
+            'path': PDF file to create
+            'filter': expression selecting the atlas feature of the report (layouts with atlas)
+            'extent': QgsRectangle of main map item @map_item_id (layouts without atlas)
+            'texts': {item id: text} of labels
+            'variables': {name: value} of layout variables
+        Map items without grids nor overviews are rendered once per extent and reused by the following
+        reports (set @use_cache False if their symbology depends on the atlas feature or layout variables) """
+
+    def __init__(self, dpi=None, use_cache=True, map_item_id='Mapa'):
+
+        self.dpi = dpi
+        self.map_item_id = map_item_id
+        self.cache = MapImageCache() if use_cache else None
+
+
+    @staticmethod
+    def load_layout(name, project=None):
+        """ Return print layout @name of @project, or a new one loaded from template file @name (.qpt) """
+
+        project = project or QgsProject.instance()
+        layout = project.layoutManager().layoutByName(name)
+        if layout or not os.path.isfile(name):
+            return layout
+
+        with open(name, 'rt') as template_file:
+            document = QDomDocument()
+            document.setContent(template_file.read())
+        layout = QgsPrintLayout(project)
+        layout.loadFromTemplate(document, QgsReadWriteContext())
+        if not layout.name():
+            layout.setName(os.path.splitext(os.path.basename(name))[0])
+
+        return layout
+
+
+    def get_main_map(self, layout):
+
+        map_item = layout.itemById(self.map_item_id)
+        if isinstance(map_item, QgsLayoutItemMap):
+            return map_item
+
+        return layout.referenceMap()
+
+
+    def get_reports(self, layout, folder, layer=None, expression=None, field='id', file_name='{layout}_{id}.pdf',
+                    title=None, margin=0.1):
+        """ Return one report for every feature of @layer (atlas coverage layer by default) matching @expression.
+            Reports are identified by value of @field, used in @file_name and @title (text of label 'title').
+            In layouts without atlas, main map is zoomed to feature extent, enlarged by @margin """
+
+        atlas = layout.atlas()
+        if layer is None and atlas.enabled():
+            layer = atlas.coverageLayer()
+        if layer is None:
+            return []
+
+        request = QgsFeatureRequest()
+        if expression:
+            request.setFilterExpression(expression)
+
+        reports = []
+        for feature in layer.getFeatures(request):
+            value = feature[field]
+            report = {'path': os.path.join(folder, file_name.format(layout=layout.name(), id=value)),
+                      'variables': {field: value}}
+            if atlas.enabled():
+                report['filter'] = f"{QgsExpression.quotedColumnRef(field)} = {QgsExpression.quotedValue(value)}"
+            elif feature.hasGeometry():
+                extent = feature.geometry().boundingBox()
+                extent.grow(max(extent.width(), extent.height(), 1) * margin)
+                report['extent'] = extent
+            if title:
+                report['texts'] = {'title': title.format(id=value)}
+            reports.append(report)
+
+        return reports
+
+
+    def prepare_report(self, layout, report):
+        """ Set variables, texts, extent and atlas feature of @report in @layout.
+            Return error message or None. If there is no error, finish_report must be called after exporting it """
+
+        for name, value in report.get('variables', {}).items():
+            QgsExpressionContextUtils.setLayoutVariable(layout, name, value)
+        for item_id, text in report.get('texts', {}).items():
+            item = layout.itemById(item_id)
+            if isinstance(item, QgsLayoutItemLabel):
+                item.setText(str(text))
+        map_item = self.get_main_map(layout)
+        if map_item and report.get('extent'):
+            map_item.zoomToExtent(report['extent'])
+
+        # Move atlas to the feature of the report
+        atlas = layout.atlas()
+        if atlas.enabled():
+            atlas.setFilterFeatures(bool(report.get('filter')))
+            atlas.setFilterExpression(report.get('filter', ''))
+            if not atlas.beginRender() or not atlas.first():
+                atlas.endRender()
+                return "No atlas feature found"
+
+        layout.refresh()
+        return None
+
+
+    def export_report(self, layout, report):
+        """ Export @report already prepared in @layout, replacing its map items with cached images.
+            Return error message or None """
+
+        pictures = self.cache_map_items(layout) if self.cache else []
+        try:
+            settings = QgsLayoutExporter.PdfExportSettings()
+            if self.dpi:
+                settings.dpi = self.dpi
+            result = QgsLayoutExporter(layout).exportToPdf(report['path'], settings)
+            if result != QgsLayoutExporter.Success:
+                return f"Export error {result}"
+        finally:
+            self.restore_map_items(layout, pictures)
+
+        return None
+
+
+    def finish_report(self, layout):
+
+        if layout.atlas().enabled():
+            layout.atlas().endRender()
+
+
+    def render_report(self, layout, report):
+        """ Export @report with @layout (a layout not shown in any designer), waiting for it.
+            Return error message or None """
+
+        error = self.prepare_report(layout, report)
+        if error:
+            return error
+
+        try:
+            return self.export_report(layout, report)
+        finally:
+            self.finish_report(layout)
+
+
+    def render_reports(self, layout, reports, set_progress=None, is_canceled=None):
+        """ Export @reports one after another with @layout, waiting for them (see class ReportBatch to export
+            them without blocking the GUI). Return list of (path, error) of failed ones """
+
+        failed = []
+        for index, report in enumerate(reports):
+            if is_canceled and is_canceled():
+                break
+            try:
+                error = self.render_report(layout, report)
+            except Exception as e:
+                error = str(e)
+            if error:
+                failed.append((report['path'], error))
+            if set_progress:
+                set_progress((index + 1) * 100.0 / len(reports))
+
+        return failed
+
+
+    def get_map_images(self, layout):
+        """ Return list of (map item, key, map settings) of map items of @layout that can be replaced
+            with a cached image, being map settings the ones used to render its image """
+
+        dpi = self.dpi or layout.renderContext().dpi()
+        images = []
+        for item in layout.items():
+            if not isinstance(item, QgsLayoutItemMap) or not item.isVisible():
+                continue
+            if item.grids().size() > 0 or item.overviews().size() > 0:
+                continue
+
+            width = layout.convertFromLayoutUnits(item.rect().width(), QgsUnitTypes.LayoutMillimeters).length()
+            height = layout.convertFromLayoutUnits(item.rect().height(), QgsUnitTypes.LayoutMillimeters).length()
+            width = int(round(width / 25.4 * dpi))
+            height = int(round(height / 25.4 * dpi))
+            if width <= 0 or height <= 0:
+                continue
+
+            # Render map the same way the layout does it
+            settings = item.mapSettings(item.extent(), QSizeF(width, height), dpi, True)
+            settings.setBackgroundColor(item.backgroundColor() if item.hasBackground() else QColor(Qt.transparent))
+            images.append((item, self.cache.get_key(settings), settings))
+
+        return images
+
+
+    def cache_map_items(self, layout):
+        """ Replace map items of @layout with pictures of their cached images, rendering the missing ones.
+            Return replaced items """
+
+        pictures = []
+        for item, key, settings in self.get_map_images(layout):
+            path = self.cache.get_path(key) or self.cache.render(key, settings)
+            picture = QgsLayoutItemPicture(layout)
+            picture.setPicturePath(path)
+            picture.setResizeMode(QgsLayoutItemPicture.Stretch)
+            picture.attemptMove(item.positionWithUnits())
+            picture.attemptResize(item.sizeWithUnits())
+            picture.setItemRotation(item.itemRotation())
+            picture.setZValue(item.zValue())
+            picture.setFrameEnabled(item.frameEnabled())
+            picture.setFrameStrokeColor(item.frameStrokeColor())
+            picture.setFrameStrokeWidth(item.frameStrokeWidth())
+            layout.addLayoutItem(picture)
+            item.setVisibility(False)
+            pictures.append((item, picture))
+
+        return pictures
+
+
+    def restore_map_items(self, layout, pictures):
+
+        for item, picture in pictures:
+            layout.removeLayoutItem(picture)
+            item.setVisibility(True)
+
+
+    def close(self):
+        """ Remove images cached by this engine """
+
+        if self.cache:
+            self.cache.clear()
+
+
+class ReportBatch(QObject):
+    """ Export @reports with @engine (class ReportEngine) and @layout, a clone only used by this batch,
+        without blocking the GUI. Layout is only used from the GUI thread: reports are exported one after
+        another, scheduled with QTimer, and only map images missing in the cache of @engine are rendered
+        in background, by map renderer parallel jobs. When it finishes, signal 'finished' is emitted
+        with the list of (path, error) of reports not exported """
+
+    finished = pyqtSignal(list)
+
+    # Keep a reference to started batches until they finish
+    running_batches = set()
+
+    def __init__(self, engine, layout, reports):
+
+        super().__init__()
+        self.engine = engine
+        self.layout = layout
+        self.reports = list(reports)
+        self.index = 0
+        self.failed = []
+        self.jobs = {}
+        self.canceled = False
+
+
+    def start(self):
+
+        ReportBatch.running_batches.add(self)
+        QTimer.singleShot(0, self.next_report)
+        return self
+
+
+    def cancel(self):
+        """ Stop after the report being exported """
+
+        self.canceled = True
+
+
+    def next_report(self):
+
+        if self.canceled or self.index >= len(self.reports):
+            ReportBatch.running_batches.discard(self)
+            self.layout = None
+            self.finished.emit(self.failed)
+            return
+
+        try:
+            error = self.engine.prepare_report(self.layout, self.reports[self.index])
+        except Exception as e:
+            error = str(e)
+        if error:
+            self.report_finished(error)
+            return
+
+        # Render missing map images in background, exporting the report when all of them are rendered
+        if self.engine.cache:
+            for item, key, settings in self.engine.get_map_images(self.layout):
+                if key not in self.jobs and not self.engine.cache.get_path(key):
+                    self.jobs[key] = QgsMapRendererParallelJob(settings)
+            for key, job in list(self.jobs.items()):
+                job.finished.connect(partial(self.render_finished, key, job))
+                job.start()
+
+        if not self.jobs:
+            self.export_report()
+
+
+    def render_finished(self, key, job):
+
+        self.engine.cache.add_image(key, job.renderedImage(), job.mapSettings().outputDpi())
+        self.jobs.pop(key, None)
+        if not self.jobs:
+            self.export_report()
+
+
+    def export_report(self):
+
+        try:
+            error = self.engine.export_report(self.layout, self.reports[self.index])
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.engine.finish_report(self.layout)
+        self.report_finished(error)
+
+
+    def report_finished(self, error):
+
+        if error:
+            self.failed.append((self.reports[self.index]['path'], error))
+        self.index += 1
+        QTimer.singleShot(0, self.next_report)
+
+
+def main(argv=None):
+    """ Export reports of a print layout of current project, one PDF file per feature.
+        Usable from the GUI thread of a QGIS processing script or the Python console, e.g. every mincut of October:
+            main(['mincut', '/data/reports', '--layer', 'v_om_mincut', '--title', 'Mincut {id}',
+                  '--filter', "to_date(\\"forecast_start\\") >= '2026-10-01' AND "
+                              "to_date(\\"forecast_start\\") < '2026-11-01'"])
+        Return dict with number of exported reports, failed ones and use of map image cache """
+
+    parser = argparse.ArgumentParser(prog='report_engine', description=main.__doc__.splitlines()[0].strip())
+    parser.add_argument('layout', help="Name of a print layout of current project, or path of a template (.qpt)")
+    parser.add_argument('output_folder', help="Folder where PDF files are created")
+    parser.add_argument('--layer', help="Layer with one feature per report (default: atlas coverage layer)")
+    parser.add_argument('--filter', help="Expression selecting features to report")
+    parser.add_argument('--field', default='id', help="Field identifying every report (default: id)")
+    parser.add_argument('--file-name', default='{layout}_{id}.pdf', help="File name pattern of reports")
+    parser.add_argument('--title', help="Text of label 'title' of every report, e.g. 'Mincut {id}'")
+    parser.add_argument('--map-item', default='Mapa', help="Id of main map item of layouts without atlas")
+    parser.add_argument('--dpi', type=float, help="Export resolution (default: layout resolution)")
+    parser.add_argument('--no-cache', action='store_true', help="Render every map of every report")
+    args = parser.parse_args(argv)
+
+    layout = ReportEngine.load_layout(args.layout)
+    if layout is None:
+        parser.error(f"Layout not found: {args.layout}")
+
+    layer = None
+    if args.layer:
+        layers = QgsProject.instance().mapLayersByName(args.layer)
+        if not layers:
+            parser.error(f"Layer not found: {args.layer}")
+        layer = layers[0]
+
+    if not os.path.exists(args.output_folder):
+        os.makedirs(args.output_folder)
+
+    engine = ReportEngine(args.dpi, not args.no_cache, args.map_item)
+    try:
+        reports = engine.get_reports(layout, args.output_folder, layer, args.filter, args.field, args.file_name,
+                                     args.title)
+        # Never modify layouts of the project
+        failed = engine.render_reports(layout.clone(), reports)
+        result = {'exported': len(reports) - len(failed), 'failed': failed}
+        if engine.cache:
+            result['cache_hits'] = engine.cache.hits
+            result['cache_misses'] = engine.cache.misses
+    finally:
+        engine.close()
+
+    return result
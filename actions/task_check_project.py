@@ -0,0 +1,70 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.core import QgsTask
+
+
+class TaskCheckProject(QgsTask):
+    """ Fill table 'audit_check_project' and execute 'gw_fct_audit_check_project' in background """
+
+    def __init__(self, description, controller, check_project_result, sql, init_project, callback=None):
+
+        super().__init__(description, QgsTask.CanCancel)
+        self.controller = controller
+        self.check_project_result = check_project_result
+        self.sql = sql
+        self.init_project = init_project
+        self.callback = callback
+        self.status = False
+        self.result = None
+        self.exception = None
+
+
+    def run(self):
+
+        self.controller.show_db_exception = False
+        self.status = False
+        self.result = None
+        try:
+            self.setProgress(0)
+            self.status = self.controller.execute_sql(self.sql)
+            if not self.status or self.isCanceled():
+                return False
+
+            self.setProgress(50)
+            self.result = self.check_project_result.get_audit_check_project_result(self.init_project)
+            self.setProgress(100)
+            return True
+        except Exception as e:
+            self.exception = e
+            return False
+
+
+    def finished(self, result):
+
+        self.controller.show_db_exception = True
+
+        if self.exception:
+            self.controller.log_warning(f"Task aborted - {self.description()}: {self.exception}")
+
+        # If Database exception, show dialog after task has finished
+        elif self.controller.last_error:
+            self.controller.show_dlg_info()
+
+        if result:
+            self.check_project_result.manage_audit_check_project_result(self.result)
+
+        if self.callback:
+            self.callback(self.status, self.result)
+
+
+    def cancel(self):
+
+        self.controller.show_db_exception = True
+        self.controller.log_info(f"Task canceled - {self.description()}")
+        super().cancel()
+
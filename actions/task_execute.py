@@ -0,0 +1,183 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.core import QgsApplication, QgsTask
+from qgis.PyQt.QtCore import pyqtSignal, QTimer
+
+import re
+
+
+class TaskExecute(QgsTask):
+    """ Execute a database job in background, with its own database connection.
+        The job is either @sql, or a callable @function that receives this task as its only parameter
+        (and can use its attribute 'dao', its method 'get_json' and check 'isCanceled()').
+        When it finishes, @callback(status, result) is called in the GUI thread.
+        Job is canceled after @timeout seconds, and running query is also canceled in the server.
+        If @async_, connection is asynchronous: @sql is executed with method 'execute_streaming', that emits
+        signal 'message_received' with every message raised by the server while it is running """
+
+    message_received = pyqtSignal(str)
+
+    # Keep a reference to started tasks until they finish
+    running_tasks = set()
+
+    def __init__(self, description, controller, function=None, sql=None, callback=None, timeout=None,
+                 fetch_rows=True, async_=False):
+
+        super().__init__(description, QgsTask.CanCancel)
+        self.controller = controller
+        self.function = function
+        self.sql = sql
+        self.callback = callback
+        self.timeout = timeout
+        self.fetch_rows = fetch_rows
+        self.async_ = async_
+        self.dao = None
+        self.backend_pid = None
+        self.status = False
+        self.result = None
+        self.exception = None
+        self.last_error = None
+        self.timed_out = False
+        self.timer = None
+        self.next_tasks = []
+
+
+    def start(self):
+        """ Add task to QGIS task manager (must be called from GUI thread) """
+
+        if self.timeout:
+            self.timer = QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.manage_timeout)
+            self.timer.start(int(self.timeout * 1000))
+
+        TaskExecute.running_tasks.add(self)
+        QgsApplication.taskManager().addTask(self)
+        return self
+
+
+    def then(self, task):
+        """ Start @task (class TaskExecute) when this one finishes successfully. Return @task to allow chaining """
+
+        self.next_tasks.append(task)
+        return task
+
+
+    def run(self):
+
+        self.status = False
+        self.result = None
+        try:
+            self.dao = self.controller.create_task_dao(self.async_)
+            if self.dao is None:
+                self.last_error = self.controller.last_error
+                return False
+            self.backend_pid = self.dao.conn.get_backend_pid()
+            if self.isCanceled():
+                return False
+
+            if self.function:
+                self.result = self.function(self)
+            elif self.async_:
+                self.result = self.execute_streaming(self.sql)
+            elif self.fetch_rows:
+                self.result = self.dao.get_rows(self.sql, commit=True)
+            else:
+                self.result = self.dao.execute_sql(self.sql)
+
+            if self.dao.last_error:
+                self.last_error = self.dao.last_error
+                return False
+
+            self.status = not self.isCanceled()
+            return self.status
+        except Exception as e:
+            self.exception = e
+            return False
+        finally:
+            self.backend_pid = None
+            if self.dao:
+                self.dao.close_db()
+                self.dao = None
+
+
+    def get_json(self, function_name, parameters=None):
+        """ Execute API function @function_name with this task connection. Return its json response """
+
+        sql = f"SELECT {function_name}({parameters or ''});"
+        if self.async_:
+            rows = self.execute_streaming(sql)
+            row = rows[0] if rows else None
+        else:
+            row = self.dao.get_row(sql, commit=True)
+        if self.dao.last_error or not row:
+            self.sql = sql
+            return None
+
+        return row[0]
+
+
+    def execute_streaming(self, sql):
+        """ Execute @sql with this task asynchronous connection, reporting messages raised by the server.
+            Return fetched rows """
+
+        return self.dao.execute_async(sql, self.manage_message, self.isCanceled)
+
+
+    def manage_message(self, message):
+        """ Emit @message raised by the server. If it contains a percentage, set it as task progress """
+
+        match = re.search(r'(\d+(?:\.\d+)?)\s*%', message)
+        if match:
+            self.setProgress(min(float(match.group(1)), 100))
+        self.message_received.emit(message)
+
+
+    def manage_timeout(self):
+
+        if self.status or self.isCanceled():
+            return
+
+        self.timed_out = True
+        self.controller.log_warning(f"Task timeout ({self.timeout} s) - {self.description()}")
+        self.cancel()
+
+
+    def finished(self, result):
+
+        TaskExecute.running_tasks.discard(self)
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+
+        if self.exception:
+            self.controller.log_warning(f"Task aborted - {self.description()}: {self.exception}")
+        elif self.last_error and not self.isCanceled():
+            self.controller.manage_exception_db(self.last_error, self.sql)
+
+        if self.callback:
+            self.callback(result, self.result)
+
+        if result:
+            for task in self.next_tasks:
+                task.start()
+
+
+    def cancel(self):
+
+        self.controller.log_info(f"Task canceled - {self.description()}")
+        # Cancel query being executed by the server
+        if self.backend_pid:
+            self.controller.execute_sql(f"SELECT pg_cancel_backend({self.backend_pid});", log_error=True)
+        elif self.dao and self.dao.conn:
+            try:
+                self.dao.conn.cancel()
+            except Exception:
+                pass
+        super().cancel()
+
@@ -0,0 +1,104 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import json
+
+from .task_execute import TaskExecute
+
+
+class CsvWriter(object):
+    """ File-like object that writes data sent by the server to @csv_file, reporting progress of @task """
+
+    def __init__(self, csv_file, task):
+
+        self.csv_file = csv_file
+        self.task = task
+
+
+    def write(self, data):
+
+        self.csv_file.write(data)
+        self.task.add_bytes_written(len(data))
+
+
+class TaskExportCsv(TaskExecute):
+    """ Export results of query @sql (or list of queries) to CSV file @path in background,
+        streaming 'COPY (query) TO STDOUT WITH CSV HEADER' straight to the file.
+        If set, @header (list of aliases) replaces column names of every query in the header line,
+        or, being a list of lists of aliases, column names of the query in the same position.
+        Progress is estimated from the number of bytes written and the size of the result
+        estimated by the planner. When it finishes, @callback(status, rows_written) is called,
+        where rows_written is None if the server doesn't report it """
+
+    def __init__(self, description, controller, sql, path, callback=None, timeout=None, header=None):
+
+        super().__init__(description, controller, function=self.export, callback=callback, timeout=timeout)
+        self.queries = [sql] if isinstance(sql, str) else list(sql)
+        self.path = path
+        self.header = header
+        self.bytes_written = 0
+        self.bytes_estimated = 0
+        self.rows_written = 0
+
+
+    def export(self, task):
+
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.bytes_estimated = sum(self.estimate_size(query) for query in self.queries)
+        with open(self.path, 'wb') as csv_file:
+            writer = CsvWriter(csv_file, self)
+            for index, query in enumerate(self.queries):
+                if self.isCanceled():
+                    break
+                header = self.get_header(index)
+                if header:
+                    aliases = ", ".join('"' + str(alias).replace('"', '""') + '"' for alias in header)
+                    query = f"SELECT * FROM ({query}) AS export ({aliases})"
+                sql = f"COPY ({query}) TO STDOUT WITH CSV HEADER"
+                if self.dao.copy_expert(sql, writer):
+                    self.sql = sql
+                    break
+                rowcount = self.dao.get_rowcount()
+                if self.rows_written is not None:
+                    self.rows_written = self.rows_written + rowcount if rowcount >= 0 else None
+
+        return self.rows_written
+
+
+    def get_header(self, index):
+        """ Return aliases of columns of query @index, or None to keep its column names """
+
+        if not self.header:
+            return None
+        if all(isinstance(aliases, (list, tuple)) for aliases in self.header):
+            return self.header[index] if index < len(self.header) else None
+
+        return self.header
+
+
+    def estimate_size(self, query):
+        """ Return size in bytes of results of @query estimated by database planner """
+
+        row = self.dao.get_row(f"EXPLAIN (FORMAT JSON) {query}", commit=True)
+        if self.dao.last_error or not row:
+            self.dao.last_error = None
+            return 0
+
+        try:
+            plan = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+            plan = plan[0]['Plan']
+            return int(plan['Plan Rows']) * (int(plan['Plan Width']) + 1)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return 0
+
+
+    def add_bytes_written(self, size):
+
+        self.bytes_written += size
+        if self.bytes_estimated > 0:
+            self.setProgress(min(99.0, self.bytes_written * 100.0 / self.bytes_estimated))
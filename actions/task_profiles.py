@@ -0,0 +1,168 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import time
+
+from .task_execute import TaskExecute
+from ..map_tools.profile_renderer import render_profiles
+
+
+class TaskProfiles(TaskExecute):
+    """ Export @profiles to image files in background, with its own database connection.
+        Every profile is a dict with keys 'name', 'path', 'title', 'date' and either 'profile_id' (saved profile)
+        or 'init_node', 'end_node' and 'links_distance'. Bodies of API functions are created with
+        @create_body(extras=None). Values of profiles are fetched with a single server call for every
+        @batch_size profiles, and profiles are rendered by a pool of @max_workers processes.
+        When it finishes, @callback(status, results) is called, being results a list of dicts with keys
+        'profile', 'path', 'fetch_time' (average of its batch), 'time' (rendering) and 'error'.
+        If profiles can't be rendered by the pool of processes, the reason is logged as a warning """
+
+    def __init__(self, description, controller, profiles, create_body, batch_size=20, max_workers=None,
+                 callback=None):
+
+        super().__init__(description, controller, function=self.export, callback=callback)
+        self.profiles = profiles
+        self.create_body = create_body
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.results = []
+        self.pool_error = None
+
+
+    def export(self, task):
+
+        self.results = []
+        if not self.set_saved_profiles():
+            return self.results
+
+        # Fetch values of profiles, rendering only the valid ones
+        jobs = []
+        for profile, profile_json in zip(self.profiles, self.get_profiles_values()):
+            error = profile.get('error') or self.get_profile_error(profile_json)
+            if error:
+                self.results.append({'profile': profile['name'], 'path': profile['path'],
+                                     'fetch_time': profile.get('fetch_time', 0), 'time': 0, 'error': error})
+                continue
+            jobs.append({'profile': profile_json, 'path': profile['path'], 'title': profile['title'],
+                         'date': profile['date'], 'name': profile['name'], 'fetch_time': profile['fetch_time']})
+            if self.isCanceled():
+                return self.results
+
+        results = render_profiles(jobs, self.max_workers, self.set_render_progress, self.isCanceled,
+                                  set_pool_error=self.set_pool_error)
+        for job, result in zip(jobs, results):
+            if result is None:
+                result = {'path': job['path'], 'time': 0, 'error': "Canceled"}
+            self.results.append({'profile': job['name'], 'path': result['path'], 'fetch_time': job['fetch_time'],
+                                 'time': result['time'], 'error': result['error']})
+
+        return self.results
+
+
+    def set_saved_profiles(self):
+        """ Set node pairs and settings of saved profiles. Return False if they cannot be read """
+
+        if not any('profile_id' in profile for profile in self.profiles):
+            return True
+
+        result = self.get_json('gw_fct_getprofile', self.create_body())
+        if not result or 'body' not in result:
+            return False
+
+        saved_profiles = {str(row['profile_id']): row['values'] for row in result['body']['data']}
+        for profile in self.profiles:
+            if 'profile_id' not in profile:
+                continue
+            values = saved_profiles.get(str(profile['profile_id']))
+            if values is None:
+                profile['error'] = "Profile not found"
+                continue
+            profile['init_node'] = values['initNode']
+            profile['end_node'] = values['endNode']
+            profile['links_distance'] = values.get('linksDistance')
+            profile['title'] = profile['title'] or values.get('title') or ''
+            profile['date'] = values.get('date') or profile['date']
+
+        return True
+
+
+    def get_profiles_values(self):
+        """ Return values of every profile, calling 'gw_fct_getprofilevalues' for a batch of profiles
+            in every server call. Average time of its batch is set in key 'fetch_time' of every profile """
+
+        results = [None] * len(self.profiles)
+        indexes = [index for index, profile in enumerate(self.profiles) if 'error' not in profile]
+        batch_size = self.batch_size or len(indexes) or 1
+        for start in range(0, len(indexes), batch_size):
+            if self.isCanceled():
+                break
+            batch = indexes[start:start + batch_size]
+            time_start = time.perf_counter()
+            for index, result in zip(batch, self.get_json_batch([self.get_body(self.profiles[i]) for i in batch])):
+                results[index] = result
+            fetch_time = (time.perf_counter() - time_start) / len(batch)
+            for index in batch:
+                self.profiles[index]['fetch_time'] = fetch_time
+            self.setProgress(min(start + batch_size, len(indexes)) * 50.0 / len(indexes))
+
+        return results
+
+
+    def get_body(self, profile):
+
+        extras = f'"initNode":"{profile["init_node"]}", "endNode":"{profile["end_node"]}", '
+        if profile.get('links_distance') not in (None, ''):
+            extras += f'"linksDistance":{profile["links_distance"]}, '
+        extras += '"scale":{ "eh":1000, "ev":1000}'
+
+        return self.create_body(extras=extras)
+
+
+    def get_json_batch(self, bodies):
+        """ Execute 'gw_fct_getprofilevalues' with every one of @bodies in a single select.
+            If it fails, functions are executed one by one to get the results of the valid ones """
+
+        columns = [f"gw_fct_getprofilevalues({body}) AS result_{index}" for index, body in enumerate(bodies)]
+        row = self.dao.get_row("SELECT " + ", ".join(columns) + ";", commit=True)
+        if self.dao.last_error or not row:
+            self.dao.last_error = None
+            results = [self.get_json('gw_fct_getprofilevalues', body) for body in bodies]
+            self.dao.last_error = None
+            return results
+
+        return [row[index] for index in range(len(bodies))]
+
+
+    def get_profile_error(self, profile_json):
+        """ Return error of result @profile_json of 'gw_fct_getprofilevalues', or None if it can be drawn """
+
+        if not profile_json:
+            return "Function error"
+        if profile_json.get('status') == 'Failed':
+            return str(profile_json.get('message') or "Function error")
+        if profile_json.get('message') and int(profile_json['message']['level']) != 3:
+            return profile_json['message']['text']
+
+        return None
+
+
+    def set_render_progress(self, progress):
+
+        self.setProgress(50 + progress / 2)
+
+
+    def set_pool_error(self, message):
+
+        self.pool_error = message
+
+
+    def finished(self, result):
+
+        if self.pool_error:
+            message = "Profiles rendered in a single process"
+            self.controller.log_warning(message, parameter=self.pool_error)
+        super().finished(result)
@@ -0,0 +1,216 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import pyqtSignal, QBuffer, QByteArray, QIODevice, QObject, QRunnable, QSize, QThreadPool
+from qgis.PyQt.QtGui import QImage, QImageReader
+
+import hashlib
+import os
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+
+def is_url(path):
+    """ Check if @path is a remote URL """
+
+    return urllib.parse.urlsplit(str(path)).scheme in ('http', 'https')
+
+
+def read_image_data(path, timeout=10):
+    """ Return content of image file or URL @path """
+
+    if is_url(path):
+        with urllib.request.urlopen(str(path), timeout=timeout) as response:
+            return response.read()
+
+    with open(str(path), 'rb') as image_file:
+        return image_file.read()
+
+
+class ThumbnailLoader(QRunnable):
+    """ Load thumbnail of image @path in a thread of the pool of ThumbnailService """
+
+    def __init__(self, service, path, key):
+
+        super().__init__()
+        self.service = service
+        self.path = path
+        self.key = key
+
+
+    def run(self):
+
+        image = QImage()
+        error = ''
+        try:
+            # Look for thumbnail in disk cache
+            cache_path = self.service.get_cache_path(self.key)
+            if cache_path and os.path.exists(cache_path):
+                image = QImage(cache_path)
+                # Keep recently used thumbnails when pruning disk cache
+                os.utime(cache_path)
+
+            if image.isNull():
+                data = QByteArray(read_image_data(self.path, self.service.timeout))
+                buffer = QBuffer(data)
+                buffer.open(QIODevice.ReadOnly)
+                # Decode image directly at thumbnail size
+                reader = QImageReader(buffer)
+                reader.setScaledSize(self.service.size)
+                image = reader.read()
+                if image.isNull():
+                    error = reader.errorString()
+                elif cache_path:
+                    image.save(cache_path, 'PNG')
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        self.service.image_loaded.emit(self.path, self.key, image, error)
+
+
+class ThumbnailService(QObject):
+    """ Load thumbnails of images (local paths or URLs) out of the GUI thread, with a bounded thread pool.
+        Thumbnails are kept in an in-memory LRU cache and in a size bounded disk cache in @cache_folder,
+        both keyed by path (and modification time of local files). If @cache_folder can't be created,
+        only the in-memory cache is used. Errors are logged as warnings with @controller, if set """
+
+    image_loaded = pyqtSignal(str, str, QImage, str)
+
+    def __init__(self, cache_folder, size=QSize(171, 151), max_threads=4, memory_items=200,
+                 disk_size=100 * 1024 * 1024, timeout=10, controller=None):
+
+        super().__init__()
+        self.controller = controller
+        self.cache_folder = cache_folder
+        self.size = size
+        self.memory_items = memory_items
+        self.disk_size = disk_size
+        self.timeout = timeout
+        self.last_error = None
+        self.loaded = 0
+        self.images = OrderedDict()
+        self.callbacks = {}
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.image_loaded.connect(self.manage_image_loaded)
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+        except OSError as e:
+            self.log_error(e, self.cache_folder)
+            self.cache_folder = None
+        self.prune_disk_cache()
+
+
+    def get_key(self, path):
+        """ Return cache key of image @path """
+
+        key = str(path)
+        if not is_url(path):
+            try:
+                key += f"|{os.path.getmtime(key)}"
+            except OSError:
+                pass
+
+        return key
+
+
+    def get_cache_path(self, key):
+        """ Return path of thumbnail @key in disk cache, or None if there is no disk cache """
+
+        if not self.cache_folder:
+            return None
+
+        return os.path.join(self.cache_folder, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+
+    def request(self, path, callback=None, priority=0):
+        """ Load thumbnail of image @path. When loaded, @callback(path, QImage) is called in GUI thread """
+
+        key = self.get_key(path)
+        if key in self.images:
+            self.images.move_to_end(key)
+            if callback:
+                callback(str(path), self.images[key])
+            return
+
+        pending = key in self.callbacks
+        callbacks = self.callbacks.setdefault(key, [])
+        if callback:
+            callbacks.append(callback)
+        if not pending:
+            self.pool.start(ThumbnailLoader(self, str(path), key), priority)
+
+
+    def prefetch(self, paths):
+        """ Load thumbnails of @paths with low priority, without callback """
+
+        for path in paths:
+            self.request(path, priority=-1)
+
+
+    def cancel_callbacks(self):
+        """ Forget callbacks of pending thumbnails (they will still be cached when loaded) """
+
+        for key in self.callbacks:
+            self.callbacks[key] = []
+
+
+    def manage_image_loaded(self, path, key, image, error):
+
+        if error:
+            self.log_error(error, path)
+        callbacks = self.callbacks.pop(key, [])
+        self.loaded += 1
+        if self.loaded % 100 == 0:
+            self.prune_disk_cache()
+        if not image.isNull():
+            self.images[key] = image
+            while len(self.images) > self.memory_items:
+                self.images.popitem(last=False)
+
+        for callback in callbacks:
+            callback(path, image)
+
+
+    def prune_disk_cache(self):
+        """ Remove least recently modified thumbnails until disk cache is smaller than its maximum size """
+
+        if not self.cache_folder:
+            return
+
+        try:
+            files = []
+            for entry in os.scandir(self.cache_folder):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(file[1] for file in files)
+            for mtime, size, path in sorted(files):
+                if total <= self.disk_size:
+                    break
+                os.remove(path)
+                total -= size
+        except OSError as e:
+            self.log_error(e, self.cache_folder)
+
+
+    def log_error(self, error, parameter):
+
+        self.last_error = error
+        if self.controller:
+            message = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+            self.controller.log_warning(message, parameter=parameter)
+
+
+    def clear(self):
+        """ Remove queued loaders, wait for running ones and forget pending callbacks """
+
+        self.pool.clear()
+        self.pool.waitForDone(1000)
+        self.callbacks = {}
+
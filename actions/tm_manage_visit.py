@@ -307,49 +307,30 @@ class TmManageVisit(TmParentManage, QObject):
 
 
     def update_relations(self):
-        """ Save current selected features in tbl_relations. Steps are:
+        """ Save current selected features in tbl_relations. In a single transaction:
         A) remove all old relations related with current visit_id.
         B) save new relations get from that listed in tbl_relations.
         """
 
-        # A) remove all old relations related with current visit_id.
-        db_record = None
-        for index in range(self.feature_type.count()):
-            # feture_type combobox contain all the geometry type
-            # allows basing on project type
-            geometry_type = self.feature_type.itemText(index).lower()
-
-            if geometry_type == 'node':
-                db_record = OmVisitXNode(self.controller)
-
-            # remove all actual saved records related with visit_id
-            where_clause = "visit_id = '{}'".format(self.visit_id.text())
-            db_record.delete(where_clause=where_clause)
-
-        # do nothing if model is None or no element is present
-        if not self.tbl_relation.model() or not self.tbl_relation.model().rowCount():
+        # feture_type combobox contain all the geometry type allows basing on project type
+        geometry_types = [self.feature_type.itemText(index).lower() for index in range(self.feature_type.count())]
+        if 'node' not in geometry_types:
             return
 
-        # set the current db_record type to do insert of new records
         # all the new records belong to the same geom_type
-        if self.geom_type == 'node':
-            db_record = OmVisitXNode(self.controller)
-
-        # for each showed element of a specific geom_type create an db entry
-        column_name = self.geom_type + "_id"
-        for row in range(self.tbl_relation.model().rowCount()):
-            # get modelIndex to get data
-            index = self.tbl_relation.model().index(row, 0)
-
-            # set common fields
-            db_record.id = db_record.max_pk() + 1
-            db_record.visit_id = int(self.visit_id.text())
-
-            # set value for column <geom_type>_id
-            setattr(db_record, column_name, index.data())
+        records = []
+        model = self.tbl_relation.model()
+        if self.geom_type == 'node' and model:
+            column_name = self.geom_type + "_id"
+            visit_id = int(self.visit_id.text())
+            for row in range(model.rowCount()):
+                # get modelIndex to get data
+                index = model.index(row, 0)
+                records.append({'visit_id': visit_id, column_name: index.data()})
 
-            # than save the showed records
-            db_record.upsert()
+        db_record = OmVisitXNode(self.controller)
+        where_clause = "visit_id = '{}'".format(self.visit_id.text())
+        db_record.replace_relations(where_clause, records)
 
 
     def manage_tab_changed(self, index):
@@ -731,11 +712,7 @@ class TmManageVisit(TmParentManage, QObject):
 
         # Set width and alias of visible columns
         columns_to_delete = []
-        sql = (f"SELECT columnindex, width, alias, status"
-               f" FROM config_form_tableview"
-               f" WHERE tablename = '{table_name}'"
-               f" ORDER BY columnindex")
-        rows = self.controller.get_rows(sql, log_info=False)
+        rows = self.controller.get_tableview_config(table_name)
         if not rows:
             return
 
@@ -202,14 +202,7 @@ class TmParentAction(object):
 
         # Set width and alias of visible columns
         columns_to_delete = []
-        sql = (f"SELECT columnindex, width, alias, status"
-               f" FROM config_form_tableview"
-               f" WHERE tablename = '{table_name}'")
-        if project_type is not None:
-            sql += f" AND project_type = '{project_type}' "
-        sql += " ORDER BY column_index"
-
-        rows = self.controller.get_rows(sql, log_info=False)
+        rows = self.controller.get_tableview_config(table_name, project_type)
         if not rows:
             return
 
@@ -222,7 +215,9 @@ class TmParentAction(object):
                     widget.setColumnWidth(row['columnindex'] - 1, width)
                 widget.model().setHeaderData(row['columnindex'] - 1, Qt.Horizontal, row['alias'])
 
-        widget.model().select()
+        # Only select models that have not been populated yet
+        if not widget.model().query().isActive():
+            widget.model().select()
 
         # Delete columns
         for column in columns_to_delete:
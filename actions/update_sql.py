@@ -1369,10 +1369,17 @@ class UpdateSQL(ApiParent):
                                           schema_name=self.schema_name, commit=False)
         if status is False:
             self.error_count = self.error_count + 1
+        self.reset_project_metadata()
 
         return status
 
 
+    def reset_project_metadata(self):
+        """ Discard project metadata snapshot, as schema objects and version have been changed """
+
+        self.controller.project_metadata = None
+
+
     def task_started(self, task, wait_time):
         """ Dumb test function.
         to break the task raise an exception
@@ -1635,6 +1642,7 @@ class UpdateSQL(ApiParent):
 
         if not is_test:
             self.task1.setProgress(100)
+        self.reset_project_metadata()
         status = (self.error_count == 0)
         self.manage_result_message(status, parameter="Create project")
         if status:
@@ -1716,6 +1724,7 @@ class UpdateSQL(ApiParent):
         QgsApplication.taskManager().addTask(self.task1)
         self.task1.setProgress(50)
         self.load_sql(folder_path)
+        self.reset_project_metadata()
         self.task1.setProgress(100)
 
         status = (self.error_count == 0)
@@ -1787,6 +1796,7 @@ class UpdateSQL(ApiParent):
         self.task1.setProgress(80)
         if status:
             status = self.execute_last_process(schema_name=schema_name, locale=True)
+        self.reset_project_metadata()
         self.task1.setProgress(100)
 
         if update_changelog is False:
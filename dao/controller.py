@@ -14,8 +14,11 @@ from qgis.PyQt.QtWidgets import QCheckBox, QGroupBox, QLabel, QMessageBox, QPush
 
 import shlex
 import configparser
+import hashlib
 import json
 import os
+import re
+import time
 
 from collections import OrderedDict
 from functools import partial
@@ -24,7 +27,9 @@ import traceback
 import sys
 
 from .pg_dao import PgDao
+from .form_cache import FormCache
 from .logger import Logger
+from .query_telemetry import QueryTelemetry
 from .. import utils_giswater
 from .. import sys_manager
 from ..ui_manager import DialogTextUi, DockerUi
@@ -65,6 +70,25 @@ class DaoController(object):
         self.use_notify = False
         self.notify = None
         self.notify_is_listening = False
+        self.layer_source_cache = {}
+        self.project_metadata = None
+        # Parameters of table 'config_param_user' included in project metadata snapshot
+        self.project_metadata_config = ('qgis_toolbar_hidebuttons', 'qgis_info_docker')
+        self.form_cache = None
+        # Column configuration of table views (table 'config_form_tableview') loaded per schema
+        self.tableview_config = {}
+        self.column_types = {}
+        # API functions called through statements prepared once per connection
+        self.prepared_functions = ('gw_fct_getinfofromid', 'gw_fct_getinfofromcoordinates', 'gw_fct_setsearch',
+                                   'gw_fct_setsearchadd', 'gw_fct_gettypeahead', 'gw_fct_getlayersfromcoordinates',
+                                   'gw_fct_getselectors', 'gw_fct_setselectors')
+        self.use_prepared_statements = True
+        if settings is not None:
+            value = settings.value('system_variables/use_prepared_statements', 'TRUE')
+            self.use_prepared_statements = str(value).upper() == 'TRUE'
+        self.functions_found = set()
+        self.statement_stats = {}
+        self.query_telemetry = None
 
         if create_logger:
             self.set_logger(logger_name)
@@ -116,9 +140,13 @@ class DaoController(object):
 
         if self.dao:
             self.stop_notify()
+            self.log_statement_stats()
             if not self.dao.close_db():
                 self.log_info(str(self.last_error))
             del self.dao
+        if self.form_cache:
+            self.form_cache.close()
+            self.form_cache = None
         self.current_user = None
 
 
@@ -216,6 +244,9 @@ class DaoController(object):
         self.last_error = None
         self.logged = False
         self.current_user = None
+        self.project_metadata = None
+        self.tableview_config = {}
+        self.functions_found = set()
 
         self.layer_source, not_version = self.get_layer_source_from_credentials()
         if self.layer_source:
@@ -426,6 +457,7 @@ class DaoController(object):
 
         # Connect to Database
         self.dao = PgDao()
+        self.dao.telemetry = self.get_query_telemetry()
         self.dao.set_params(host, port, db, user, pwd, sslmode)
         status = self.dao.init_db()
         if not status:
@@ -437,6 +469,30 @@ class DaoController(object):
         return status
 
 
+    def create_task_dao(self, async_=False):
+        """ Return a new database connection (class PgDao) with the same parameters and search path
+            of the current one, to be used by a background task. Return None if connection failed.
+            If @async_, connection is asynchronous and queries must be executed with method 'execute_async' """
+
+        if self.dao is None:
+            return None
+
+        dao = PgDao()
+        dao.set_conn_string(self.dao.conn_string)
+        dao.set_search_path = self.dao.set_search_path
+        dao.telemetry = self.query_telemetry
+        if not dao.init_db(async_):
+            self.last_error = dao.last_error
+            return None
+
+        if dao.set_search_path and async_:
+            dao.execute_async(dao.set_search_path)
+        elif dao.set_search_path:
+            dao.execute_sql(dao.set_search_path)
+
+        return dao
+
+
     def connect_to_database_service(self, service, sslmode=None):
         """ Connect to database trough selected service
         This service must exist in file pg_service.conf """
@@ -460,6 +516,7 @@ class DaoController(object):
 
         # Connect to Database
         self.dao = PgDao()
+        self.dao.telemetry = self.get_query_telemetry()
         self.dao.set_conn_string(conn_string)
         status = self.dao.init_db()
         if not status:
@@ -740,6 +797,177 @@ class DaoController(object):
         return value
 
 
+    def execute_prepared(self, name, sql, params=None, commit=True, log_sql=False, schema_name=None):
+        """ Execute @sql as a statement prepared once per connection with name @name (and schema),
+            binding list @params to its $1, $2... parameters. Return fetched rows """
+
+        if not self.manage_connection():
+            return None
+
+        if schema_name is None:
+            schema_name = self.schema_name or ''
+        statement_name = re.sub(r'\W', '_', f"gw_{schema_name}_{name}".replace('"', '')).lower()
+        if log_sql:
+            self.log_info(f"{statement_name}: {sql} {params}", stack_level_increase=1)
+
+        time_start = time.perf_counter()
+        rows = self.dao.execute_prepared(statement_name, sql, params, commit)
+        self.add_statement_stats(f"{name} (prepared)", time.perf_counter() - time_start)
+        self.last_error = self.dao.last_error
+        if self.last_error:
+            self.manage_exception_db(self.last_error, f"{sql} {params}")
+            return None
+
+        return rows
+
+
+    def get_query_telemetry(self):
+        """ Return ring buffer of last executed queries (class QueryTelemetry).
+            Return None if it is disabled with setting 'query_telemetry_size' """
+
+        if self.query_telemetry:
+            return self.query_telemetry
+
+        max_size = 1000
+        if self.settings is not None:
+            try:
+                max_size = int(self.settings.value('system_variables/query_telemetry_size', max_size))
+            except (TypeError, ValueError):
+                pass
+        if max_size <= 0:
+            return None
+
+        if self.logger:
+            log_folder = self.logger.log_folder
+        else:
+            log_folder = os.path.join(os.path.expanduser("~"), self.plugin_name, "log")
+        slow_query_path = os.path.join(log_folder, "slow_queries.log")
+        self.query_telemetry = QueryTelemetry(max_size, slow_query_path)
+        if self.query_telemetry.slow_query_ms is not None:
+            self.log_info(f"Queries slower than {self.query_telemetry.slow_query_ms} ms saved to: {slow_query_path}")
+
+        return self.query_telemetry
+
+
+    def add_statement_stats(self, name, elapsed):
+        """ Add execution time @elapsed (seconds) of statement @name to its timing statistics """
+
+        stats = self.statement_stats.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+        stats['calls'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+
+    def get_statement_stats(self):
+        """ Return list of (name, calls, total, average, max) of timed statements, slowest first """
+
+        stats = [(name, values['calls'], values['total'], values['total'] / values['calls'], values['max'])
+                 for name, values in self.statement_stats.items()]
+        return sorted(stats, key=lambda stat: stat[2], reverse=True)
+
+
+    def log_statement_stats(self):
+        """ Log timing statistics of statements executed since plugin was loaded """
+
+        for name, calls, total, average, maximum in self.get_statement_stats():
+            self.log_info(f"{name}: {calls} calls, total {total:.3f} s, average {average * 1000:.1f} ms,"
+                          f" max {maximum * 1000:.1f} ms")
+
+
+    def get_column_type(self, tablename, column_name):
+        """ Get data type of column @column_name of @tablename. It is only queried once per session """
+
+        key = (tablename, column_name)
+        if key not in self.column_types:
+            sql = ("SELECT format_type(atttypid, atttypmod) FROM pg_attribute"
+                   " WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped")
+            row = self.get_row(sql, log_info=False, params=[tablename, column_name])
+            if not row:
+                return None
+            self.column_types[key] = row[0]
+
+        return self.column_types[key]
+
+
+    def execute_bulk(self, sql, params, log_sql=False, commit=True):
+        """ Execute a single statement @sql binding @params, as the list of ids of a bulk mutation.
+            Return number of affected rows, or None if it failed """
+
+        if not self.manage_connection():
+            return None
+
+        sql = self.get_sql(sql, log_sql, params)
+        result = self.dao.execute_sql(sql, commit)
+        self.last_error = self.dao.last_error
+        if not result:
+            self.manage_exception_db(self.last_error, sql)
+            return None
+
+        return self.dao.get_rowcount()
+
+
+    def execute_values(self, sql, values, template=None, fetch=False, log_sql=False, commit=True):
+        """ Execute @sql inserting every tuple of list @values in its 'VALUES %s' placeholder,
+            with a single multi-row statement per page. If @fetch, return rows of its RETURNING clause.
+            Return None if it failed """
+
+        if not self.manage_connection():
+            return None
+
+        if log_sql:
+            self.log_info(f"{sql} ({len(values)} rows)", stack_level_increase=1)
+        result = self.dao.execute_values(sql, values, template, fetch, commit)
+        self.last_error = self.dao.last_error
+        if self.last_error:
+            self.manage_exception_db(self.last_error, sql)
+            return None
+
+        return result
+
+
+    def get_bulk_filter(self, tablename, column_id, expr_filter=None):
+        """ Get WHERE clause matching @column_id of @tablename against an array parameter named 'ids' """
+
+        column_type = self.get_column_type(tablename, column_id)
+        if column_type:
+            where = f" WHERE {column_id} = ANY(%(ids)s::{column_type}[])"
+        else:
+            where = f" WHERE {column_id}::text = ANY(%(ids)s::text[])"
+        if expr_filter:
+            where += f" AND ({expr_filter})"
+
+        return where
+
+
+    def delete_rows(self, tablename, column_id, ids, expr_filter=None, log_sql=False, commit=True):
+        """ Delete in a single statement rows of @tablename with @column_id in list @ids,
+            and optionally matching @expr_filter. Return number of deleted rows, or None if it failed """
+
+        ids = [str(id_) for id_ in ids if id_ is not None]
+        if not ids:
+            return 0
+
+        sql = f"DELETE FROM {tablename}" + self.get_bulk_filter(tablename, column_id, expr_filter)
+        return self.execute_bulk(sql, {'ids': ids}, log_sql, commit)
+
+
+    def update_rows(self, tablename, values, column_id, ids, expr_filter=None, log_sql=False, commit=True):
+        """ Update in a single statement columns of dictionary @values of rows of @tablename
+            with @column_id in list @ids. Return number of updated rows, or None if it failed """
+
+        ids = [str(id_) for id_ in ids if id_ is not None]
+        if not ids or not values:
+            return 0
+
+        params = {'ids': ids}
+        fields = []
+        for i, (column, value) in enumerate(values.items()):
+            params[f"value_{i}"] = value
+            fields.append(f"{column} = %(value_{i})s")
+        sql = f"UPDATE {tablename} SET {', '.join(fields)}" + self.get_bulk_filter(tablename, column_id, expr_filter)
+        return self.execute_bulk(sql, params, log_sql, commit)
+
+
     def execute_insert_or_update(self, tablename, unique_field, unique_value, fields, values, commit=True):
         """ Execute INSERT or UPDATE sentence. Used for PostgreSQL database versions <9.5 """
 
@@ -884,22 +1112,97 @@ class DaoController(object):
             sql += f"{parameters}"
         sql += f");"
 
-        row = self.get_row(sql, commit=commit, log_sql=log_sql)
+        # Hot functions called with a single dollar quoted body are executed as prepared statements
+        body = None
+        if self.use_prepared_statements and function_name in self.prepared_functions and parameters \
+                and parameters.startswith('$$') and parameters.endswith('$$') and parameters.count('$$') == 2:
+            body = parameters[2:-2]
+
+        if body is not None:
+            prepared_sql = f"SELECT {schema_name or self.schema_name}.{function_name}($1)"
+            rows = self.execute_prepared(function_name, prepared_sql, [body], commit=commit, log_sql=log_sql,
+                                         schema_name=schema_name)
+            row = rows[0] if rows else None
+        else:
+            time_start = time.perf_counter()
+            row = self.get_row(sql, commit=commit, log_sql=log_sql)
+            self.add_statement_stats(function_name, time.perf_counter() - time_start)
         if not row or not row[0]:
             self.log_warning(f"Function error: {function_name}")
             self.log_warning(sql)
             return None
 
+        return self.manage_json_result(row[0], sql, log_result, json_loads, is_notify)
+
+
+    def get_json_many(self, calls, schema_name=None, commit=True, log_sql=False,
+                      log_result=False, json_loads=False, is_notify=False):
+        """ Execute independent API functions in a single round trip
+        :param calls: List of (function_name, parameters) to execute
+        :return: List with the response of every function, in the same order (None if it failed)
+        """
+
+        if not calls:
+            return []
+
+        if not self.manage_connection():
+            return [None] * len(calls)
+
+        # Check if functions exist
+        results = [None] * len(calls)
+        columns = []
+        for index, (function_name, parameters) in enumerate(calls):
+            row = self.check_function(function_name, schema_name, commit)
+            if row in (None, ''):
+                self.show_warning("Function not found in database", parameter=function_name)
+                continue
+            prefix = f"{schema_name}." if schema_name else ""
+            columns.append((index, f"{prefix}{function_name}({parameters or ''})"))
+
+        if not columns:
+            return results
+
+        # Execute all functions as columns of a single select
+        sql = "SELECT " + ", ".join([f"{function} AS result_{index}" for index, function in columns]) + ";"
+        if log_sql:
+            self.log_info(sql, stack_level_increase=1)
+        time_start = time.perf_counter()
+        row = self.dao.get_row(sql, commit=commit)
+        self.add_statement_stats("get_json_many", time.perf_counter() - time_start)
+
+        # If any function failed, execute them again one by one to isolate its error
+        if self.dao.last_error:
+            self.dao.rollback()
+            for index, function in columns:
+                function_name, parameters = calls[index]
+                results[index] = self.get_json(function_name, parameters, schema_name, commit, log_sql,
+                                               log_result, json_loads, is_notify)
+            return results
+
+        for position, (index, function) in enumerate(columns):
+            if not row or not row[position]:
+                self.log_warning(f"Function error: {calls[index][0]}")
+                self.log_warning(f"SELECT {function};")
+                continue
+            results[index] = self.manage_json_result(row[position], f"SELECT {function};", log_result, json_loads,
+                                                     is_notify)
+
+        return results
+
+
+    def manage_json_result(self, result, sql, log_result=False, json_loads=False, is_notify=False):
+        """ Manage response @result of API function executed with @sql """
+
         # Get json result
         if json_loads:
             # If content of row[0] is not a to json, cast it
-            json_result = json.loads(row[0], object_pairs_hook=OrderedDict)
+            json_result = json.loads(result, object_pairs_hook=OrderedDict)
         else:
-            json_result = row[0]
+            json_result = result
 
         # Log result
         if log_result:
-            self.log_info(json_result, stack_level_increase=1)
+            self.log_info(json_result, stack_level_increase=2)
 
         # If failed, manage exception
         if 'status' in json_result and json_result['status'] == 'Failed':
@@ -1072,6 +1375,10 @@ class DaoController(object):
         # Get dbname, host, port, user and password
         uri = layer.dataProvider().dataSourceUri()
 
+        # Return a copy of the already parsed source of this data provider (callers may modify it)
+        if uri in self.layer_source_cache:
+            return dict(self.layer_source_cache[uri])
+
         try:
             # Split 'uri' with quoted substrings preservation
             splt = shlex.split(uri)
@@ -1080,6 +1387,7 @@ class DaoController(object):
             splt_dct['schema'], splt_dct['table'] = splt_dct['table'].split('.')
             for key in layer_source.keys():
                 layer_source[key] = splt_dct.get(key)
+            self.layer_source_cache[uri] = dict(layer_source)
         except Exception as e:
             msg = f"get_layer_source exception in layer '{layer.name()}': {str(e)}"
             self.log_warning(msg)
@@ -1268,6 +1576,158 @@ class DaoController(object):
             self.translate_form(dialog, locale_name)
 
 
+    def load_project_metadata(self, schemaname=None):
+        """ Get in two round trips a snapshot of project metadata used when a project is opened:
+            version row, SRID, roles, cat_feature, config flags and available tables.
+            Getters will use it until it is loaded again with this function """
+
+        self.project_metadata = None
+        if schemaname is None:
+            schemaname = self.schema_name
+        if schemaname is None:
+            return None
+
+        schemaname = schemaname.replace('"', '')
+        params = {'schema': schemaname}
+        self.tableview_config.pop(schemaname, None)
+
+        # Get metadata not depending on which tables exist in the schema
+        sql = ("SELECT current_user AS cur_user, current_setting('server_version_num') AS server_version,"
+               " EXISTS (SELECT 1 FROM pg_namespace WHERE nspname = %(schema)s) AS schema_exists,"
+               " (SELECT json_object_agg(c.relname, c.relkind) FROM pg_class c"
+               "  JOIN pg_namespace n ON n.oid = c.relnamespace"
+               "  WHERE n.nspname = %(schema)s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')) AS relations,"
+               " (SELECT json_agg(rolname) FROM pg_roles"
+               "  WHERE pg_has_role(current_user, oid, 'member')) AS roles,"
+               " (SELECT srid FROM geometry_columns WHERE f_table_schema = %(schema)s"
+               "  AND f_table_name = 'v_edit_node' AND f_geometry_column = 'the_geom' LIMIT 1) AS srid")
+        row = self.get_row(sql, params=params)
+        if not row:
+            return None
+
+        relations = row['relations'] or {}
+        tables = [name for name, kind in relations.items() if kind in ('r', 'p')]
+        metadata = {'schema': schemaname, 'cur_user': row['cur_user'], 'schema_exists': row['schema_exists'],
+                    'relations': relations, 'tables': tables, 'roles': row['roles'] or [], 'srid': row['srid'],
+                    'version_first': None, 'version_last': None, 'version_table': None,
+                    'cat_feature': None, 'config': {}}
+        self.current_user = row['cur_user']
+        self.postgresql_version = row['server_version']
+
+        # Get metadata from tables of the schema, only using those that exist
+        fields = []
+        for version_table in ('sys_version', 'version'):
+            if version_table in tables:
+                metadata['version_table'] = version_table
+                fields.append(f"(SELECT row_to_json(t) FROM (SELECT * FROM {schemaname}.{version_table}"
+                              f" ORDER BY id ASC LIMIT 1) t) AS version_first")
+                fields.append(f"(SELECT row_to_json(t) FROM (SELECT * FROM {schemaname}.{version_table}"
+                              f" ORDER BY id DESC LIMIT 1) t) AS version_last")
+                break
+        if 'cat_feature' in tables:
+            fields.append(f"(SELECT json_agg(row_to_json(t)) FROM (SELECT * FROM {schemaname}.cat_feature"
+                          f" ORDER BY id) t) AS cat_feature")
+        if 'config_param_user' in tables:
+            parameters = ", ".join([f"'{parameter}'" for parameter in self.project_metadata_config])
+            fields.append(f"(SELECT json_object_agg(parameter, value) FROM {schemaname}.config_param_user"
+                          f" WHERE cur_user = current_user AND parameter IN ({parameters})) AS config")
+        for form_table in ('config_form_fields', 'config_api_form_fields'):
+            if form_table in tables:
+                fields.append(f"(SELECT md5(string_agg(t::text, '' ORDER BY t::text))"
+                              f" FROM {schemaname}.{form_table} t) AS form_stamp")
+                break
+        if fields:
+            sql = "SELECT " + ", ".join(fields)
+            row = self.get_row(sql)
+            if row:
+                for key in row.keys():
+                    metadata[key] = row[key]
+                if metadata['config'] is None:
+                    metadata['config'] = {}
+
+        self.project_metadata = metadata
+        self.set_form_cache_stamp(metadata)
+        return metadata
+
+
+    def set_form_cache_stamp(self, metadata):
+        """ Set version stamp of persistent cache of form definitions from project @metadata:
+            Giswater version of the schema and checksum of its form fields configuration """
+
+        form_stamp = metadata.get('form_stamp')
+        if not form_stamp:
+            if self.form_cache:
+                self.form_cache.set_stamp(None)
+            return
+
+        version = ''
+        if metadata['version_last']:
+            version = metadata['version_last'].get('giswater', '')
+        self.get_form_cache().set_stamp(f"{version}_{form_stamp}")
+
+
+    def get_form_cache(self):
+        """ Get persistent cache of form definitions of current database and user, opening it the first time """
+
+        db_path = self.get_form_cache_path()
+        if self.form_cache is not None and self.form_cache.db_path != db_path:
+            self.form_cache.close()
+            self.form_cache = None
+
+        if self.form_cache is None:
+            self.form_cache = FormCache(db_path)
+            if not self.form_cache.open():
+                self.log_warning(f"Error opening form cache: {self.form_cache.last_error}")
+
+        return self.form_cache
+
+
+    def get_form_cache_path(self):
+        """ Return path of cache file of form definitions. Every database (host, port and name) and user
+            has its own file, as definitions returned by the server depend on them (roles) """
+
+        params = {}
+        try:
+            params = self.dao.conn.get_dsn_parameters()
+        except AttributeError:
+            pass
+
+        user = self.current_user or params.get('user', '')
+        identity = f"{params.get('host', '')}|{params.get('port', '')}|{params.get('dbname', '')}|{user}"
+        file_name = f"form_cache_{hashlib.md5(identity.encode('utf-8')).hexdigest()}.sqlite"
+        main_folder = os.path.join(os.path.expanduser("~"), self.plugin_name)
+
+        return main_folder + os.sep + "cache" + os.sep + file_name
+
+
+    def get_project_metadata(self, schemaname=None):
+        """ Return project metadata snapshot if it has been loaded for @schemaname """
+
+        if not self.project_metadata:
+            return None
+
+        if schemaname is None:
+            schemaname = self.schema_name
+        if schemaname is None or schemaname.replace('"', '') != self.project_metadata['schema']:
+            return None
+
+        return self.project_metadata
+
+
+    def get_project_metadata_version(self, field, schemaname=None):
+        """ Return @field of last row of table 'version' from project metadata snapshot
+            Returns tuple (found, value), being found False if snapshot is not available """
+
+        metadata = self.get_project_metadata(schemaname)
+        if not metadata:
+            return False, None
+
+        if metadata['version_last'] is None:
+            return True, None
+
+        return True, metadata['version_last'].get(field)
+
+
     def get_project_type(self, schemaname=None):
         """ Get project type from table 'version' """
 
@@ -1276,6 +1736,19 @@ class DaoController(object):
         if schemaname is None:
             schemaname = self.schema_name
 
+        # Get it from project metadata snapshot, if available
+        metadata = self.get_project_metadata(schemaname)
+        if metadata:
+            if metadata['version_table'] == 'sys_version' and metadata['version_first']:
+                project_type = metadata['version_first']['project_type']
+            elif metadata['version_table'] == 'version' and metadata['version_first']:
+                project_type = metadata['version_first']['wsoftware']
+            elif metadata['version_table'] is None and 'version_tm' in metadata['tables']:
+                project_type = "tm"
+            if project_type and project_type != "tm":
+                project_type = project_type.lower()
+            return project_type
+
         # start process
         tablename = "sys_version"
         exists = self.check_table(tablename, schemaname)
@@ -1307,6 +1780,11 @@ class DaoController(object):
         if schemaname is None:
             schemaname = self.schema_name
 
+        # Get it from project metadata snapshot, if available
+        found, project_version = self.get_project_metadata_version('giswater', schemaname)
+        if found:
+            return project_version
+
         project_version = None
         tablename = "sys_version"
         exists = self.check_table(tablename, schemaname)
@@ -1333,6 +1811,11 @@ class DaoController(object):
         if schemaname is None:
             schemaname = self.schema_name
 
+        # Get it from project metadata snapshot, if available
+        found, project_language = self.get_project_metadata_version('language', schemaname)
+        if found:
+            return project_language
+
         project_language = None
         tablename = "sys_version"
         exists = self.check_table(tablename, schemaname)
@@ -1359,6 +1842,11 @@ class DaoController(object):
         if schemaname is None:
             schemaname = self.schema_name
 
+        # Get it from project metadata snapshot, if available
+        found, project_epsg = self.get_project_metadata_version('epsg', schemaname)
+        if found:
+            return project_epsg
+
         project_epsg = None
         tablename = "sys_version"
         exists = self.check_table(tablename, schemaname)
@@ -1412,6 +1900,10 @@ class DaoController(object):
             schemaname = self.schema_name
 
         schemaname = schemaname.replace('"', '')
+        metadata = self.get_project_metadata(schemaname)
+        if metadata:
+            return (schemaname, ) if metadata['schema_exists'] else None
+
         sql = "SELECT nspname FROM pg_namespace WHERE nspname = %s"
         params = [schemaname]
         row = self.get_row(sql, params=params)
@@ -1425,11 +1917,16 @@ class DaoController(object):
             schema_name = self.schema_name
 
         schema_name = schema_name.replace('"', '')
+        if (schema_name, function_name) in self.functions_found:
+            return (function_name, )
+
         sql = ("SELECT routine_name FROM information_schema.routines "
                "WHERE lower(routine_schema) = %s "
                "AND lower(routine_name) = %s ")
         params = [schema_name, function_name]
         row = self.get_row(sql, params=params, commit=commit)
+        if row:
+            self.functions_found.add((schema_name, function_name))
         return row
 
 
@@ -1445,6 +1942,10 @@ class DaoController(object):
                     return None
 
         schemaname = schemaname.replace('"', '')
+        metadata = self.get_project_metadata(schemaname)
+        if metadata:
+            return (schemaname, tablename) if tablename in metadata['tables'] else None
+
         sql = "SELECT * FROM pg_tables WHERE schemaname = %s AND tablename = %s "
         params = [schemaname, tablename]
         row = self.get_row(sql, log_info=False, params=params)
@@ -1517,6 +2018,10 @@ class DaoController(object):
         if username is None:
             username = self.user
 
+        # Get it from project metadata snapshot, if available
+        if self.project_metadata and username == self.project_metadata['cur_user']:
+            return role_name in self.project_metadata['roles']
+
         if not self.check_role(username):
             return False
 
@@ -1550,9 +2055,13 @@ class DaoController(object):
         if self.user in super_users:
             roles = "('role_admin', 'role_basic', 'role_edit', 'role_epa', 'role_master', 'role_om')"
         else:
-            sql = ("SELECT rolname FROM pg_roles "
-                   " WHERE pg_has_role(current_user, oid, 'member')")
-            rows = self.get_rows(sql)
+            # Get it from project metadata snapshot, if available
+            if self.project_metadata and self.project_metadata['roles']:
+                rows = [[rolname] for rolname in self.project_metadata['roles']]
+            else:
+                sql = ("SELECT rolname FROM pg_roles "
+                       " WHERE pg_has_role(current_user, oid, 'member')")
+                rows = self.get_rows(sql)
             if not rows:
                 return None
 
@@ -1629,6 +2138,10 @@ class DaoController(object):
             schemaname = self.schema_name
 
         schemaname = schemaname.replace('"', '')
+        metadata = self.get_project_metadata(schemaname)
+        if metadata and tablename == 'v_edit_node' and metadata['srid']:
+            return metadata['srid']
+
         srid = None
         sql = "SELECT Find_SRID(%s, %s, 'the_geom');"
         params = [schemaname, tablename]
@@ -1675,6 +2188,28 @@ class DaoController(object):
         return layers
 
 
+    def get_tableview_config(self, table_name, project_type=None):
+        """ Get list of columns configured for table view of @table_name, ordered by 'columnindex'.
+            Table 'config_form_tableview' is read only once per schema and kept in memory """
+
+        schema_name = self.schema_name.replace('"', '') if self.schema_name else None
+        if schema_name not in self.tableview_config:
+            sql = "SELECT * FROM config_form_tableview ORDER BY tablename, columnindex"
+            rows = self.get_rows(sql, log_info=False)
+            if not rows:
+                return []
+            config = {}
+            for row in rows:
+                config.setdefault(row['tablename'], []).append(dict(row))
+            self.tableview_config[schema_name] = config
+
+        rows = self.tableview_config[schema_name].get(table_name, [])
+        if project_type is not None:
+            rows = [row for row in rows if row.get('project_type') == project_type]
+
+        return rows
+
+
     def set_search_path(self, schema_name):
         """ Set parameter search_path for current QGIS project """
 
@@ -1748,11 +2283,28 @@ class DaoController(object):
 
     def get_config(self, parameter='', columns='value', table='config_param_user', sql_added=None, log_info=True):
 
+        # Get it from project metadata snapshot, if available
+        if self.project_metadata and parameter in self.project_metadata_config and columns == 'value' \
+                and table == 'config_param_user' and sql_added is None:
+            value = self.project_metadata['config'].get(parameter)
+            return (value, ) if value is not None else None
+
         sql = f"SELECT {columns} FROM {table} WHERE parameter = '{parameter}' "
         if sql_added:
             sql += sql_added
         if table == 'config_param_user':
             sql += " AND cur_user = current_user"
+
+        # Single value lookups are executed as prepared statements
+        if self.use_prepared_statements and columns == 'value' and sql_added is None \
+                and table in ('config_param_user', 'config_param_system'):
+            prepared_sql = sql.replace(f"'{parameter}'", "$1", 1)
+            rows = self.execute_prepared(f"get_config_{table}", prepared_sql, [parameter])
+            row = rows[0] if rows else None
+            if not row and self.last_error is None and log_info:
+                self.log_info("Any record found", parameter=sql, stack_level_increase=1)
+            return row
+
         sql += ";"
         row = self.get_row(sql, log_info=log_info)
         return row
@@ -0,0 +1,161 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+
+
+class FormCache(object):
+    """ Persistent cache of form definitions returned by function 'gw_fct_getinfofromid'.
+        Definitions are stored per schema, table name and form type ('info' for feature info forms,
+        'layer' for layer configuration), and are only valid for the version stamp of the server
+        configuration they were retrieved with. Every database and user uses its own file @db_path.
+        Combo domains are never cached, as they come from catalogs not covered by the version stamp """
+
+    # Keys of every field that depend on the feature or on catalog contents, not on the form definition
+    value_keys = ('value', 'selectedId', 'comboIds', 'comboNames')
+
+    def __init__(self, db_path):
+
+        self.db_path = db_path
+        self.conn = None
+        self.last_error = None
+        self.stamp = None
+        self.definitions = {}
+
+
+    def open(self):
+        """ Open (and create if not exists) cache database file """
+
+        try:
+            folder = os.path.dirname(self.db_path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS form_definition ("
+                              " schema_name TEXT NOT NULL, table_name TEXT NOT NULL, form_type TEXT NOT NULL,"
+                              " stamp TEXT NOT NULL, definition TEXT NOT NULL,"
+                              " PRIMARY KEY (schema_name, table_name, form_type))")
+            self.conn.commit()
+            status = True
+        except Exception as e:
+            self.last_error = e
+            self.conn = None
+            status = False
+
+        return status
+
+
+    def close(self):
+        """ Close cache database file """
+
+        if self.conn:
+            self.conn.close()
+        self.conn = None
+
+
+    def set_stamp(self, stamp):
+        """ Set version stamp of server configuration. Definitions with a different one are not used """
+
+        if stamp != self.stamp:
+            self.definitions = {}
+        self.stamp = stamp
+
+
+    def get(self, schema_name, table_name, form_type='info'):
+        """ Return cached list of fields of @table_name, or None if not found or outdated """
+
+        if not self.stamp:
+            return None
+
+        key = (schema_name, table_name, form_type)
+        if key in self.definitions:
+            return self.definitions[key]
+
+        if not self.conn:
+            return None
+
+        try:
+            sql = ("SELECT definition FROM form_definition "
+                   "WHERE schema_name = ? AND table_name = ? AND form_type = ? AND stamp = ?")
+            row = self.conn.execute(sql, (schema_name, table_name, form_type, self.stamp)).fetchone()
+        except Exception as e:
+            self.last_error = e
+            return None
+
+        if not row:
+            return None
+
+        definition = json.loads(row[0])
+        self.definitions[key] = definition
+        return definition
+
+
+    def put(self, schema_name, table_name, fields, form_type='info'):
+        """ Save definition of @fields of @table_name, removing their feature values and combo domains """
+
+        if not self.stamp or not fields:
+            return
+
+        definition = []
+        for field in fields:
+            field = {key: value for key, value in field.items() if key not in self.value_keys}
+            definition.append(field)
+        self.definitions[(schema_name, table_name, form_type)] = definition
+
+        if not self.conn:
+            return
+
+        try:
+            sql = ("INSERT OR REPLACE INTO form_definition (schema_name, table_name, form_type, stamp, definition) "
+                   "VALUES (?, ?, ?, ?, ?)")
+            self.conn.execute(sql, (schema_name, table_name, form_type, self.stamp, json.dumps(definition)))
+            self.conn.commit()
+        except Exception as e:
+            self.last_error = e
+
+
+    def invalidate(self, schema_name, table_name=None):
+        """ Remove cached definitions of @table_name, or all definitions of @schema_name """
+
+        self.definitions = {key: value for key, value in self.definitions.items()
+                            if key[0] != schema_name or (table_name and key[1] != table_name)}
+
+        if not self.conn:
+            return
+
+        try:
+            if table_name:
+                sql = "DELETE FROM form_definition WHERE schema_name = ? AND table_name = ?"
+                self.conn.execute(sql, (schema_name, table_name))
+            else:
+                sql = "DELETE FROM form_definition WHERE schema_name = ?"
+                self.conn.execute(sql, (schema_name, ))
+            self.conn.commit()
+        except Exception as e:
+            self.last_error = e
+
+
+    def merge(self, schema_name, table_name, fields, form_type='info'):
+        """ Complete @fields returned with only feature values and combo domains
+            with the cached definition of @table_name """
+
+        definition = self.get(schema_name, table_name, form_type)
+        if not definition:
+            return fields
+
+        values = {field['columnname']: field for field in fields if 'columnname' in field}
+        merged = []
+        for field in definition:
+            field = dict(field)
+            if field.get('columnname') in values:
+                field.update(values[field['columnname']])
+            merged.append(field)
+
+        return merged
+
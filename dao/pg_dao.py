@@ -5,7 +5,12 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
+import json
+import select
+import time
+
 import psycopg2
+import psycopg2.errorcodes
 import psycopg2.extras
 
 
@@ -16,14 +21,28 @@ class PgDao(object):
         self.last_error = None
         self.set_search_path = None
         self.conn = None
+        # Names of statements prepared in current connection
+        self.prepared_statements = set()
+        # Query telemetry (class QueryTelemetry). Queries are not recorded if not set
+        self.telemetry = None
+        self.time_start = None
+        self.time_executed = None
+        self.json_bytes = 0
 
 
-    def init_db(self):
-        """ Initializes database connection """
+    def init_db(self, async_=False):
+        """ Initializes database connection. If @async_, queries are executed with method 'execute_async' """
 
         try:
-            self.conn = psycopg2.connect(self.conn_string)
+            self.prepared_statements = set()
+            if async_:
+                self.conn = psycopg2.connect(self.conn_string, async_=True)
+                self.wait_async()
+            else:
+                self.conn = psycopg2.connect(self.conn_string)
             self.cursor = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            psycopg2.extras.register_default_json(self.conn, loads=self.json_loads)
+            psycopg2.extras.register_default_jsonb(self.conn, loads=self.json_loads)
             status = True
         except psycopg2.DatabaseError as e:
             self.last_error = e
@@ -69,11 +88,42 @@ class PgDao(object):
         return status
 
 
-    def cursor_execute(self, sql):
+    def cursor_execute(self, sql, params=None):
         """ Check if cursor is closed before execution """
 
         if self.check_cursor():
-            self.cursor.execute(sql)
+            self.json_bytes = 0
+            self.time_start = time.perf_counter()
+            self.cursor.execute(sql, params)
+            self.time_executed = time.perf_counter()
+
+
+    def json_loads(self, value):
+        """ Decode json and jsonb values returned by server, counting their size for query telemetry """
+
+        self.json_bytes += len(value)
+        return json.loads(value)
+
+
+    def add_telemetry(self, sql, rows=None):
+        """ Record last executed query @sql and its fetched @rows in query telemetry """
+
+        if self.telemetry is None or self.time_start is None:
+            return
+
+        try:
+            time_end = time.perf_counter()
+            size = self.json_bytes
+            for row in rows or ():
+                for value in row:
+                    if isinstance(value, (str, bytes)):
+                        size += len(value)
+            self.telemetry.record(sql, time_end - self.time_start, self.time_executed - self.time_start,
+                                  self.cursor.rowcount, size)
+        except Exception:
+            pass
+        finally:
+            self.time_start = None
 
 
     def get_poll(self):
@@ -144,6 +194,7 @@ class PgDao(object):
         try:
             self.cursor_execute(sql)
             rows = self.cursor.fetchall()
+            self.add_telemetry(sql, rows)
             if commit:
                 self.commit()
         except Exception as e:
@@ -162,6 +213,7 @@ class PgDao(object):
         try:
             self.cursor_execute(sql)
             row = self.cursor.fetchone()
+            self.add_telemetry(sql, [row] if row else None)
             if commit:
                 self.commit()
         except Exception as e:
@@ -205,6 +257,7 @@ class PgDao(object):
         status = True
         try:
             self.cursor_execute(sql)
+            self.add_telemetry(sql)
             if commit:
                 self.commit()
         except Exception as e:
@@ -224,6 +277,7 @@ class PgDao(object):
         try:
             self.cursor_execute(sql)
             value = self.cursor.fetchone()
+            self.add_telemetry(sql, [value] if value else None)
             if commit:
                 self.commit()
         except Exception as e:
@@ -233,6 +287,150 @@ class PgDao(object):
             return value
 
 
+    def execute_values(self, sql, values, template=None, fetch=False, commit=True, page_size=1000):
+        """ Execute @sql with a single 'VALUES %s' placeholder, expanded with every tuple of list @values.
+            If @fetch, return rows returned by the query (RETURNING clause) """
+
+        self.last_error = None
+        rows = None
+        try:
+            self.json_bytes = 0
+            self.time_start = time.perf_counter()
+            if self.check_cursor():
+                rows = psycopg2.extras.execute_values(self.cursor, sql, values, template, page_size, fetch)
+            self.time_executed = time.perf_counter()
+            self.add_telemetry(sql, rows)
+            if commit:
+                self.commit()
+            if not fetch:
+                rows = True
+        except Exception as e:
+            self.last_error = e
+            self.rollback()
+        finally:
+            return rows
+
+
+    def prepare(self, name, sql, commit=False):
+        """ Prepare statement @sql with name @name, only once per connection.
+            Parameters of @sql are referenced as $1, $2...
+            PREPARE lasts for the whole session, so it is never committed (it would commit pending work
+            of the caller). If it fails, transaction is only rolled back if @commit """
+
+        if name in self.prepared_statements:
+            return True
+
+        self.last_error = None
+        status = True
+        try:
+            self.cursor_execute(f"PREPARE {name} AS {sql}")
+            self.prepared_statements.add(name)
+        except Exception as e:
+            self.last_error = e
+            status = False
+            if commit:
+                self.rollback()
+        finally:
+            return status
+
+
+    def execute_prepared(self, name, sql, params=None, commit=True):
+        """ Execute statement @sql prepared as @name binding list @params.
+            As get_row and get_rows, transaction is only committed or rolled back if @commit.
+            Otherwise statement is executed inside a savepoint, so that it can be prepared again
+            in the same transaction if connection has been reset since it was prepared.
+            Return fetched rows, or None if statement returns no rows or failed """
+
+        execute = f"EXECUTE {name}"
+        if params:
+            execute += f" ({', '.join(['%s'] * len(params))})"
+
+        rows = None
+        for retry in (False, True):
+            if not self.prepare(name, sql, commit):
+                return None
+
+            self.last_error = None
+            try:
+                if not commit:
+                    self.cursor_execute("SAVEPOINT gw_execute_prepared")
+                self.cursor_execute(execute, params)
+                if self.cursor.description:
+                    rows = self.cursor.fetchall()
+                # Record the statement itself, before the savepoint is released
+                self.add_telemetry(sql, rows)
+                if not commit:
+                    self.cursor_execute("RELEASE SAVEPOINT gw_execute_prepared")
+                if commit:
+                    self.commit()
+                break
+            except Exception as e:
+                self.last_error = e
+                invalid_name = getattr(e, 'pgcode', None) == psycopg2.errorcodes.INVALID_SQL_STATEMENT_NAME
+                if commit:
+                    self.rollback()
+                elif invalid_name and not retry:
+                    # Only undo the failed statement, keeping pending work of the caller
+                    try:
+                        self.cursor_execute("ROLLBACK TO SAVEPOINT gw_execute_prepared")
+                    except Exception:
+                        break
+                # Connection has been reset since statement was prepared: prepare it again
+                if retry or not invalid_name:
+                    break
+                self.prepared_statements.discard(name)
+
+        return rows
+
+
+    def execute_async(self, sql, notice_callback=None, is_canceled=None):
+        """ Execute @sql in an asynchronous connection. Every message raised by the server while the query
+            is running (RAISE NOTICE or NOTIFY) is sent to @notice_callback as soon as it is received.
+            Query is canceled when @is_canceled() returns True. Return fetched rows """
+
+        self.last_error = None
+        rows = None
+        try:
+            self.json_bytes = 0
+            self.time_start = time.perf_counter()
+            self.cursor.execute(sql)
+            self.wait_async(notice_callback, is_canceled)
+            self.time_executed = time.perf_counter()
+            if self.cursor.description:
+                rows = self.cursor.fetchall()
+            self.add_telemetry(sql, rows)
+        except Exception as e:
+            self.last_error = e
+        finally:
+            return rows
+
+
+    def wait_async(self, notice_callback=None, is_canceled=None, poll_interval=0.2):
+        """ Wait until current operation of the asynchronous connection has finished """
+
+        canceled = False
+        while True:
+            state = self.conn.poll()
+
+            # Manage messages received until now
+            if notice_callback:
+                while self.conn.notices:
+                    notice_callback(self.conn.notices.pop(0).strip())
+                while self.conn.notifies:
+                    notice_callback(self.conn.notifies.pop(0).payload)
+
+            if state == psycopg2.extensions.POLL_OK:
+                break
+            elif state == psycopg2.extensions.POLL_READ:
+                select.select([self.conn.fileno()], [], [], poll_interval)
+            elif state == psycopg2.extensions.POLL_WRITE:
+                select.select([], [self.conn.fileno()], [], poll_interval)
+
+            if is_canceled and not canceled and is_canceled():
+                self.conn.cancel()
+                canceled = True
+
+
     def get_rowcount(self):
         """ Returns number of rows of current query """
         self.check_cursor()
@@ -251,13 +449,20 @@ class PgDao(object):
         self.conn.rollback()
 
 
-    def copy_expert(self, sql, csv_file):
-        """ Dumps contents of the query to selected CSV file """
+    def copy_expert(self, sql, csv_file, size=65536):
+        """ Dumps contents of the query to selected CSV file, in blocks of @size bytes """
 
+        self.last_error = None
         try:
-            self.cursor.copy_expert(sql, csv_file)
+            if self.check_cursor():
+                self.time_start = time.perf_counter()
+                self.time_executed = self.time_start
+                self.cursor.copy_expert(sql, csv_file, size)
+                self.add_telemetry(sql)
             return None
         except Exception as e:
+            self.last_error = e
+            self.rollback()
             return e
 
 
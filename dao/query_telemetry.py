@@ -0,0 +1,129 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+
+
+class QueryTelemetry(object):
+    """ Ring buffer with the last @max_size queries executed by PgDao: wall time, execution time,
+        rows, bytes returned, caller and 'gw_fct_*' function called.
+        If environment variable 'GW_SLOW_QUERY_MS' is set, queries slower than its value (milliseconds)
+        are also appended to file @slow_query_path """
+
+    fields = ('tstamp', 'function', 'caller', 'wall_ms', 'execute_ms', 'rows', 'bytes', 'sql')
+
+    # Maximum length of SQL saved of every query
+    sql_length = 1000
+
+    # Folder of module 'dao'. Callers are searched outside this folder
+    dao_folder = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, max_size=1000, slow_query_path=None):
+
+        self.records = deque(maxlen=max_size)
+        self.slow_query_path = slow_query_path
+        self.slow_query_ms = None
+        value = os.environ.get('GW_SLOW_QUERY_MS')
+        if value:
+            try:
+                self.slow_query_ms = float(value)
+            except ValueError:
+                pass
+        self.function_pattern = re.compile(r'gw_fct_\w+', re.IGNORECASE)
+
+
+    def record(self, sql, wall_time, execute_time, rows, size):
+        """ Add query @sql that took @wall_time seconds (@execute_time until server returned its result),
+            affecting or returning @rows rows of @size bytes """
+
+        sql = str(sql)
+        match = self.function_pattern.search(sql, 0, 300)
+        record = {'tstamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'function': match.group(0).lower() if match else None,
+                  'caller': self.get_caller(),
+                  'wall_ms': round(wall_time * 1000, 2),
+                  'execute_ms': round(execute_time * 1000, 2),
+                  'rows': rows,
+                  'bytes': size,
+                  'sql': sql[:self.sql_length]}
+        self.records.append(record)
+
+        if self.slow_query_ms is not None and record['wall_ms'] >= self.slow_query_ms:
+            self.dump_slow_query(record, sql)
+
+
+    def get_caller(self):
+        """ Return 'file:line (function)' of the first frame of the call stack outside module 'dao' """
+
+        frame = sys._getframe(2)
+        while frame and os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == self.dao_folder:
+            frame = frame.f_back
+        if not frame:
+            return None
+
+        return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} ({frame.f_code.co_name})"
+
+
+    def dump_slow_query(self, record, sql):
+        """ Append @record with its complete @sql to slow queries file """
+
+        if not self.slow_query_path:
+            return
+
+        try:
+            with open(self.slow_query_path, 'a', encoding='utf-8') as slow_file:
+                slow_file.write(json.dumps(dict(record, sql=sql), default=str) + '\n')
+        except Exception:
+            self.slow_query_path = None
+
+
+    def clear(self):
+        """ Remove all recorded queries """
+
+        self.records.clear()
+
+
+    def get_records(self):
+        """ Return list of recorded queries, oldest first """
+
+        return list(self.records)
+
+
+    def get_summary(self):
+        """ Return list of (function or caller, calls, total wall ms, max wall ms, rows, bytes), slowest first """
+
+        summary = {}
+        for record in self.records:
+            key = record['function'] or record['caller']
+            values = summary.setdefault(key, [key, 0, 0.0, 0.0, 0, 0])
+            values[1] += 1
+            values[2] += record['wall_ms']
+            values[3] = max(values[3], record['wall_ms'])
+            values[4] += max(record['rows'] or 0, 0)
+            values[5] += record['bytes'] or 0
+
+        return sorted([tuple(values) for values in summary.values()], key=lambda values: values[2], reverse=True)
+
+
+    def export(self, path):
+        """ Export recorded queries to file @path, as JSON if its extension is '.json', otherwise as CSV """
+
+        if os.path.splitext(path)[1].lower() == '.json':
+            with open(path, 'w', encoding='utf-8') as json_file:
+                json.dump(self.get_records(), json_file, indent=2, default=str)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=self.fields, delimiter=';')
+                writer.writeheader()
+                writer.writerows(self.get_records())
+
@@ -40,6 +40,9 @@ class GenericDescriptor(object):
 class Table(object):
     """Base class representing a table. Assume it have to be used as a pure virtual."""
 
+    # field names of every subclass, computed only once
+    __field_names = {}
+
     def __init__(self, controller, tableName, pk):
         self.__controller = controller
         self.__table_name = tableName
@@ -59,9 +62,12 @@ class Table(object):
         """Return the list of field names composing the table.
         Names are that exposed in the class not derived from the db table."""
 
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if "__" not in x]
+        fields = Table.__field_names.get(self.__class__)
+        if fields is None:
+            fields = list(vars(self.__class__).keys())
+            # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
+            fields = [x for x in fields if "__" not in x]
+            Table.__field_names[self.__class__] = fields
         return fields
 
 
@@ -73,16 +79,12 @@ class Table(object):
             self.controller().show_info(message, parameter=self.pk)
             return False
 
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if "__" not in x]
-
-        sql = "SELECT {0} FROM {1} WHERE {2} = '{3}'".format(
+        fields = self.field_names()
+        sql = "SELECT {0} FROM {1} WHERE {2} = %s".format(
             ", ".join(fields),
             self.table_name(),
-            self.pk(),
-            getattr(self, self.pk()))
-        row = self.controller().get_row(sql, commit=commit)
+            self.pk())
+        row = self.controller().get_row(sql, commit=commit, params=[getattr(self, self.pk())])
         if not row:
             return False
 
@@ -97,9 +99,7 @@ class Table(object):
         """Save current event state in the DB as new record.
         Eventually add the record if it is not available"""
 
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if (("__" not in x) and (x != self.pk()))]
+        fields = [x for x in self.field_names() if x != self.pk()]
         values = [getattr(self, field) for field in fields]
 
         # Set '' for void values
@@ -125,6 +125,93 @@ class Table(object):
         return True
 
 
+    def fetch_many(self, pks, commit=True):
+        """Retrieve records with primary keys in list @pks with a single query.
+        Return list of new instances of this class."""
+
+        if not pks:
+            return []
+
+        fields = self.field_names()
+        sql = "SELECT {0} FROM {1} WHERE {2} = ANY(%s)".format(
+            ", ".join(fields),
+            self.table_name(),
+            self.pk())
+        rows = self.controller().get_rows(sql, log_info=False, commit=commit, params=[list(pks)])
+        if not rows:
+            return []
+
+        records = []
+        for row in rows:
+            record = self.__class__(self.controller())
+            for field, value in zip(fields, row):
+                setattr(record, field, value)
+            records.append(record)
+
+        return records
+
+
+    def upsert_many(self, records, commit=True):
+        """Save all @records (instances of this class) with multi-row statements:
+        records without pk value are inserted and get the pk generated by the DB,
+        the others are inserted or updated if their pk already exists."""
+
+        if not records:
+            return True
+
+        pk = self.pk()
+        fields = [x for x in self.field_names() if x != pk]
+        new_records = []
+        old_records = []
+        for record in records:
+            current_pk = getattr(record, pk)
+            if current_pk in (None, '') or (isinstance(current_pk, int) and current_pk < 0):
+                new_records.append(record)
+            else:
+                old_records.append(record)
+
+        # 'ON CONFLICT' is only available from PostgreSQL 9.5
+        controller = self.controller()
+        if old_records:
+            if not controller.postgresql_version:
+                controller.get_postgresql_version()
+            if int(controller.postgresql_version) < 90500:
+                for record in old_records:
+                    record.upsert(commit=False)
+                old_records = []
+
+        if old_records:
+            values = [tuple([getattr(record, pk)] + [self.get_db_value(record, field) for field in fields])
+                      for record in old_records]
+            sql = "INSERT INTO {0} ({1}, {2}) VALUES %s ON CONFLICT ({1}) DO UPDATE SET {3}".format(
+                self.table_name(), pk, ", ".join(fields),
+                ", ".join(["{0} = EXCLUDED.{0}".format(field) for field in fields]))
+            if controller.execute_values(sql, values, commit=False) is None:
+                return False
+
+        if new_records:
+            values = [{field: self.get_db_value(record, field) for field in fields} for record in new_records]
+            pks = self.insert_many(values, commit=False)
+            if pks is None:
+                return False
+            for record, value in zip(new_records, pks):
+                setattr(record, pk, value)
+
+        if commit:
+            controller.dao.commit()
+
+        return True
+
+
+    def get_db_value(self, record, field):
+        """Get value of @field of @record to be saved. Void values are saved as NULL."""
+
+        value = getattr(record, field)
+        if value in ('', 'null', 'NULL'):
+            value = None
+        return value
+
+
     def nextval(self, commit=True):
         """Get the next id for the __pk. that will be used for the next insert.
         BEWARE that this call increment the sequence at each call."""
@@ -167,6 +254,77 @@ class Table(object):
             return row[0]
 
 
+    def get_sequence(self, commit=True):
+        """Get the name of the sequence owned by the pk: '' if there isn't any, None on error."""
+
+        sql = "SELECT pg_get_serial_sequence('{}', '{}')".format(
+            self.table_name(), self.pk())
+        row = self.controller().get_row(sql, commit=commit)
+        if not row:
+            return None
+        return row[0] or ''
+
+
+    def sync_sequence(self, sequence, commit=True):
+        """Set @sequence of the pk to its max value, if it is behind it
+        (records previously inserted with max_pk() + 1 don't increment it)."""
+
+        # compare with the state read from the sequence relation, as nextval would consume a value
+        # on every call (and pg_sequences is not available before PostgreSQL 10)
+        sql = ("SELECT setval('{2}', max_pk) "
+               "FROM (SELECT MAX({1}) AS max_pk FROM {0}) AS pk, {3} AS seq "
+               "WHERE max_pk >= seq.last_value + CASE WHEN seq.is_called THEN 1 ELSE 0 END").format(
+            self.table_name(), self.pk(), sequence.replace("'", "''"), sequence)
+        return self.controller().execute_sql(sql, commit=commit)
+
+
+    def insert_many(self, records, commit=True):
+        """Insert all @records (list of dicts field: value) with a single multi-row insert.
+        Primary key values are generated by its sequence, or from max_pk() if it doesn't own any.
+        Return list of new pk values."""
+
+        if not records:
+            return []
+
+        sequence = self.get_sequence(commit=False)
+        if sequence is None or (sequence and not self.sync_sequence(sequence, commit=False)):
+            self.controller().dao.rollback()
+            return None
+
+        fields = [x for x in self.field_names() if x != self.pk()]
+        values = [tuple(record.get(field) for field in fields) for record in records]
+        if not sequence:
+            # no sequence to rely on: set explicit ids
+            max_pk = self.max_pk(commit=False)
+            fields.append(self.pk())
+            values = [value + (max_pk + index + 1,) for index, value in enumerate(values)]
+        sql = "INSERT INTO {0} ({1}) VALUES %s RETURNING {2}".format(
+            self.table_name(), ", ".join(fields), self.pk())
+        rows = self.controller().execute_values(sql, values, fetch=True, commit=commit)
+        if rows is None:
+            return None
+
+        return [row[0] for row in rows]
+
+
+    def replace_relations(self, where_clause, records, commit=True):
+        """Replace records matching @where_clause with @records (list of dicts field: value)
+        in a single transaction. Return list of new pk values."""
+
+        if not self.delete(where_clause=where_clause, commit=False):
+            self.controller().dao.rollback()
+            return None
+
+        pks = self.insert_many(records, commit=False)
+        if pks is None:
+            return None
+
+        if commit:
+            self.controller().dao.commit()
+
+        return pks
+
+
     def pks(self, commit=True):
         """Fetch all pk values."""
 
@@ -7,7 +7,7 @@ or (at your option) any later version.
 # -*- coding: utf-8 -*-
 from qgis.core import QgsEditorWidgetSetup, QgsExpressionContextUtils, QgsFieldConstraints, QgsPointLocator, \
     QgsProject, QgsSnappingUtils, QgsTolerance
-from qgis.PyQt.QtCore import QObject, QPoint, QSettings, Qt
+from qgis.PyQt.QtCore import QObject, QPoint, QSettings, Qt, QTimer
 from qgis.PyQt.QtWidgets import QAction, QActionGroup, QApplication, QDockWidget, QMenu, QToolBar, QToolButton
 from qgis.PyQt.QtGui import QCursor, QIcon, QKeySequence, QPixmap
 
@@ -15,6 +15,7 @@ import configparser
 import json
 import os.path
 import sys
+import time
 import webbrowser
 from collections import OrderedDict
 from functools import partial
@@ -29,6 +30,7 @@ from .actions.master import Master
 from .actions.mincut import MincutParent
 from .actions.om import Om
 from .actions.parent import ParentAction
+from .actions.performance import Performance
 from .actions.tm_basic import TmBasic
 from .actions.update_sql import UpdateSQL
 from .actions.utils import Utils
@@ -46,6 +48,7 @@ from .map_tools.move_node import MoveNodeMapTool
 from .map_tools.replace_feature import ReplaceFeatureMapTool
 from .models.plugin_toolbar import PluginToolbar
 from .models.sys_feature_cat import SysFeatureCat
+from . import ui_manager
 from .ui_manager import DialogTextUi
 
 
@@ -72,7 +75,11 @@ class Giswater(QObject):
         self.update_sql = None
         self.action = None
         self.action_info = None
+        self.action_performance = None
+        self.performance = None
         self.toolButton = None
+        self.project_read_id = 0
+        self.deferred_stages = []
 
         # Initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
@@ -99,6 +106,12 @@ class Giswater(QObject):
         self.qgis_settings = QSettings()
         self.qgis_settings.setIniCodec(sys.getfilesystemencoding())
 
+        # Precompile Qt Designer forms to Python modules if parameter 'precompile_ui' = True
+        precompile_ui = self.settings.value('system_variables/precompile_ui', 'FALSE').upper()
+        if precompile_ui == 'TRUE':
+            main_folder = os.path.join(os.path.expanduser("~"), self.plugin_name)
+            ui_manager.set_ui_cache_folder(main_folder + os.sep + "cache" + os.sep + "ui")
+
         # Define signals
         self.set_signals()
 
@@ -130,6 +143,11 @@ class Giswater(QObject):
         self.update_sql = UpdateSQL(self.iface, self.settings, self.controller, self.plugin_dir)
         self.action.triggered.connect(self.update_sql.init_sql)
 
+        # Menu entry to show query telemetry (always available)
+        self.action_performance = QAction("Performance", self.iface.mainWindow())
+        self.action_performance.triggered.connect(self.open_performance)
+        self.iface.addPluginToMenu(self.plugin_name, self.action_performance)
+
 
     def unset_info_button(self):
         """ Unset main information button (when plugin is disabled or reloaded) """
@@ -138,8 +156,19 @@ class Giswater(QObject):
             self.action.triggered.disconnect()
         if self.action_info:
             self.iface.removeToolBarIcon(self.action_info)
+        if self.action_performance:
+            self.iface.removePluginMenu(self.plugin_name, self.action_performance)
         self.action = None
         self.action_info = None
+        self.action_performance = None
+
+
+    def open_performance(self):
+        """ Show dockable panel with query telemetry """
+
+        if self.performance is None:
+            self.performance = Performance(self.iface, self.settings, self.controller, self.plugin_dir)
+        self.performance.open_panel()
 
 
     def set_info_button_visible(self, visible=True):
@@ -650,9 +679,15 @@ class Giswater(QObject):
 
         sql = None
         self.feature_cat = {}
-        sql = ("SELECT cat_feature.* FROM cat_feature "
-               "WHERE active IS TRUE ORDER BY id")
-        rows = self.controller.get_rows(sql)
+
+        # Get records from project metadata snapshot, if available
+        metadata = self.controller.get_project_metadata()
+        if metadata and metadata['cat_feature'] is not None:
+            rows = [row for row in metadata['cat_feature'] if row['active'] is True]
+        else:
+            sql = ("SELECT cat_feature.* FROM cat_feature "
+                   "WHERE active IS TRUE ORDER BY id")
+            rows = self.controller.get_rows(sql)
         if not rows:
             return False
 
@@ -685,6 +720,9 @@ class Giswater(QObject):
         if docker_info:
             self.iface.removeDockWidget(docker_info)
 
+        if self.performance:
+            self.performance.close_panel()
+
         if self.btn_add_layers:
             dockwidget = self.iface.mainWindow().findChild(QDockWidget, 'Layers')
             toolbar = dockwidget.findChildren(QToolBar)[0]
@@ -742,6 +780,7 @@ class Giswater(QObject):
             self.map_tools = {}
             self.srid = None
             self.plugin_toolbars = {}
+            self.deferred_stages = []
 
 
     """ Slots """
@@ -881,7 +920,14 @@ class Giswater(QObject):
 
 
     def project_read(self, show_warning=True):
-        """ Function executed when a user opens a QGIS project (*.qgs) """
+        """ Function executed when a user opens a QGIS project (*.qgs)
+            Only critical stages (connection, schema and toolbars) are executed here.
+            The rest of stages are deferred until Qt event loop is idle """
+
+        # Identify this project read, so deferred stages of previous ones are discarded
+        self.project_read_id += 1
+        self.deferred_stages = []
+        time_start = time.perf_counter()
 
         # Unload plugin before reading opened project
         self.unload(False)
@@ -891,7 +937,7 @@ class Giswater(QObject):
             return
 
         # Force commit before opening project and set new database connection
-        if not self.manage_controller(show_warning):
+        if not self.execute_stage("manage_controller", self.manage_controller, show_warning):
             return
 
         # Manage schema name
@@ -908,6 +954,9 @@ class Giswater(QObject):
         # Set PostgreSQL parameter 'search_path'
         self.controller.set_search_path(layer_source['schema'])
 
+        # Get project metadata snapshot, used by controller getters instead of querying database each time
+        self.execute_stage("load_project_metadata", self.controller.load_project_metadata, self.schema_name)
+
         # Check if schema exists
         self.schema_exists = self.controller.check_schema(self.schema_name)
         if not self.schema_exists:
@@ -953,17 +1002,19 @@ class Giswater(QObject):
 
         # Manage layers and check project
         self.set_qgis_layers = True
-        if not self.manage_layers():
+        self.check_project_background = \
+            self.settings.value('system_variables/check_project_background', 'FALSE').upper() == 'TRUE'
+        if not self.execute_stage("manage_layers", self.manage_layers):
             return
 
         # Manage records from table 'cat_feature'
-        self.manage_feature_cat()
+        self.execute_stage("manage_feature_cat", self.manage_feature_cat)
 
         # Manage snapping layers
         self.manage_snapping_layers()
 
         # Manage actions of the different plugin_toolbars
-        self.manage_toolbars()
+        self.execute_stage("manage_toolbars", self.manage_toolbars)
 
         # Set actions to controller class for further management
         self.controller.set_actions(self.actions)
@@ -972,12 +1023,7 @@ class Giswater(QObject):
         self.manage_map_tools()
 
         # Check roles of this user to show or hide toolbars
-        self.controller.check_user_roles()
-
-        # Set project layers with gw_fct_getinfofromid: This process takes time for user
-        if self.set_qgis_layers is True:
-            self.get_layers_to_config()
-            self.set_layer_config(self.available_layers)
+        self.execute_stage("check_user_roles", self.controller.check_user_roles)
 
         # Create a thread to listen selected database channels
         if self.settings.value('system_variables/use_notify').upper() == 'TRUE':
@@ -997,18 +1043,71 @@ class Giswater(QObject):
         if show_warning:
             self.set_info_button_visible(False)
 
+        # Set project layers with gw_fct_getinfofromid: This process takes time for user
+        # If project check is executed in background, it will be done when it finishes
+        if self.set_qgis_layers is True and not self.check_project_background:
+            self.defer_stage("get_layers_to_config", self.get_layers_to_config)
+            self.defer_stage("set_layer_config", self.set_layer_config_deferred)
+
         # Open automatically 'search docker' depending its value in user settings
         open_search = self.controller.get_user_setting_value('open_search', 'true')
         if open_search == 'true':
-            self.basic.basic_api_search(load_project=True)
+            self.defer_stage("open_search", self.basic.basic_api_search, load_project=True)
 
         # call dynamic mapzones repaint
-        self.parent.set_style_mapzones()
+        self.defer_stage("set_style_mapzones", self.parent.set_style_mapzones)
 
         # Log it
-        message = "Project read successfully"
+        message = f"Project read successfully. Critical stages executed in {time.perf_counter() - time_start:.3f} seconds"
         self.controller.log_info(message)
 
+        # Execute deferred stages when Qt event loop is idle
+        QTimer.singleShot(0, partial(self.execute_deferred_stages, self.project_read_id))
+
+
+    def execute_stage(self, stage_name, function, *args, **kwargs):
+        """ Execute @function as project read stage @stage_name and log its duration """
+
+        time_start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.controller.log_info(f"Stage '{stage_name}' executed in {time.perf_counter() - time_start:.3f} seconds")
+        return result
+
+
+    def defer_stage(self, stage_name, function, *args, **kwargs):
+        """ Add @function to the list of project read stages executed when Qt event loop is idle """
+
+        self.deferred_stages.append((stage_name, partial(function, *args, **kwargs)))
+
+
+    def execute_deferred_stages(self, project_read_id):
+        """ Execute next deferred stage of project read @project_read_id, and schedule the following one.
+            Only one stage is executed each time, so user can interact with QGIS between them """
+
+        # Discard stages of a previous project
+        if project_read_id != self.project_read_id or not self.deferred_stages:
+            return
+
+        stage_name, function = self.deferred_stages.pop(0)
+        try:
+            self.execute_stage(stage_name, function)
+        except Exception as e:
+            self.controller.log_warning(f"Stage '{stage_name}' failed: {type(e).__name__} --> {e}")
+
+        if self.deferred_stages:
+            QTimer.singleShot(0, partial(self.execute_deferred_stages, project_read_id))
+        else:
+            self.controller.log_info("Project read deferred stages finished")
+
+
+    def set_layer_config_deferred(self):
+        """ Configure available layers in small batches, as deferred stages of project read """
+
+        batch_size = 10
+        for index in range(0, len(self.available_layers), batch_size):
+            layers_name = self.available_layers[index:index + batch_size]
+            self.defer_stage(f"set_layer_config ({', '.join(layers_name)})", self.set_layer_config, layers_name)
+
 
     def get_buttons_to_hide(self):
 
@@ -1148,23 +1247,19 @@ class Giswater(QObject):
             return False
 
         if self.project_type in ('ws', 'ud'):
-            QApplication.setOverrideCursor(Qt.ArrowCursor)
             self.check_project_result = CheckProjectResult(self.iface, self.settings, self.controller, self.plugin_dir)
             self.check_project_result.set_controller(self.controller)
 
+            # Check project as a background task, so it doesn't delay toolbars
+            if self.check_project_background:
+                self.check_project_result.populate_audit_check_project_task(layers, "true", self.project_check_finished)
+                return True
+
             # check project
+            QApplication.setOverrideCursor(Qt.ArrowCursor)
             status, result = self.check_project_result.populate_audit_check_project(layers, "true")
             try:
-                if 'actions' in result['body']:
-                    if 'setQgisLayers' in result['body']['actions']:
-                        self.set_qgis_layers = result['body']['actions']['setQgisLayers']
-                    if 'useGuideMap' in result['body']['actions']:
-                        guided_map = result['body']['actions']['useGuideMap']
-                        if guided_map:
-                            self.controller.log_info("manage_guided_map")
-                            self.manage_guided_map()
-            except Exception as e:
-                self.controller.log_info(str(e))
+                self.manage_check_project_actions(result)
             finally:
                 QApplication.restoreOverrideCursor()
                 return status
@@ -1172,6 +1267,39 @@ class Giswater(QObject):
         return True
 
 
+    def manage_check_project_actions(self, result):
+        """ Manage actions returned by function 'gw_fct_audit_check_project' """
+
+        try:
+            if 'actions' in result['body']:
+                if 'setQgisLayers' in result['body']['actions']:
+                    self.set_qgis_layers = result['body']['actions']['setQgisLayers']
+                if 'useGuideMap' in result['body']['actions']:
+                    guided_map = result['body']['actions']['useGuideMap']
+                    if guided_map:
+                        self.controller.log_info("manage_guided_map")
+                        self.manage_guided_map()
+        except Exception as e:
+            self.controller.log_info(str(e))
+
+
+    def project_check_finished(self, status, result):
+        """ Function called when background task 'Check project' has finished """
+
+        if not status:
+            return
+
+        self.manage_check_project_actions(result)
+
+        # Set project layers with gw_fct_getinfofromid once we know if it is required
+        if self.set_qgis_layers is True:
+            self.get_layers_to_config()
+            executing = len(self.deferred_stages) > 0
+            self.set_layer_config_deferred()
+            if not executing:
+                QTimer.singleShot(0, partial(self.execute_deferred_stages, self.project_read_id))
+
+
     def manage_snapping_layers(self):
         """ Manage snapping of layers """
 
@@ -1325,14 +1453,23 @@ class Giswater(QObject):
         """ Get available layers to be configured """
 
         schema_name = self.schema_name.replace('"', '')
-        sql = (f"SELECT DISTINCT(parent_layer) FROM cat_feature "
-               f"UNION "
-               f"SELECT DISTINCT(child_layer) FROM cat_feature "
-               f"WHERE child_layer IN ("
-               f"     SELECT table_name FROM information_schema.tables"
-               f"     WHERE table_schema = '{schema_name}')")
-        rows = self.controller.get_rows(sql)
-        self.available_layers = [layer[0] for layer in rows]
+
+        # Get layers from project metadata snapshot, if available
+        metadata = self.controller.get_project_metadata()
+        if metadata and metadata['cat_feature'] is not None:
+            layers = [row['parent_layer'] for row in metadata['cat_feature']]
+            layers += [row['child_layer'] for row in metadata['cat_feature']
+                       if row['child_layer'] in metadata['relations']]
+            self.available_layers = list(OrderedDict.fromkeys(layers))
+        else:
+            sql = (f"SELECT DISTINCT(parent_layer) FROM cat_feature "
+                   f"UNION "
+                   f"SELECT DISTINCT(child_layer) FROM cat_feature "
+                   f"WHERE child_layer IN ("
+                   f"     SELECT table_name FROM information_schema.tables"
+                   f"     WHERE table_schema = '{schema_name}')")
+            rows = self.controller.get_rows(sql)
+            self.available_layers = [layer[0] for layer in rows]
 
         all_layers_toc = self.controller.get_layers()
         for layer in all_layers_toc:
@@ -1367,19 +1504,46 @@ class Giswater(QObject):
 
         msg_failed = ""
         msg_key = ""
+
+        # Get layer fields from persistent cache of form definitions
+        form_cache = self.controller.form_cache
+        form_type = f"layer_{self.qgis_project_infotype}"
+        qgis_layers = {}
+        layers_fields = {}
         for layer_name in layers:
             layer = self.controller.get_layer_by_tablename(layer_name)
             if not layer:
                 continue
-
+            qgis_layers[layer_name] = layer
+            if form_cache:
+                fields = form_cache.get(self.schema_name, layer_name, form_type)
+                # Combo domains are not cached: layers with combos need them from database for their ValueMap
+                if fields and any(field.get('widgettype') == 'combo' for field in fields):
+                    fields = None
+                layers_fields[layer_name] = fields
+
+        # Get fields of layers not found in cache from database, in a single round trip
+        layers_missing = [layer_name for layer_name in qgis_layers if layers_fields.get(layer_name) is None]
+        calls = []
+        for layer_name in layers_missing:
             feature = '"tableName":"' + str(layer_name) + '", "id":"", "isLayer":true'
             extras = f'"infoType":"{self.qgis_project_infotype}"'
             body = self.create_body(feature=feature, extras=extras)
-            complet_result = self.controller.get_json('gw_fct_getinfofromid', body)
+            calls.append(('gw_fct_getinfofromid', body))
+        results = self.controller.get_json_many(calls)
+        for layer_name, complet_result in zip(layers_missing, results):
             if not complet_result:
                 continue
+            layers_fields[layer_name] = complet_result['body']['data']['fields']
+            if form_cache:
+                form_cache.put(self.schema_name, layer_name, layers_fields[layer_name], form_type)
+
+        for layer_name, layer in qgis_layers.items():
+            fields = layers_fields.get(layer_name)
+            if fields is None:
+                continue
 
-            for field in complet_result['body']['data']['fields']:
+            for field in fields:
                 valuemap_values = {}
 
                 # Get column index
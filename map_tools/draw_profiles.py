@@ -8,49 +8,23 @@ or (at your option) any later version.
 from qgis.core import QgsFeatureRequest, QgsVectorLayer, QgsExpression
 from qgis.gui import QgsMapToolEmitPoint
 from qgis.PyQt.QtCore import Qt, QDate
-from qgis.PyQt.QtWidgets import QListWidget, QListWidgetItem, QLineEdit, QAction
+from qgis.PyQt.QtWidgets import QListWidget, QListWidgetItem, QLineEdit, QAction, QFileDialog
 
 from functools import partial
-from decimal import Decimal
-from collections import OrderedDict
 import matplotlib.pyplot as plt
-import math
+import csv
 import os
 import json
+import re
 
 from .. import utils_giswater
 from .parent import ParentMapTool
+from .profile_renderer import ProfileRenderer
+from ..actions.task_profiles import TaskProfiles
 from ..ui_manager import Profile
 from ..ui_manager import ProfilesList
 
 
-class NodeData:
-
-    def __init__(self):
-
-        self.start_point = None
-        self.top_elev = None
-        self.ymax = None
-        self.z1 = None
-        self.z2 = None
-        self.cat_geom = None
-        self.geom = None
-        self.slope = None
-        self.elev1 = None
-        self.elev2 = None
-        self.y1 = None
-        self.y2 = None
-        self.node_id = None
-        self.elev = None
-        self.code = None
-        self.node_1 = None
-        self.node_2 = None
-        self.total_distance = None
-        self.descript = None
-        self.data_type = None
-        self.surface_type = None
-
-
 class DrawProfiles(ParentMapTool):
     """ Button 43: Draw_profiles """
 
@@ -64,7 +38,6 @@ class DrawProfiles(ParentMapTool):
         self.nodes = []
         self.links = []
         self.rotation_vd_exist = False
-        self.lastnode_datatype = 'REAL'
 
     def activate(self):
 
@@ -159,8 +132,7 @@ class DrawProfiles(ParentMapTool):
             return
 
         # Execute draw profile
-        self.draw_profile(self.profile_json['body']['data']['arc'], self.profile_json['body']['data']['node'],
-                         self.profile_json['body']['data']['terrain'])
+        self.draw_profile()
 
         # Save profile values
         self.controller.plugin_settings_set_value("minDistanceProfile", links_distance)
@@ -225,6 +197,7 @@ class DrawProfiles(ParentMapTool):
         self.dlg_load.rejected.connect(partial(self.close_dialog, self.dlg_load.rejected))
         self.dlg_load.btn_open.clicked.connect(partial(self.load_profile, result_profile))
         self.dlg_load.btn_delete_profile.clicked.connect(partial(self.delete_profile))
+        self.dlg_load.btn_export_profiles.clicked.connect(partial(self.export_selected_profiles))
 
         # Populate profile list
         for profile in result_profile['body']['data']:
@@ -392,46 +365,19 @@ class DrawProfiles(ParentMapTool):
             self.controller.log_info(f"{type(e).__name__} --> {e}")
 
 
-    def draw_profile(self, arcs, nodes, terrains):
+    def draw_profile(self):
         """ Parent function - Draw profiles """
 
         # Clear plot
         plt.gcf().clear()
 
-        # Set main parameters
-        self.set_profile_variables(arcs, nodes, terrains)
-        self.fill_profile_variables(arcs, nodes, terrains)
-        self.set_guitar_parameters()
-
-        # Draw start node
-        self.draw_start_node(self.nodes[0])
-
-        # Draw nodes and precedessor arcs between start and end nodes
-        for i in range(1, self.n - 1):
-            self.draw_nodes(self.nodes[i], self.nodes[i - 1], i)
-
-        # Draw terrain
-        for i in range(1, self.t):
-
-            # define variables
-            self.first_top_x = self.links[i - 1].start_point # start_point = total_x
-            self.node_top_x = self.links[i].start_point  # start_point = total_x
-            self.first_top_y = self.links[i - 1].node_id  # node_id = top_n1
-            self.node_top_y = self.links[i - 1].geom  # geom = top_n2
-
-            # Draw terrain
-            self.draw_terrain(i)
-
-            # Fill text terrain
-            self.fill_guitar_text_terrain(self.node_top_x, i)
-            self.draw_guitar_auxiliar_lines(self.node_top_x, first_vl=False)
-
-        # Draw last node and precedessor arc
-        self.draw_end_node(self.nodes[self.n - 1], self.nodes[self.n - 2], self.n - 1)
-
-        # Draw guitar & grid
-        self.draw_guitar_horitzontal_lines()
-        self.draw_grid()
+        # Draw profile of last query
+        title = utils_giswater.getWidgetText(self.dlg_draw_profile, self.dlg_draw_profile.txt_title)
+        date = utils_giswater.getCalendarDate(self.dlg_draw_profile, self.dlg_draw_profile.date)
+        renderer = ProfileRenderer(self.profile_json, title, date)
+        renderer.draw(plt.gca())
+        self.nodes = renderer.nodes
+        self.links = renderer.links
 
         # Manage layout and plot
         self.set_profile_layout()
@@ -469,841 +415,6 @@ class DrawProfiles(ParentMapTool):
         self.rect.set_facecolor('white')
 
        
-    def set_profile_variables(self, arcs, nodes, terrains):
-        """ Get and calculate parameters and values for drawing """
-
-        # Declare list elements
-        self.list_of_selected_arcs = arcs
-        self.list_of_selected_nodes = []
-        self.list_of_selected_terrains = []
-
-        # Populate list nodes
-        for node in nodes:
-            self.list_of_selected_nodes.append(node)
-
-        # Populate list terrains
-        for terrain in terrains:
-            self.list_of_selected_terrains.append(terrain)
-
-        self.gis_length = [0]
-        self.arc_dimensions = []
-        self.arc_catalog = []
-        self.start_point = [0]
-
-        # Get arcs between nodes (on shortest path)
-        self.n = len(self.list_of_selected_nodes)
-        self.t = len(self.list_of_selected_terrains)
-
-        for arc in arcs:
-            self.gis_length.append(arc['length'])
-            self.arc_dimensions.append([json.loads(arc['descript'], object_pairs_hook=OrderedDict)][0]['dimensions'])
-            self.arc_catalog.append([json.loads(arc['descript'], object_pairs_hook=OrderedDict)][0]['catalog'])
-
-        # Calculate start_point (coordinates) of drawing for each node
-        n = len(self.gis_length)
-        for i in range(1, n):
-            x = self.start_point[i - 1] + self.gis_length[i]
-            self.start_point.append(x)
-            i += 1
-
-    def fill_profile_variables(self, arcs, nodes, terrains):
-        """ Get parameters from data base. Fill self.nodes with parameters postgres """
-
-        # Get parameters and fill the nodes
-        n = 0
-        for node in nodes:
-            parameters = NodeData()
-            parameters.start_point = self.start_point[n]
-            parameters.top_elev = node['top_elev']
-            parameters.ymax = node['ymax']
-            parameters.elev = node['elev']
-            parameters.node_id = node['node_id']
-            parameters.geom = node['cat_geom1']
-            parameters.descript = [json.loads(node['descript'], object_pairs_hook=OrderedDict)][0]
-            parameters.data_type = node['data_type']
-            parameters.surface_type = node['surface_type']
-
-
-            self.nodes.append(parameters)
-            n = n + 1
-
-        # Get parameters and fill the links
-        n = 0
-        for terrain in terrains:
-            parameters = NodeData()
-            parameters.start_point = terrain['total_x']
-            parameters.top_elev = [json.loads(terrain['label_n1'], object_pairs_hook=OrderedDict)][0]['top_elev']
-            parameters.node_id = terrain['top_n1']
-            parameters.geom = terrain['top_n2']
-            parameters.descript = [json.loads(terrain['label_n1'], object_pairs_hook=OrderedDict)][0]
-            parameters.surface_type = terrain['surface_type']
-
-            self.links.append(parameters)
-            n = n + 1
-
-        n = 0
-
-        # Populate node parameters with associated arcs
-        for arc in arcs:
-            self.nodes[n].z1 = arc['z1']
-            self.nodes[n].z2 = arc['z2']
-            self.nodes[n].cat_geom = arc['cat_geom1']
-            self.nodes[n].elev1 = arc['elev1']
-            self.nodes[n].elev2 = arc['elev2']
-            self.nodes[n].y1 = arc['y1']
-            self.nodes[n].y2 = arc['y2']
-            self.nodes[n].slope = 1
-            self.nodes[n].node_1 = arc['node_1']
-            self.nodes[n].node_2 = arc['node_2']
-            n += 1
-
-
-    def draw_start_node(self, node):
-        """ Draw first node """
-
-        # Get superior points
-        s1x = -node.geom / 2
-        s1y = node.top_elev
-        s2x = node.geom / 2
-        s2y = node.top_elev
-        s3x = node.geom / 2
-        s3y = node.top_elev - node.ymax + node.z1 + node.cat_geom
-
-        # Get inferior points
-        i1x = -node.geom / 2
-        i1y = node.top_elev - node.ymax
-        i2x = node.geom / 2
-        i2y = node.top_elev - node.ymax
-        i3x = node.geom / 2
-        i3y = node.top_elev - node.ymax + node.z1
-
-        # Create list points
-        xinf = [s1x, i1x, i2x, i3x]
-        yinf = [s1y, i1y, i2y, i3y]
-        xsup = [s1x, s2x, s3x]
-        ysup = [s1y, s2y, s3y]
-
-        # draw first node bottom line
-        plt.plot(xinf, yinf,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        # draw first node upper line
-        plt.plot(xsup, ysup,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        self.first_top_x = 0
-        self.first_top_y = node.top_elev
-
-        # Save last points for first node
-        self.slast = [s3x, s3y]
-        self.ilast = [i3x, i3y]
-
-        # Save last points for first node
-        self.slast2 = [s3x, s3y]
-        self.ilast2 = [i3x, i3y]
-
-        # Fill table with start node values
-        self.fill_guitar_text_node(0, 0)
-
-        # Draw header
-        self.draw_guitar_vertical_lines(node.start_point)
-        self.fill_guitar_text_legend(node.start_point)
-        self.draw_guitar_auxiliar_lines(0)
-
-
-    def draw_guitar_vertical_lines(self, start_point):
-        """ Draw fixed part of table """
-
-        # Get stylesheet
-        line_color = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['color']
-        line_style = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['style']
-        line_width = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['width']
-
-        # Vertical line [-1,0]
-        # x = [start_point - self.fix_x * Decimal(0.2), start_point - self.fix_x * Decimal(0.2)]
-        # y = [self.min_top_elev - 1 * self.height_row, self.min_top_elev - Decimal(5.85) * self.height_row]
-        # plt.plot(x, y, linestyle=line_style, color=line_color, linewidth=line_width, zorder=100)
-
-        # Vertical line [-2,0]
-        x = [start_point - self.fix_x * Decimal(0.75), start_point - self.fix_x * Decimal(0.75)]
-        y = [self.min_top_elev - Decimal(1.9) * self.height_row, self.min_top_elev - Decimal(5.10) * self.height_row]
-        plt.plot(x, y, linestyle=line_style, color=line_color, linewidth=line_width, zorder=100)
-
-        # Vertical line [-3,0]
-        x = [start_point - self.fix_x, start_point - self.fix_x]
-        y = [self.min_top_elev - 1 * self.height_row, self.min_top_elev - Decimal(5.85) * self.height_row]
-        plt.plot(x, y, linestyle=line_style, color=line_color, linewidth=line_width, zorder=100)
-
-
-    def draw_guitar_auxiliar_lines(self, start_point, first_vl=True):
-        """ Draw marks for each node """
-
-        # Get stylesheet
-        auxline_color = self.profile_json['body']['data']['stylesheet']['guitar']['auxiliarlines']['color']
-        auxline_style = self.profile_json['body']['data']['stylesheet']['guitar']['auxiliarlines']['style']
-        auxline_width = self.profile_json['body']['data']['stylesheet']['guitar']['auxiliarlines']['width']
-
-        if first_vl: # separator for first slope / length (only for nodes)
-            # Vertical line [0,0]
-            x = [start_point, start_point]
-            y = [self.min_top_elev - 1 * self.height_row,
-                 self.min_top_elev - Decimal(1.9) * self.height_row]
-            plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        # Vertical lines
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(1.90) * self.height_row, self.min_top_elev - Decimal(2.05) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(2.60) * self.height_row, self.min_top_elev - Decimal(2.85) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(3.4) * self.height_row, self.min_top_elev - Decimal(3.65) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(4.20) * self.height_row, self.min_top_elev - Decimal(4.45) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(5) * self.height_row, self.min_top_elev - Decimal(5.25) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-        x = [start_point, start_point]
-        y = [self.min_top_elev - Decimal(5.85) * self.height_row, self.min_top_elev - Decimal(5.7) * self.height_row]
-        plt.plot(x, y, linestyle=auxline_style, color=auxline_color, linewidth=auxline_width, zorder=100)
-
-
-    def fill_guitar_text_legend(self, start_point):
-
-        # Get stylesheet values
-        text_color = self.profile_json['body']['data']['stylesheet']['guitar']['text']['color']
-        text_weight = self.profile_json['body']['data']['stylesheet']['guitar']['text']['weight']
-        title_color = self.profile_json['body']['data']['stylesheet']['title']['text']['color']
-        title_weight = self.profile_json['body']['data']['stylesheet']["title"]['text']['weight']
-        title_size = self.profile_json['body']['data']['stylesheet']["title"]['text']['size']
-
-        legend = self.profile_json['body']['data']['legend']
-        c = (self.fix_x - self.fix_x * Decimal(0.2)) / 2
-        plt.text(-(c + self.fix_x * Decimal(0.2)),
-                 self.min_top_elev - 1 * self.height_row - Decimal(0.35) * self.height_row, legend['catalog'],
-                 fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 horizontalalignment='center')
-
-        plt.text(-(c + self.fix_x * Decimal(0.2)),
-                 self.min_top_elev - 1 * self.height_row - Decimal(0.68) * self.height_row, legend['dimensions'],
-                 fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 horizontalalignment='center')
-
-        c = (self.fix_x * Decimal(0.25)) / 2
-        plt.text(-(c + self.fix_x * Decimal(0.74)),
-                 self.min_top_elev - Decimal(2) * self.height_row - self.height_row * 3 / 2, legend['ordinates'],
-                 fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-        plt.text(-self.fix_x * Decimal(0.70), self.min_top_elev - Decimal(1.85) * self.height_row - self.height_row / 2,
-                 legend['topelev'], fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 verticalalignment='center')
-
-        plt.text(-self.fix_x * Decimal(0.70), self.min_top_elev - Decimal(2.65) * self.height_row - self.height_row / 2,
-                 legend['ymax'], fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 verticalalignment='center')
-
-        plt.text(-self.fix_x * Decimal(0.70), self.min_top_elev - Decimal(3.45) * self.height_row - self.height_row / 2,
-                 legend['elev'], fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 verticalalignment='center')
-
-        plt.text(-self.fix_x * Decimal(0.70), self.min_top_elev - Decimal(4.25) * self.height_row - self.height_row / 2,
-                 legend['distance'], fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 verticalalignment='center')
-
-        c = (self.fix_x - self.fix_x * Decimal(0.2)) / 2
-        plt.text(-(c + self.fix_x * Decimal(0.2)),
-                 self.min_top_elev - Decimal(self.height_row * 5 + self.height_row / 2), legend['code'],
-                 fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 horizontalalignment='center', verticalalignment='center')
-
-        # print title
-        title = utils_giswater.getWidgetText(self.dlg_draw_profile, self.dlg_draw_profile.txt_title)
-        if title in (None, 'null'):
-            title = ''
-        plt.text(-self.fix_x * Decimal(1), self.min_top_elev - Decimal(5.75) * self.height_row - self.height_row / 2,
-                 title.upper(), fontsize=title_size,
-                 color=title_color, fontweight=title_weight,
-                 verticalalignment='center')
-        plt.text(-self.fix_x * Decimal(1), self.min_top_elev - Decimal(6) * self.height_row - self.height_row / 2,
-                 "" + str(utils_giswater.getCalendarDate(self.dlg_draw_profile, self.dlg_draw_profile.date)) + "",
-                 fontsize=title_size*0.7,
-                 color=title_color, fontweight=title_weight,
-                 verticalalignment='center')
-
-    def draw_nodes(self, node, prev_node, index):
-        """ Draw nodes between first and last node """
-
-        z1 = prev_node.z2
-        z2 = node.z1
-
-        if node.node_1 is None:
-            return
-
-        # Get superior points
-        s1x = self.slast[0]
-        s1y = self.slast[1]
-
-        if node.geom is None:
-            node.geom = 0
-
-        s2x = node.start_point - node.geom / 2
-        s2y = node.top_elev - node.ymax + z1 + prev_node.cat_geom
-        s3x = node.start_point - node.geom / 2
-        s3y = node.top_elev
-        s4x = node.start_point + node.geom / 2
-        s4y = node.top_elev
-        s5x = node.start_point + node.geom / 2
-        s5y = node.top_elev - node.ymax + z2 + node.cat_geom
-
-        # Get inferior points
-        i1x = self.ilast[0]
-        i1y = self.ilast[1]
-        i2x = node.start_point - node.geom / 2
-        i2y = node.top_elev - node.ymax + z1
-        i3x = node.start_point - node.geom / 2
-        i3y = node.top_elev - node.ymax
-        i4x = node.start_point + node.geom / 2
-        i4y = node.top_elev - node.ymax
-        i5x = node.start_point + node.geom / 2
-        i5y = node.top_elev - node.ymax + z2
-
-        # Create arc list points
-        xainf = [i1x, i2x]
-        yainf = [i1y, i2y]
-        xasup = [s1x, s2x]
-        yasup = [s1y, s2y]
-
-        # Create node list points
-        xninf = [i2x, i3x, i4x, i5x]
-        yninf = [i2y, i3y, i4y, i5y]
-
-        if node.surface_type == 'TOP':
-          xnsup = [s2x, s3x, s4x, s5x]
-          ynsup = [s2y, s3y, s4y, s5y]
-        else:
-          xnsup = [s2x, s5x]
-          ynsup = [s2y, s5y]
-
-        # draw node bottom line
-        plt.plot(xninf, yninf,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        # draw node upper line
-        plt.plot(xnsup, ynsup,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        if self.lastnode_datatype == 'INTERPOLATED' or node.data_type == 'INTERPOLATED':
-            data_type = 'INTERPOLATED'
-        else:
-            data_type = 'REAL'
-
-        # draw arc bottom line
-        plt.plot(xainf, yainf,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(data_type)[0],
-                 color=self.get_stylesheet(data_type)[1],
-                 linewidth=self.get_stylesheet(data_type)[2])
-
-        # draw arc upper line
-        plt.plot(xasup, yasup,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(data_type)[0],
-                 color=self.get_stylesheet(data_type)[1],
-                 linewidth=self.get_stylesheet(data_type)[2])
-
-        self.node_top_x = node.start_point
-        self.node_top_y = node.top_elev
-        self.first_top_x = prev_node.start_point
-        self.first_top_y = prev_node.top_elev
-
-        # Draw guitar auxiliar lines
-        self.draw_guitar_auxiliar_lines(node.start_point)
-
-        # Fill table
-        self.fill_guitar_text_node(node.start_point, index)
-
-        # Save last points before the last node
-        self.slast = [s5x, s5y]
-        self.ilast = [i5x, i5y]
-        self.lastnode_datatype = node.data_type
-
-        # Save last points for draw ground
-        self.slast2 = [s3x, s3y]
-        self.ilast2 = [i3x, i3y]
-
-
-    def fill_guitar_text_node(self, start_point, index):
-
-        # Get stylesheet values
-        text_color = self.profile_json['body']['data']['stylesheet']['guitar']['text']['color']
-        text_weight = self.profile_json['body']['data']['stylesheet']['guitar']['text']['weight']
-
-        # Fill top_elevation
-        plt.annotate(' ' + '\n' + str(self.nodes[index].descript['top_elev']) + '\n' + ' ',
-                     xy=(Decimal(start_point), self.min_top_elev - \
-                         Decimal(self.height_row * Decimal(1.8) + self.height_row / 2)),
-                     fontsize=6,
-                     color=text_color, fontweight=text_weight,
-                     rotation='vertical', horizontalalignment='center', verticalalignment='center')
-        # Fill code
-        plt.text(0 + start_point, self.min_top_elev - Decimal(self.height_row * 5 + self.height_row / 2),
-                 self.nodes[index].descript['code'], fontsize=7.5,
-                 color=text_color, fontweight=text_weight,
-                 horizontalalignment='center', verticalalignment='center')
-
-        # Node init
-        if index == 0:
-
-            y1 = self.nodes[0].y1
-            elev1 = self.nodes[0].elev1
-
-            # Fill y_max
-            plt.annotate(' ' + '\n' + str(self.nodes[0].descript['ymax']) + '\n' + str(y1),
-                         xy=(Decimal(0 + start_point),
-                             self.min_top_elev - Decimal(self.height_row * Decimal(2.60) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill elevation
-            plt.annotate(' ' + '\n' + str(self.nodes[0].descript['elev']) + '\n' + str(elev1),
-                         xy=(Decimal(0 + start_point),
-                             self.min_top_elev - Decimal(self.height_row * Decimal(3.40) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill total length
-            plt.annotate(str(self.nodes[index].descript['total_distance']),
-                         xy=(Decimal(0 + start_point),
-                             self.min_top_elev - Decimal(
-                                 self.height_row * Decimal(4.20) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-        # Nodes between init and end
-        elif index < self.n-1:
-
-            # defining variables
-            y2_prev = self.nodes[index-1].y2
-            elev2_prev = self.nodes[index-1].elev2
-            y1 = self.nodes[0].y1
-            elev1 = self.nodes[0].elev1
-
-            # Fill y_max
-            plt.annotate(
-                str(y2_prev) + '\n' + str(self.nodes[index].descript['ymax']) + '\n' + str(y1),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(2.60) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill elevation
-            plt.annotate(
-                str(elev2_prev) + '\n' + str(self.nodes[index].descript['elev']) + '\n' + str(elev1),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(3.40) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill total length
-            plt.annotate(str(self.nodes[index].descript['total_distance']),
-                         xy=(Decimal(0 + start_point),
-                         self.min_top_elev - Decimal(self.height_row * Decimal(4.20) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-        # Node end
-        elif index == self.n-1:
-
-            # Fill y_max
-            plt.annotate(
-                str(self.nodes[index - 1].y2) + '\n' + str(self.nodes[index].descript['ymax']),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(2.60) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill elevation
-            plt.annotate(
-                str(self.nodes[index - 1].elev2) + '\n' + str(self.nodes[index].descript['elev']),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(3.40) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill total length
-            plt.annotate(str(self.nodes[index].descript['total_distance']),
-                         xy=(Decimal(0 + start_point),
-                         self.min_top_elev - Decimal(self.height_row * Decimal(4.20) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-
-        # Fill diameter and slope / length
-        if index != self.n - 1:
-
-            # Fill diameter
-            center = self.gis_length[index + 1] / 2
-            plt.text(center + start_point, self.min_top_elev - 1 * self.height_row - Decimal(0.35) * self.height_row,
-                     self.arc_catalog[index],
-                     fontsize=7.5,
-                     color=text_color, fontweight=text_weight,
-                     horizontalalignment='center')  # PUT IN THE MIDDLE PARAMETRIZATION
-
-            # Fill slope / length
-            plt.text(center + start_point, self.min_top_elev - 1 * self.height_row - Decimal(0.68) * self.height_row,
-                     self.arc_dimensions[index],
-                     fontsize=7.5,
-                     color=text_color, fontweight=text_weight,
-                     horizontalalignment='center')  # PUT IN THE MIDDLE PARAMETRIZATION
-
-
-    def fill_guitar_text_terrain(self, start_point, index):
-
-        if str(self.links[index].surface_type) == 'VNODE':
-
-            # Get stylesheet values
-            text_color = self.profile_json['body']['data']['stylesheet']['guitar']['text']['color']
-            text_weight = self.profile_json['body']['data']['stylesheet']['guitar']['text']['weight']
-
-            # Fill top_elevation
-            plt.annotate(' ' + '\n' + str(self.links[index].descript['top_elev']) + '\n' + ' ',
-                         xy=(Decimal(start_point), self.min_top_elev - \
-                             Decimal(self.height_row * Decimal(1.8) + self.height_row / 2)),
-                         fontsize=6,
-                         color=text_color, fontweight=text_weight,
-                         rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill code
-            plt.text(0 + start_point, self.min_top_elev - Decimal(self.height_row * Decimal(5) + self.height_row / 2),
-                     self.links[index].descript['code'],
-                     fontsize=7.5,
-                     color=text_color, fontweight=text_weight,
-                     horizontalalignment='center', verticalalignment='center')
-
-             # Fill y_max
-            plt.annotate(
-                str(self.links[index].descript['ymax']),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(2.60) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill elevation
-            plt.annotate(
-                str(self.links[index].descript['elev']),
-                xy=(Decimal(0 + start_point),
-                    self.min_top_elev - Decimal(self.height_row * Decimal(3.40) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-            # Fill total length
-            plt.annotate(str(self.links[index].descript['total_distance']),
-                 xy=(Decimal(0 + start_point),
-                     self.min_top_elev - Decimal(self.height_row * Decimal(4.20) + self.height_row / 2)),
-                fontsize=6,
-                color=text_color, fontweight=text_weight,
-                rotation='vertical', horizontalalignment='center', verticalalignment='center')
-
-
-    def draw_end_node(self, node, prev_node, index):
-        """
-        draws last arc and nodes of profile
-        :param node:
-        :param prev_node:
-        :param index:
-        :return:
-        """
-
-        s1x = self.slast[0]
-        s1y = self.slast[1]
-
-        s2x = node.start_point - node.geom / 2
-        s2y = node.top_elev - node.ymax + prev_node.z2 + prev_node.cat_geom
-        s3x = node.start_point - node.geom / 2
-        s3y = node.top_elev
-        s4x = node.start_point + node.geom / 2
-        s4y = node.top_elev
-
-        # Get inferior points
-        i1x = self.ilast[0]
-        i1y = self.ilast[1]
-        i2x = node.start_point - node.geom / 2
-        i2y = node.top_elev - node.ymax + prev_node.z2
-        i3x = node.start_point - node.geom / 2
-        i3y = node.top_elev - node.ymax
-        i4x = node.start_point + node.geom / 2
-        i4y = node.top_elev - node.ymax
-
-        # Create arc list points
-        xainf = [i1x, i2x]
-        yainf = [i1y, i2y]
-        xasup = [s1x, s2x]
-        yasup = [s1y, s2y]
-
-        # Create node list points
-        xninf = [i2x, i3x, i4x]
-        yninf = [i2y, i3y, i4y]
-        xnsup = [s2x, s3x, s4x, i4x]
-        ynsup = [s2y, s3y, s4y, i4y]
-
-        # draw node bottom line
-        plt.plot(xninf, yninf,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        # draw node upper line
-        plt.plot(xnsup, ynsup,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(node.data_type)[0],
-                 color=self.get_stylesheet(node.data_type)[1],
-                 linewidth=self.get_stylesheet(node.data_type)[2])
-
-        # draw arc bottom line
-        plt.plot(xainf, yainf,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(self.lastnode_datatype)[0],
-                 color=self.get_stylesheet(self.lastnode_datatype)[1],
-                 linewidth=self.get_stylesheet(self.lastnode_datatype)[2])
-
-        # draw arc upper line
-        plt.plot(xasup, yasup,
-                 zorder=100,
-                 linestyle=self.get_stylesheet(self.lastnode_datatype)[0],
-                 color=self.get_stylesheet(self.lastnode_datatype)[1],
-                 linewidth=self.get_stylesheet(self.lastnode_datatype)[2])
-
-        self.first_top_x = self.slast2[0]
-        self.first_top_y = self.slast2[1]
-
-        self.node_top_x = node.start_point
-        self.node_top_y = node.top_elev
-
-        # Draw table-marks
-        self.draw_guitar_auxiliar_lines(node.start_point)
-
-        # Fill table
-        self.fill_guitar_text_node(node.start_point, index)
-
-        # Reset lastnode_datatype
-        self.lastnode_datatype = 'REAL'
-
-
-    def set_guitar_parameters(self):
-        """
-        Define parameters of table
-        :return:
-        """
-
-        # Search y coordinate min_top_elev ( top_elev- ymax)
-        self.min_top_elev = Decimal(self.nodes[0].top_elev - self.nodes[0].ymax)
-
-        #self.min_top_elev_descript = Decimal(self.nodes[0].descript['top_elev'] - self.nodes[0].descript['ymax'])
-        for i in range(1, self.n):
-            if (self.nodes[i].top_elev - self.nodes[i].ymax) < self.min_top_elev:
-                self.min_top_elev = Decimal(self.nodes[i].top_elev - self.nodes[i].ymax)
-
-        # Search y coordinate max_top_elev
-        self.max_top_elev = self.nodes[0].top_elev
-        self.max_top_elev_descript = self.nodes[0].descript['top_elev']
-        for i in range(1, self.n):
-            if self.nodes[i].top_elev > self.max_top_elev:
-                self.max_top_elev = self.nodes[i].top_elev
-
-        # Calculating dimensions of x-fixed part of table
-        self.fix_x = Decimal(Decimal(0.15) * Decimal(self.nodes[self.n - 1].start_point))
-
-        # Calculating dimensions of y-fixed part of table
-        # Height y = height of table + height of graph
-        self.z = Decimal(self.max_top_elev) - Decimal(self.min_top_elev)
-        self.height_row = (Decimal(self.z) * Decimal(0.97)) / Decimal(5)
-
-        # Height of graph + table
-        self.height_y = Decimal(self.z * 2)
-
-
-    def draw_guitar_horitzontal_lines(self):
-        """
-        Draw horitzontal lines of table
-        :return:
-        """
-        line_color = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['color']
-        line_style = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['style']
-        line_width = self.profile_json['body']['data']['stylesheet']['guitar']['lines']['width']
-
-        self.set_guitar_parameters()
-
-        # Draw upper horizontal lines (long ones)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x]
-        y = [self.min_top_elev - self.height_row, self.min_top_elev - self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x]
-        y = [self.min_top_elev - Decimal(1.9) * self.height_row, self.min_top_elev - Decimal(1.9) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-
-        # Draw middle horizontal lines (short ones)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x * Decimal(0.75)]
-        y = [self.min_top_elev - Decimal(2.70) * self.height_row, self.min_top_elev - Decimal(2.70) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x * Decimal(0.75)]
-        y = [self.min_top_elev - Decimal(3.50) * self.height_row, self.min_top_elev - Decimal(3.50) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x * Decimal(0.75)]
-        y = [self.min_top_elev - Decimal(4.30) * self.height_row, self.min_top_elev - Decimal(4.30) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-
-        # Draw lower horizontal lines (long ones)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x]
-        y = [self.min_top_elev - Decimal(5.10) * self.height_row, self.min_top_elev - Decimal(5.10) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-        x = [self.nodes[self.n - 1].start_point, self.nodes[0].start_point - self.fix_x]
-        y = [self.min_top_elev - Decimal(5.85) * self.height_row, self.min_top_elev - Decimal(5.85) * self.height_row]
-        plt.plot(x, y, color=line_color, linestyle=line_style, linewidth=line_width, zorder=100)
-
-
-    def draw_grid(self):
-
-        # get values for lines
-        line_color = self.profile_json['body']['data']['stylesheet']['grid']['lines']['color']
-        line_style = self.profile_json['body']['data']['stylesheet']['grid']['lines']['style']
-        line_width = self.profile_json['body']['data']['stylesheet']['grid']['lines']['width']
-
-        # get values for boundary
-        boundary_color = self.profile_json['body']['data']['stylesheet']['grid']['boundary']['color']
-        boundary_style = self.profile_json['body']['data']['stylesheet']['grid']['boundary']['style']
-        boundary_width = self.profile_json['body']['data']['stylesheet']['grid']['boundary']['width']
-
-        # get values for text
-        text_color = self.profile_json['body']['data']['stylesheet']['grid']['text']['color']
-        text_weight = self.profile_json['body']['data']['stylesheet']['grid']['text']['weight']
-
-        start_point = self.nodes[self.n - 1].start_point
-        geom1 = self.nodes[self.n - 1].geom
-
-        # Draw main text
-        plt.text(-self.fix_x * Decimal(1), self.min_top_elev - Decimal(0.5) * self.height_row - self.height_row / 2,
-                 'REFERENCE: ' + str(round(self.min_top_elev - 1 * self.height_row, 2)) + '\n' + ' ',
-                 fontsize=8.5,
-                 color=text_color, fontweight=text_weight,
-                 verticalalignment='center')
-
-        # Draw boundary
-        x = [0, 0]
-        y = [self.min_top_elev - 1 * self.height_row, int(math.ceil(self.max_top_elev) + 1)]
-        plt.plot(x, y, color=boundary_color, linestyle=boundary_style, linewidth=boundary_width, zorder=100)
-        x = [start_point, start_point]
-        y = [self.min_top_elev - 1 * self.height_row, int(math.ceil(self.max_top_elev) + 1)]
-        plt.plot(x, y, color=boundary_color, linestyle=boundary_style, linewidth=boundary_width, zorder=100)
-        x = [0, start_point]
-        y = [int(math.ceil(self.max_top_elev) + 1), int(math.ceil(self.max_top_elev) + 1)]
-        plt.plot(x, y, color=boundary_color, linestyle=boundary_style, linewidth=boundary_width, zorder=100)
-
-        # Draw horitzontal lines
-        y = int(math.ceil(self.min_top_elev - 1 * self.height_row))
-        x = int(math.floor(self.max_top_elev))
-        if x % 2 == 0:
-            x = x + 2
-        else:
-            x = x + 1
-
-        for i in range(y, x):
-            if i % 2 == 0:
-                x1 = [0, start_point]
-                y1 = [i, i]
-            else:
-                i = i + 1
-                x1 = [0, start_point]
-                y1 = [i, i]
-
-            # set line
-            plt.plot(x1, y1, color=line_color, linestyle=line_style, linewidth=line_width, zorder=1)
-
-            # set texts
-            plt.text(0 - Decimal(geom1) * Decimal(1.5), i, str(i),
-                     fontsize=7.5,
-                     color=text_color, fontweight=text_weight,
-                     horizontalalignment='right', verticalalignment='center')
-            plt.text(Decimal(start_point) + Decimal(geom1) * Decimal(1.5), i, str(i),
-                     fontsize=7.5,
-                     color=text_color, fontweight=text_weight,
-                     horizontalalignment='left', verticalalignment='center')
-
-        # Draw vertical lines
-        x = int(math.floor(start_point))
-        for i in range(50, x, 50):
-            x1 = [i, i]
-            y1 = [self.min_top_elev - 1 * self.height_row, int(math.ceil(self.max_top_elev) + 1)]
-
-            # set line
-            plt.plot(x1, y1,  color=line_color, linestyle=line_style, linewidth=line_width, zorder=1)
-
-            # set texts
-            plt.annotate(str(i) + '\n' + ' ', xy=(i, int(math.ceil(self.max_top_elev) + 1)),
-                fontsize=6.5,
-                color=text_color, fontweight=text_weight,
-                horizontalalignment='center')
-
-
-    def draw_terrain(self, index):
-
-        # getting variables
-        line_color = self.profile_json['body']['data']['stylesheet']['terrain']['color']
-        line_style = self.profile_json['body']['data']['stylesheet']['terrain']['style']
-        line_width = self.profile_json['body']['data']['stylesheet']['terrain']['width']
-
-        # Draw marker
-        if index == 1:
-            plt.plot(self.first_top_x, self.first_top_y, marker='|', color=line_color)
-        else:
-            plt.plot(self.node_top_x, self.node_top_y, marker='|', color=line_color)
-
-        # Draw line
-        x = [self.first_top_x, self.node_top_x]
-        y = [self.first_top_y, self.node_top_y]
-        plt.plot(x, y, color=line_color, linewidth=line_width, linestyle=line_style)
-
-
     def clear_profile(self):
         """ Manage button clear profile and leave form empty """
 
@@ -1346,6 +457,97 @@ class DrawProfiles(ParentMapTool):
         self.dlg_load.tbl_profiles.takeItem(self.dlg_load.tbl_profiles.row(self.dlg_load.tbl_profiles.currentItem()))
 
 
+    def export_selected_profiles(self):
+        """ Export profiles selected in dialog load_profiles.ui to a folder selected by user """
+
+        selected_list = self.dlg_load.tbl_profiles.selectedItems()
+        if len(selected_list) == 0:
+            message = "Any record selected"
+            self.controller.show_warning(message)
+            return
+
+        message = "Select folder"
+        folder_path = QFileDialog.getExistingDirectory(parent=None, caption=self.controller.tr(message),
+                                                       directory=os.path.expanduser("~"))
+        if not folder_path:
+            return
+
+        self.export_profiles([item.text() for item in selected_list], folder_path)
+
+
+    def export_profiles(self, profiles, folder_path, links_distance=None, title=None, date=None, callback=None):
+        """ Export @profiles to PNG files in @folder_path, without drawing them in the canvas nor overwriting
+            image of composer templates. Every profile is an (init node, end node) pair or the id of a saved profile.
+            A background task (class TaskProfiles) fetches values of 'system_variables/profile_batch_size' profiles
+            per server call and renders them with 'system_variables/profile_max_workers' processes.
+            Timing of every profile is written to file 'profiles.csv' of @folder_path.
+            When finished, @callback(results) is called, or result is shown if not set """
+
+        if not profiles:
+            return None
+
+        if date is None:
+            date = QDate.currentDate().toString('yyyy/MM/dd')
+
+        items = []
+        for profile in profiles:
+            if isinstance(profile, (list, tuple)):
+                item = {'name': f"{profile[0]}_{profile[1]}", 'init_node': profile[0], 'end_node': profile[1],
+                        'links_distance': links_distance}
+            else:
+                item = {'name': str(profile), 'profile_id': str(profile)}
+            file_name = re.sub(r'[^\w.-]', '_', item['name'])
+            item['path'] = os.path.join(folder_path, f"profile_{file_name}.png")
+            item['title'] = title or ''
+            item['date'] = date
+            items.append(item)
+
+        batch_size = self.settings.value('system_variables/profile_batch_size', '20')
+        batch_size = int(batch_size) if str(batch_size).isdigit() else 0
+        max_workers = self.settings.value('system_variables/profile_max_workers', '0')
+        max_workers = int(max_workers) if str(max_workers).isdigit() else 0
+        description = f"Export profiles ({len(items)})"
+        task = TaskProfiles(description, self.controller, items, self.create_body, batch_size, max_workers or None,
+                            partial(self.export_profiles_finished, folder_path, callback))
+
+        return task.start()
+
+
+    def export_profiles_finished(self, folder_path, callback, status, results):
+
+        if not status and not results:
+            message = "Profiles cannot be created"
+            self.controller.show_warning(message, parameter=folder_path)
+            return
+
+        # Save timing of every profile. Fetch time is the average of the server call of its batch
+        csv_path = os.path.join(folder_path, 'profiles.csv')
+        try:
+            with open(csv_path, 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file, delimiter=';')
+                writer.writerow(['profile', 'path', 'batch_fetch_time_avg', 'render_time', 'error'])
+                for result in results:
+                    writer.writerow([result['profile'], result['path'], f"{result['fetch_time']:.3f}",
+                                     f"{result['time']:.3f}", result['error'] or ''])
+        except OSError as e:
+            self.controller.log_warning(f"{type(e).__name__} --> {e}", parameter=csv_path)
+
+        if callback:
+            callback(results)
+            return
+
+        errors = [result for result in results if result['error']]
+        for result in errors:
+            self.controller.log_warning(result['error'], parameter=result['profile'])
+        exported = len(results) - len(errors)
+        if errors:
+            message = "Some profiles cannot be created"
+            self.controller.show_warning(message, parameter=f"{exported}/{len(results)}")
+        else:
+            message = "Profiles created successfully"
+            self.controller.show_info(message, parameter=exported)
+
+
     def remove_selection(self, actionpan=False):
         """ Remove selected features of all layers """
 
@@ -1355,16 +557,3 @@ class DrawProfiles(ParentMapTool):
         self.canvas.refresh()
         if actionpan:
             self.iface.actionPan().trigger()
-
-
-    def get_stylesheet(self, data_type='REAL'):
-        # getting stylesheet
-        if data_type=='REAL':
-            line_style = self.profile_json['body']['data']['stylesheet']['infra']['real']['style']
-            line_color = self.profile_json['body']['data']['stylesheet']['infra']['real']['color']
-            line_width = self.profile_json['body']['data']['stylesheet']['infra']['real']['width']
-        elif data_type=='INTERPOLATED':
-            line_style = self.profile_json['body']['data']['stylesheet']['infra']['interpolated']['style']
-            line_color = self.profile_json['body']['data']['stylesheet']['infra']['interpolated']['color']
-            line_width = self.profile_json['body']['data']['stylesheet']['infra']['interpolated']['width']
-        return line_style, line_color, line_width
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from giswater_qgis_plugin.dao.om_visit_x_node import OmVisitXNode
+
+
+class ControllerDummy(object):
+    """ Controller that keeps records of table 'om_visit_x_node' in memory and logs executed statements.
+        Primary keys are generated by sequence @sequence, or must be set explicitly if it is None """
+
+    def __init__(self, postgresql_version=120000, sequence='om_visit_x_node_id_seq'):
+
+        self.postgresql_version = postgresql_version
+        self.sequence = sequence
+        self.dao = self
+        self.last_id = 0
+        self.records = {}
+        self.statements = []
+
+
+    def commit(self):
+        pass
+
+
+    def rollback(self):
+        pass
+
+
+    def show_info(self, *args, **kwargs):
+        pass
+
+
+    def get_postgresql_version(self):
+        return self.postgresql_version
+
+
+    def get_row(self, sql, log_info=True, log_sql=False, commit=True, params=None):
+
+        self.statements.append(sql)
+        if 'pg_get_serial_sequence' in sql:
+            return [self.sequence]
+        if 'MAX(' in sql:
+            return [max(self.records, default=None)]
+        if 'currval' in sql:
+            return [self.last_id]
+        record = self.records.get(params[0]) if params else None
+        return [params[0]] + list(record) if record else None
+
+
+    def get_rows(self, sql, log_info=True, log_sql=False, commit=True, params=None, add_empty_row=False):
+
+        self.statements.append(sql)
+        return [[pk] + list(self.records[pk]) for pk in params[0] if pk in self.records]
+
+
+    def execute_sql(self, sql, log_sql=False, log_error=False, commit=True, filepath=None):
+
+        self.statements.append(sql)
+        if 'setval' in sql:
+            self.last_id = max(self.last_id, max(self.records, default=0))
+        return True
+
+
+    def execute_upsert(self, tablename, unique_field, unique_value, fields, values, commit=True):
+
+        self.statements.append(f"UPSERT {tablename}")
+        self.records[int(unique_value)] = tuple(values)
+        return True
+
+
+    def execute_values(self, sql, values, template=None, fetch=False, log_sql=False, commit=True, page_size=1000):
+
+        self.statements.append(sql)
+        fields = sql.split('(', 1)[1].split(')', 1)[0].split(', ')
+        rows = []
+        for value in values:
+            if 'ON CONFLICT' in sql:
+                pk, value = value[0], value[1:]
+            elif fields[-1] == 'id':
+                pk, value = value[-1], value[:-1]
+            else:
+                self.last_id += 1
+                pk = self.last_id
+            self.records[pk] = tuple(value)
+            rows.append((pk, ))
+
+        return rows if fetch else True
+
+
+def create_records(controller, total, node_prefix=''):
+    """ Return list of @total unsaved records of table 'om_visit_x_node' """
+
+    records = []
+    for index in range(total):
+        record = OmVisitXNode(controller)
+        record.visit_id = 1
+        record.node_id = f"{node_prefix}{index}"
+        record.is_last = True
+        records.append(record)
+    return records
+
+
+def test_upsert_many_inserts_new_records():
+
+    controller = ControllerDummy()
+    records = create_records(controller, 5)
+    assert OmVisitXNode(controller).upsert_many(records)
+    assert [record.id for record in records] == [1, 2, 3, 4, 5]
+    assert controller.records[5][1] == '4'
+    assert len([sql for sql in controller.statements if sql.startswith('INSERT')]) == 1
+
+
+def test_upsert_many_updates_existing_pk():
+
+    controller = ControllerDummy()
+    assert OmVisitXNode(controller).upsert_many(create_records(controller, 2))
+
+    record = OmVisitXNode(controller)
+    record.id = 2
+    record.visit_id = 1
+    record.node_id = 'updated'
+    record.is_last = False
+    assert OmVisitXNode(controller).upsert_many([record])
+    assert record.id == 2
+    assert sorted(controller.records) == [1, 2]
+    assert controller.records[2] == (1, 'updated', False)
+    assert 'ON CONFLICT (id) DO UPDATE' in controller.statements[-1]
+
+
+def test_upsert_many_before_postgresql_9_5():
+
+    controller = ControllerDummy(postgresql_version=90400)
+    assert OmVisitXNode(controller).upsert_many(create_records(controller, 2))
+
+    record = OmVisitXNode(controller)
+    record.id = 1
+    record.visit_id = 1
+    record.node_id = 'updated'
+    record.is_last = False
+    assert OmVisitXNode(controller).upsert_many([record])
+    assert controller.records[1][1] == 'updated'
+    assert "UPSERT om_visit_x_node" in controller.statements
+    assert not any('ON CONFLICT' in sql for sql in controller.statements)
+
+
+def test_insert_many_without_sequence():
+
+    controller = ControllerDummy(sequence=None)
+    controller.records[7] = (1, 'old', True)
+    pks = OmVisitXNode(controller).insert_many([{'visit_id': 1, 'node_id': 'a', 'is_last': True},
+                                                {'visit_id': 1, 'node_id': 'b', 'is_last': True}])
+    assert pks == [8, 9]
+    assert controller.records[9] == (1, 'b', True)
+    assert not any('setval' in sql for sql in controller.statements)
+
+
+def test_insert_many_syncs_sequence():
+
+    controller = ControllerDummy()
+    controller.records[7] = (1, 'old', True)
+    pks = OmVisitXNode(controller).insert_many([{'visit_id': 1, 'node_id': 'a', 'is_last': True}])
+    assert pks == [8]
+    assert any('setval' in sql and 'om_visit_x_node_id_seq AS seq' in sql for sql in controller.statements)
+
+
+def test_fetch_many_with_missing_pks():
+
+    controller = ControllerDummy()
+    assert OmVisitXNode(controller).upsert_many(create_records(controller, 3, 'node_'))
+
+    fetched = OmVisitXNode(controller).fetch_many([3, 10, 1])
+    assert sorted(record.id for record in fetched) == [1, 3]
+    assert {record.id: record.node_id for record in fetched} == {1: 'node_0', 3: 'node_2'}
+    assert OmVisitXNode(controller).fetch_many([10, 11]) == []
+    assert OmVisitXNode(controller).fetch_many([]) == []
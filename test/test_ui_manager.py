@@ -0,0 +1,66 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtWidgets import QApplication
+
+from giswater_qgis_plugin import ui_manager
+
+
+# Application needed to create widgets, kept alive for all tests
+application = QApplication.instance() or QApplication([])
+
+
+def count_compilations(monkeypatch):
+    """ Count calls to uic.loadUiType, keyed by .ui file path """
+
+    compilations = {}
+    load_ui_type = ui_manager.uic.loadUiType
+
+    def counted_load_ui_type(ui_file_path, *args, **kwargs):
+        compilations[ui_file_path] = compilations.get(ui_file_path, 0) + 1
+        return load_ui_type(ui_file_path, *args, **kwargs)
+
+    monkeypatch.setattr(ui_manager.uic, 'loadUiType', counted_load_ui_type)
+    monkeypatch.setattr(ui_manager, 'ui_cache_folder', None)
+    return compilations
+
+
+def test_lazy_form_is_not_compiled_until_instantiated(monkeypatch):
+
+    compilations = count_compilations(monkeypatch)
+    form_class = ui_manager.get_ui_class('dialog_text.ui')
+    monkeypatch.delitem(ui_manager.form_classes, form_class.ui_file_path, raising=False)
+
+    assert issubclass(form_class, ui_manager.GwLazyForm)
+    assert form_class.ui_file_path not in ui_manager.form_classes
+    assert compilations == {}
+
+
+def test_lazy_form_is_compiled_once(monkeypatch):
+
+    compilations = count_compilations(monkeypatch)
+    ui_file_path = ui_manager.DialogTextUi.ui_file_path
+    monkeypatch.delitem(ui_manager.form_classes, ui_file_path, raising=False)
+
+    dialog = ui_manager.DialogTextUi()
+    assert ui_file_path in ui_manager.form_classes
+    assert dialog.btn_accept is not None
+    ui_manager.DialogTextUi()
+    assert compilations == {ui_file_path: 1}
+
+
+def test_eager_form_is_compiled_at_once(monkeypatch):
+
+    compilations = count_compilations(monkeypatch)
+    form_class = ui_manager.get_ui_class('dialog_text.ui')
+    monkeypatch.delitem(ui_manager.form_classes, form_class.ui_file_path, raising=False)
+
+    eager_class = ui_manager.get_ui_class('dialog_text.ui', lazy=False)
+    assert not issubclass(eager_class, ui_manager.GwLazyForm)
+    assert hasattr(eager_class, 'setupUi')
+    assert ui_manager.form_classes[form_class.ui_file_path] is eager_class
+    assert compilations == {form_class.ui_file_path: 1}
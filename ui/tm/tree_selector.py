@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
-from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog
-import os
 
-FORM_CLASS, _ = uic.loadUiType(os.path.join(os.path.dirname(__file__), 'tree_selector.ui'))
+from ...ui_manager import get_ui_class
+
+FORM_CLASS = get_ui_class('tree_selector.ui', 'tm')
 
 
 class TreeSelector(QDialog, FORM_CLASS):
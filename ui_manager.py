@@ -5,10 +5,13 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
+from qgis.core import Qgis, QgsMessageLog
 from qgis.PyQt import uic, QtCore
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMainWindow, QDialog, QDockWidget, QWhatsThis, QLineEdit
 import configparser
+import hashlib
+import importlib.util
 import os
 import webbrowser
 
@@ -105,15 +108,91 @@ class GwMainWindow(QMainWindow):
         return False
 
 
-def get_ui_class(ui_file_name, subfolder=None):
-    """ Get UI Python class from @ui_file_name """
+# Form classes already compiled, keyed by .ui file path
+form_classes = {}
+
+# Folder where .ui files are precompiled to Python modules. If None, they are compiled in memory
+ui_cache_folder = None
+
+
+class GwLazyForm(object):
+    """ Qt Designer form whose .ui file is compiled on first instantiation, not at import time """
+
+    ui_file_path = None
+
+    def setupUi(self, widget):
+        load_form_class(self.ui_file_path).setupUi(self, widget)
+
+
+    def retranslateUi(self, widget):
+        load_form_class(self.ui_file_path).retranslateUi(self, widget)
+
+
+def set_ui_cache_folder(folder):
+    """ Set folder where .ui files will be precompiled to Python modules """
+
+    global ui_cache_folder
+    ui_cache_folder = folder
+
+
+def get_ui_class(ui_file_name, subfolder=None, lazy=True):
+    """ Get UI Python class from @ui_file_name. If @lazy, .ui file will be compiled on first instantiation """
 
     # Folder that contains UI files
     ui_folder_path = os.path.dirname(__file__) + os.sep + 'ui'
     if subfolder:
         ui_folder_path += os.sep + subfolder
     ui_file_path = os.path.abspath(os.path.join(ui_folder_path, ui_file_name))
-    return uic.loadUiType(ui_file_path)[0]
+    if not lazy:
+        return load_form_class(ui_file_path)
+
+    class_name = 'Ui_' + os.path.splitext(ui_file_name)[0]
+    return type(class_name, (GwLazyForm,), {'ui_file_path': ui_file_path})
+
+
+def load_form_class(ui_file_path):
+    """ Get form class of @ui_file_path, compiling it only the first time """
+
+    form_class = form_classes.get(ui_file_path)
+    if form_class is None:
+        if ui_cache_folder:
+            form_class = load_compiled_form_class(ui_file_path)
+        if form_class is None:
+            form_class = uic.loadUiType(ui_file_path)[0]
+        form_classes[ui_file_path] = form_class
+
+    return form_class
+
+
+def load_compiled_form_class(ui_file_path):
+    """ Get form class of @ui_file_path from a Python module precompiled into @ui_cache_folder.
+        Module is keyed by .ui file hash, so it is compiled again whenever .ui file changes.
+        Return None (logging the reason) if it can't be compiled or loaded, to compile form in memory """
+
+    try:
+        with open(ui_file_path, 'rb') as ui_file:
+            file_hash = hashlib.md5(ui_file.read()).hexdigest()
+        module_name = f"{os.path.splitext(os.path.basename(ui_file_path))[0]}_{file_hash}"
+        module_path = os.path.join(ui_cache_folder, module_name + '.py')
+        if not os.path.exists(module_path):
+            os.makedirs(ui_cache_folder, exist_ok=True)
+            temp_path = module_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as py_file:
+                uic.compileUi(ui_file_path, py_file)
+            os.replace(temp_path, module_path)
+
+        spec = importlib.util.spec_from_file_location(module_name, module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for name, value in vars(module).items():
+            if name.startswith('Ui_') and isinstance(value, type):
+                return value
+        raise AttributeError(f"No form class found in {module_path}")
+    except (ImportError, AttributeError, SyntaxError, OSError) as e:
+        message = f"Precompiled form not used ({type(e).__name__}: {e})"
+        QgsMessageLog.logMessage(message, 'giswater', Qgis.Warning)
+
+    return None
 
 
 FORM_CLASS = get_ui_class('docker.ui')
@@ -121,6 +200,11 @@ class DockerUi(GwDockWidget, FORM_CLASS):
     pass
 
 
+FORM_CLASS = get_ui_class('performance.ui')
+class PerformanceUi(GwDockWidget, FORM_CLASS):
+    pass
+
+
 FORM_CLASS = get_ui_class('element.ui')
 class ElementUi(GwDialog, FORM_CLASS):
     pass